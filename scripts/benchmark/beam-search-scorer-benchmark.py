@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# Beam scorer benchmarking tool
+#
+# Measures the time spent in the beam scorer between two forward passes of `beam_search`, for the Python-loop based
+# `BeamSearchScorer` and the tensorized `VectorizedBeamSearchScorer`. The model is left out: the scores of the
+# candidates are random, and a few of them are end-of-sequence tokens at every step, so that finished hypotheses are
+# stored along the way.
+#
+# Example, for a summarization-like setting:
+#
+#     ./beam-search-scorer-benchmark.py --batch-size 64 --num-beams 8 --steps 100
+#
+# which prints the average time per step of `process` and the time of `finalize` for both scorers.
+
+import argparse
+import time
+
+import torch
+
+from transformers import BeamSearchScorer, VectorizedBeamSearchScorer
+
+
+def run_scorer(scorer_class, args, candidates):
+    device = torch.device(args.device)
+    scorer = scorer_class(
+        batch_size=args.batch_size,
+        num_beams=args.num_beams,
+        device=device,
+        length_penalty=1.0,
+        do_early_stopping=False,
+        num_beam_hyps_to_keep=1,
+        max_length=args.prompt_length + args.steps,
+    )
+    input_ids = torch.randint(args.vocab_size, (args.batch_size * args.num_beams, args.prompt_length), device=device)
+
+    process_time = 0.0
+    for next_scores, next_tokens, next_indices in candidates:
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        beam_outputs = scorer.process(
+            input_ids, next_scores, next_tokens, next_indices, pad_token_id=0, eos_token_id=args.eos_token_id
+        )
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        process_time += time.perf_counter() - start
+
+        beam_idx = beam_outputs["next_beam_indices"]
+        input_ids = torch.cat([input_ids[beam_idx, :], beam_outputs["next_beam_tokens"].unsqueeze(-1)], dim=-1)
+
+    start = time.perf_counter()
+    scorer.finalize(
+        input_ids,
+        beam_outputs["next_beam_scores"],
+        next_tokens,
+        next_indices,
+        pad_token_id=0,
+        eos_token_id=args.eos_token_id,
+        max_length=args.prompt_length + args.steps,
+    )
+    finalize_time = time.perf_counter() - start
+    return process_time / len(candidates), finalize_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--num-beams", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--prompt-length", type=int, default=16)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--eos-probability", type=float, default=0.05, help="Probability of a candidate to be eos.")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+    args.eos_token_id = args.vocab_size
+
+    torch.manual_seed(0)
+    num_candidates = 2 * args.num_beams
+    candidates = []
+    for _ in range(args.steps):
+        next_scores = -torch.rand(args.batch_size, num_candidates, device=args.device).sort(dim=1).values * 10
+        next_tokens = torch.randint(args.vocab_size, (args.batch_size, num_candidates), device=args.device)
+        # at most `num_beams` eos tokens, so that every batch item keeps `num_beams` running beams
+        is_eos = torch.rand(args.batch_size, num_candidates, device=args.device) < args.eos_probability
+        is_eos[:, args.num_beams :] = False
+        next_tokens[is_eos] = args.eos_token_id
+        next_indices = torch.randint(args.num_beams, (args.batch_size, num_candidates), device=args.device)
+        candidates.append((next_scores, next_tokens, next_indices))
+
+    print(f"batch_size={args.batch_size} num_beams={args.num_beams} steps={args.steps} device={args.device}")
+    results = {}
+    for scorer_class in (BeamSearchScorer, VectorizedBeamSearchScorer):
+        results[scorer_class.__name__] = run_scorer(scorer_class, args, candidates)
+        step_time, finalize_time = results[scorer_class.__name__]
+        print(
+            f"{scorer_class.__name__:>28}: {step_time * 1000:8.3f} ms/step (process), {finalize_time * 1000:8.3f} ms"
+            " (finalize)"
+        )
+    speedup = results["BeamSearchScorer"][0] / results["VectorizedBeamSearchScorer"][0]
+    print(f"per-step overhead reduction: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -101,7 +101,7 @@ _import_structure = {
     "feature_extraction_sequence_utils": ["SequenceFeatureExtractor"],
     "feature_extraction_utils": ["BatchFeature", "FeatureExtractionMixin"],
     "file_utils": [],
-    "generation": ["GenerationConfig", "TextIteratorStreamer", "TextStreamer"],
+    "generation": ["AsyncTextIteratorStreamer", "GenerationConfig", "TextIteratorStreamer", "TextStreamer"],
     "hf_argparser": ["HfArgumentParser"],
     "hyperparameter_search": [],
     "image_transforms": [],
@@ -639,11 +639,13 @@ _import_structure = {
     "models.yoso": ["YOSO_PRETRAINED_CONFIG_ARCHIVE_MAP", "YosoConfig"],
     "onnx": [],
     "pipelines": [
+        "ArrowPipelineDataFormat",
         "AudioClassificationPipeline",
         "AutomaticSpeechRecognitionPipeline",
         "Conversation",
         "ConversationalPipeline",
         "CsvPipelineDataFormat",
+        "DataParallelPipeline",
         "DepthEstimationPipeline",
         "DocumentQuestionAnsweringPipeline",
         "FeatureExtractionPipeline",
@@ -651,11 +653,13 @@ _import_structure = {
         "ImageClassificationPipeline",
         "ImageSegmentationPipeline",
         "ImageToTextPipeline",
+        "JsonLinesPipelineDataFormat",
         "JsonPipelineDataFormat",
         "NerPipeline",
         "ObjectDetectionPipeline",
         "PipedPipelineDataFormat",
         "Pipeline",
+        "PipelineCache",
         "PipelineDataFormat",
         "QuestionAnsweringPipeline",
         "SummarizationPipeline",
@@ -998,6 +1002,7 @@ else:
     _import_structure["activations"] = []
     _import_structure["benchmark.benchmark"] = ["PyTorchBenchmark"]
     _import_structure["benchmark.benchmark_args"] = ["PyTorchBenchmarkArguments"]
+    _import_structure["cache_utils"] = ["Cache", "PagedCache", "PrefixCache", "StaticCache"]
     _import_structure["data.datasets"] = [
         "GlueDataset",
         "GlueDataTrainingArguments",
@@ -1018,6 +1023,7 @@ else:
             "ConstrainedBeamSearchScorer",
             "Constraint",
             "ConstraintListState",
+            "ContinuousBatchingEngine",
             "DisjunctiveConstraint",
             "EncoderNoRepeatNGramLogitsProcessor",
             "EncoderRepetitionPenaltyLogitsProcessor",
@@ -1053,6 +1059,7 @@ else:
             "TopPLogitsWarper",
             "TypicalLogitsWarper",
             "UnbatchedClassifierFreeGuidanceLogitsProcessor",
+            "VectorizedBeamSearchScorer",
             "WhisperTimeStampLogitsProcessor",
             "top_k_top_p_filtering",
         ]
@@ -4201,7 +4208,7 @@ if TYPE_CHECKING:
     from .feature_extraction_utils import BatchFeature, FeatureExtractionMixin
 
     # Generation
-    from .generation import GenerationConfig, TextIteratorStreamer, TextStreamer
+    from .generation import AsyncTextIteratorStreamer, GenerationConfig, TextIteratorStreamer, TextStreamer
     from .hf_argparser import HfArgumentParser
 
     # Integrations
@@ -4699,11 +4706,13 @@ if TYPE_CHECKING:
 
     # Pipelines
     from .pipelines import (
+        ArrowPipelineDataFormat,
         AudioClassificationPipeline,
         AutomaticSpeechRecognitionPipeline,
         Conversation,
         ConversationalPipeline,
         CsvPipelineDataFormat,
+        DataParallelPipeline,
         DepthEstimationPipeline,
         DocumentQuestionAnsweringPipeline,
         FeatureExtractionPipeline,
@@ -4711,11 +4720,13 @@ if TYPE_CHECKING:
         ImageClassificationPipeline,
         ImageSegmentationPipeline,
         ImageToTextPipeline,
+        JsonLinesPipelineDataFormat,
         JsonPipelineDataFormat,
         NerPipeline,
         ObjectDetectionPipeline,
         PipedPipelineDataFormat,
         Pipeline,
+        PipelineCache,
         PipelineDataFormat,
         QuestionAnsweringPipeline,
         SummarizationPipeline,
@@ -5021,6 +5032,7 @@ if TYPE_CHECKING:
         # Benchmarks
         from .benchmark.benchmark import PyTorchBenchmark
         from .benchmark.benchmark_args import PyTorchBenchmarkArguments
+        from .cache_utils import Cache, PagedCache, PrefixCache, StaticCache
         from .data.datasets import (
             GlueDataset,
             GlueDataTrainingArguments,
@@ -5040,6 +5052,7 @@ if TYPE_CHECKING:
             ConstrainedBeamSearchScorer,
             Constraint,
             ConstraintListState,
+            ContinuousBatchingEngine,
             DisjunctiveConstraint,
             EncoderNoRepeatNGramLogitsProcessor,
             EncoderRepetitionPenaltyLogitsProcessor,
@@ -5075,6 +5088,7 @@ if TYPE_CHECKING:
             TopPLogitsWarper,
             TypicalLogitsWarper,
             UnbatchedClassifierFreeGuidanceLogitsProcessor,
+            VectorizedBeamSearchScorer,
             WhisperTimeStampLogitsProcessor,
             top_k_top_p_filtering,
         )
@@ -0,0 +1,554 @@
+# coding=utf-8
+# Copyright 2023 The HuggingFace Inc. team.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import inspect
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import torch
+
+
+if TYPE_CHECKING:
+    from .modeling_utils import PreTrainedModel
+
+
+class Cache:
+    """
+    Base, abstract class for key/value caches that models write into in place, instead of returning a new tuple of
+    concatenated tensors at every forward pass.
+
+    A cache instance can be passed as `past_key_values` to the models supporting it (e.g. Llama and GPT-NeoX), either
+    directly or through `generate()`. The same instance is then returned as `past_key_values` by the model.
+    """
+
+    def update(
+        self, key_states: torch.Tensor, value_states: torch.Tensor, layer_idx: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Stores the new `key_states` and `value_states` for the layer `layer_idx`.
+
+        Parameters:
+            key_states (`torch.Tensor` of shape `(batch_size, num_heads, sequence_length, head_dim)`):
+                The new key states to cache.
+            value_states (`torch.Tensor` of shape `(batch_size, num_heads, sequence_length, head_dim)`):
+                The new value states to cache.
+            layer_idx (`int`):
+                The index of the layer to cache the states for.
+
+        Return:
+            A tuple containing the keys and values of the whole sequence seen so far for the layer `layer_idx`, each
+            of shape `(batch_size, num_heads, total_sequence_length, head_dim)`. Caches with a maximum length (see
+            [`~Cache.get_max_length`]) return keys and values of that length instead, the positions past the
+            sequence being masked by the models.
+        """
+        raise NotImplementedError("Make sure to implement `update` in a subclass.")
+
+    def get_seq_length(self, layer_idx: int = 0) -> int:
+        """Returns the number of tokens already cached for the layer `layer_idx`."""
+        raise NotImplementedError("Make sure to implement `get_seq_length` in a subclass.")
+
+    def get_max_length(self) -> Optional[int]:
+        """
+        Returns the length of the keys and values returned by [`~Cache.update`] when it does not depend on the number
+        of cached tokens, or `None` otherwise.
+        """
+        return None
+
+    def reorder_cache(self, beam_idx: torch.LongTensor):
+        """Reorders the cached sequences along the batch dimension, following `beam_idx`. Used by beam search."""
+        raise NotImplementedError("Make sure to implement `reorder_cache` in a subclass.")
+
+    def to_legacy_cache(self) -> Tuple[Tuple[torch.Tensor, torch.Tensor]]:
+        """Converts the cache to the tuple format, with one `(key, value)` tuple per layer."""
+        raise NotImplementedError("Make sure to implement `to_legacy_cache` in a subclass.")
+
+    def __len__(self):
+        """Number of layers holding at least one cached token. An empty cache evaluates to `False`."""
+        raise NotImplementedError("Make sure to implement `__len__` in a subclass.")
+
+
+class PagedCache(Cache):
+    """
+    Block-allocated key/value cache. The keys and values of every layer live in a single pool of `num_blocks`
+    fixed-size blocks of `block_size` tokens, allocated once. Each sequence of the batch owns a block table (the list
+    of the blocks holding its tokens, in order), and blocks are taken from a free list only when a sequence grows past
+    its last block. New tokens are written in place into their block, and sequences only hold blocks for the tokens
+    they actually contain.
+
+    Blocks are reference counted, so that beam search reorders the cache by copying block tables instead of the cached
+    tensors. A partially filled block shared by several sequences is copied before being written to (copy-on-write).
+
+    This cache is a memory allocator, it does not make decoding faster: the attention of the models needs contiguous
+    keys and values, so `update` gathers the states of all the cached tokens of the sequences from their blocks into
+    new tensors at every forward pass, which copies as much memory as the concatenation done with the tuple format.
+
+    Example:
+
+    ```python
+    >>> from transformers import AutoModelForCausalLM, AutoTokenizer, PagedCache
+
+    >>> tokenizer = AutoTokenizer.from_pretrained("JackFram/llama-68m")
+    >>> model = AutoModelForCausalLM.from_pretrained("JackFram/llama-68m")
+    >>> inputs = tokenizer(["A long time ago"], return_tensors="pt")
+
+    >>> past_key_values = PagedCache(num_blocks=64, block_size=16)
+    >>> outputs = model.generate(**inputs, past_key_values=past_key_values, max_new_tokens=10)
+    ```
+
+    Parameters:
+        num_blocks (`int`):
+            Number of blocks in the pool. Together with `block_size`, it bounds the total number of tokens that can be
+            cached for all sequences.
+        block_size (`int`, *optional*, defaults to 16):
+            Number of tokens stored in each block.
+    """
+
+    def __init__(self, num_blocks: int, block_size: int = 16):
+        if num_blocks <= 0 or block_size <= 0:
+            raise ValueError(
+                f"`num_blocks` and `block_size` have to be strictly positive, but are {num_blocks} and {block_size}."
+            )
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+
+        # one pool per layer, of shape `(num_blocks * block_size, num_heads, head_dim)`, created on the first update
+        self.key_cache: List[torch.Tensor] = []
+        self.value_cache: List[torch.Tensor] = []
+        self._seq_lengths: List[int] = []
+
+        self.block_tables: List[List[int]] = []
+        self._free_blocks: List[int] = list(range(num_blocks - 1, -1, -1))
+        self._ref_counts: List[int] = [0] * num_blocks
+        # `block_tables` on the device of the pools, only rebuilt when the block tables change
+        self._block_tables_tensor: Optional[torch.LongTensor] = None
+
+        # flat slot indices of the current forward pass, shared by all layers
+        self._write_slots: Optional[torch.LongTensor] = None
+        self._read_slots: Optional[torch.LongTensor] = None
+
+    @property
+    def num_free_blocks(self) -> int:
+        """Number of blocks that are not used by any sequence."""
+        return len(self._free_blocks)
+
+    def get_seq_length(self, layer_idx: int = 0) -> int:
+        if layer_idx >= len(self._seq_lengths):
+            return 0
+        return self._seq_lengths[layer_idx]
+
+    def __len__(self):
+        return sum(1 for seq_length in self._seq_lengths if seq_length > 0)
+
+    def update(
+        self, key_states: torch.Tensor, value_states: torch.Tensor, layer_idx: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_size, num_heads, num_new_tokens, head_dim = key_states.shape
+        if layer_idx == len(self.key_cache):
+            self.key_cache.append(key_states.new_zeros((self.num_blocks * self.block_size, num_heads, head_dim)))
+            self.value_cache.append(value_states.new_zeros((self.num_blocks * self.block_size, num_heads, head_dim)))
+            self._seq_lengths.append(0)
+        elif layer_idx > len(self.key_cache):
+            raise ValueError(
+                f"Layers have to be updated in order, but got layer {layer_idx} before layer {len(self.key_cache)}."
+            )
+
+        past_length = self._seq_lengths[layer_idx]
+        # the first layer opens a new forward pass: it reserves the slots of the new tokens for all layers
+        if layer_idx == 0:
+            self._reserve_slots(batch_size, past_length, num_new_tokens, key_states.device)
+
+        new_keys = key_states.transpose(1, 2).reshape(-1, num_heads, head_dim)
+        new_values = value_states.transpose(1, 2).reshape(-1, num_heads, head_dim)
+        self.key_cache[layer_idx].index_copy_(0, self._write_slots, new_keys)
+        self.value_cache[layer_idx].index_copy_(0, self._write_slots, new_values)
+        self._seq_lengths[layer_idx] = past_length + num_new_tokens
+
+        total_length = past_length + num_new_tokens
+        keys = self.key_cache[layer_idx].index_select(0, self._read_slots)
+        values = self.value_cache[layer_idx].index_select(0, self._read_slots)
+        keys = keys.view(batch_size, total_length, num_heads, head_dim).transpose(1, 2)
+        values = values.view(batch_size, total_length, num_heads, head_dim).transpose(1, 2)
+        return keys, values
+
+    def reorder_cache(self, beam_idx: torch.LongTensor):
+        new_block_tables = [list(self.block_tables[idx]) for idx in beam_idx.tolist()]
+        for block_table in new_block_tables:
+            for block in block_table:
+                self._ref_counts[block] += 1
+        for block_table in self.block_tables:
+            for block in block_table:
+                self._release_block(block)
+        self.block_tables = new_block_tables
+        self._block_tables_tensor = None
+
+    def to_legacy_cache(self) -> Tuple[Tuple[torch.Tensor, torch.Tensor]]:
+        legacy_cache = ()
+        if len(self.block_tables) == 0:
+            return legacy_cache
+        for layer_idx in range(len(self.key_cache)):
+            seq_length = self._seq_lengths[layer_idx]
+            read_slots = self._slots_for_positions(torch.arange(seq_length, device=self.key_cache[layer_idx].device))
+            keys = self.key_cache[layer_idx][read_slots].transpose(1, 2)
+            values = self.value_cache[layer_idx][read_slots].transpose(1, 2)
+            legacy_cache += ((keys, values),)
+        return legacy_cache
+
+    def reset(self):
+        """Releases all the blocks, so that the cache can be reused for a new batch without reallocating the pool."""
+        self.block_tables = []
+        self._free_blocks = list(range(self.num_blocks - 1, -1, -1))
+        self._ref_counts = [0] * self.num_blocks
+        self._seq_lengths = [0] * len(self._seq_lengths)
+        self._block_tables_tensor = None
+        self._write_slots = None
+        self._read_slots = None
+
+    def _reserve_slots(self, batch_size: int, past_length: int, num_new_tokens: int, device: torch.device):
+        if len(self.block_tables) == 0:
+            self.block_tables = [[] for _ in range(batch_size)]
+        elif len(self.block_tables) != batch_size:
+            raise ValueError(
+                f"The cache holds {len(self.block_tables)} sequences, but got new states for {batch_size} sequences."
+            )
+
+        total_length = past_length + num_new_tokens
+        num_blocks_needed = (total_length + self.block_size - 1) // self.block_size
+        for block_table in self.block_tables:
+            if past_length % self.block_size != 0 and self._ref_counts[block_table[-1]] > 1:
+                block_table[-1] = self._copy_block(block_table[-1])
+                self._block_tables_tensor = None
+            while len(block_table) < num_blocks_needed:
+                block_table.append(self._allocate_block())
+                self._block_tables_tensor = None
+
+        slots = self._slots_for_positions(torch.arange(total_length, device=device))
+        self._read_slots = slots.view(-1)
+        self._write_slots = slots[:, past_length:].reshape(-1)
+
+    def _slots_for_positions(self, positions: torch.LongTensor) -> torch.LongTensor:
+        """Maps token positions to flat slot indices in the pools, for every sequence. Returns `(batch_size, len)`."""
+        if self._block_tables_tensor is None or self._block_tables_tensor.device != positions.device:
+            self._block_tables_tensor = torch.tensor(self.block_tables, dtype=torch.long, device=positions.device)
+        block_tables = self._block_tables_tensor
+        return block_tables[:, positions // self.block_size] * self.block_size + positions % self.block_size
+
+    def _allocate_block(self) -> int:
+        if len(self._free_blocks) == 0:
+            raise ValueError(
+                f"The `PagedCache` ran out of blocks (`num_blocks={self.num_blocks}`, `block_size={self.block_size}`)."
+                " Increase `num_blocks` to cache longer or more sequences."
+            )
+        block = self._free_blocks.pop()
+        self._ref_counts[block] = 1
+        return block
+
+    def _release_block(self, block: int):
+        self._ref_counts[block] -= 1
+        if self._ref_counts[block] == 0:
+            self._free_blocks.append(block)
+
+    def _copy_block(self, block: int) -> int:
+        new_block = self._allocate_block()
+        source = slice(block * self.block_size, (block + 1) * self.block_size)
+        target = slice(new_block * self.block_size, (new_block + 1) * self.block_size)
+        for key_cache, value_cache in zip(self.key_cache, self.value_cache):
+            key_cache[target] = key_cache[source]
+            value_cache[target] = value_cache[source]
+        self._release_block(block)
+        return new_block
+
+
+class StaticCache(Cache):
+    """
+    Preallocated key/value cache. On the first update of each layer, buffers of shape `(batch_size, num_heads,
+    max_cache_len, head_dim)` are allocated once; the states of the new tokens are then copied into them by index, and
+    the whole buffers are returned as the keys and values of the sequence. Decoding therefore neither allocates nor
+    copies the past states at each step, contrary to the concatenation done with the tuple format.
+
+    The keys and values always have `max_cache_len` positions, and the models mask the positions past the cached
+    tokens with an attention mask of the same fixed length: the shapes of the attention do not change from one
+    decoding step to the next, as needed by `torch.compile` to decode without recompiling.
+
+    This cache is used by `generate()` when `cache_implementation="static"` is set in the generation config.
+
+    Parameters:
+        max_cache_len (`int`):
+            The maximum number of tokens that can be cached for each sequence, e.g. the `max_length` of the
+            generation.
+    """
+
+    def __init__(self, max_cache_len: int):
+        if max_cache_len <= 0:
+            raise ValueError(f"`max_cache_len` has to be strictly positive, but is {max_cache_len}.")
+        self.max_cache_len = max_cache_len
+        self.key_cache: List[torch.Tensor] = []
+        self.value_cache: List[torch.Tensor] = []
+        self._seq_lengths: List[int] = []
+
+    def get_seq_length(self, layer_idx: int = 0) -> int:
+        if layer_idx >= len(self._seq_lengths):
+            return 0
+        return self._seq_lengths[layer_idx]
+
+    def get_max_length(self) -> Optional[int]:
+        return self.max_cache_len
+
+    def __len__(self):
+        return sum(1 for seq_length in self._seq_lengths if seq_length > 0)
+
+    def update(
+        self, key_states: torch.Tensor, value_states: torch.Tensor, layer_idx: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_size, num_heads, num_new_tokens, head_dim = key_states.shape
+        if layer_idx == len(self.key_cache):
+            self.key_cache.append(key_states.new_zeros((batch_size, num_heads, self.max_cache_len, head_dim)))
+            self.value_cache.append(value_states.new_zeros((batch_size, num_heads, self.max_cache_len, head_dim)))
+            self._seq_lengths.append(0)
+        elif layer_idx > len(self.key_cache):
+            raise ValueError(
+                f"Layers have to be updated in order, but got layer {layer_idx} before layer {len(self.key_cache)}."
+            )
+
+        past_length = self._seq_lengths[layer_idx]
+        total_length = past_length + num_new_tokens
+        if total_length > self.max_cache_len:
+            raise ValueError(
+                f"The `StaticCache` can hold {self.max_cache_len} tokens, but {total_length} tokens were given."
+            )
+
+        self.key_cache[layer_idx][:, :, past_length:total_length] = key_states
+        self.value_cache[layer_idx][:, :, past_length:total_length] = value_states
+        self._seq_lengths[layer_idx] = total_length
+        return self.key_cache[layer_idx], self.value_cache[layer_idx]
+
+    def reorder_cache(self, beam_idx: torch.LongTensor):
+        for layer_idx in range(len(self.key_cache)):
+            device = self.key_cache[layer_idx].device
+            self.key_cache[layer_idx] = self.key_cache[layer_idx].index_select(0, beam_idx.to(device))
+            self.value_cache[layer_idx] = self.value_cache[layer_idx].index_select(0, beam_idx.to(device))
+
+    def to_legacy_cache(self) -> Tuple[Tuple[torch.Tensor, torch.Tensor]]:
+        legacy_cache = ()
+        for key_cache, value_cache, seq_length in zip(self.key_cache, self.value_cache, self._seq_lengths):
+            legacy_cache += ((key_cache[:, :, :seq_length], value_cache[:, :, :seq_length]),)
+        return legacy_cache
+
+    def reset(self):
+        """Empties the cache, keeping the buffers allocated so that they can be reused for a batch of the same size."""
+        self._seq_lengths = [0] * len(self._seq_lengths)
+
+
+class _PrefixTrieNode:
+    __slots__ = ("children", "key")
+
+    def __init__(self):
+        self.children: Dict[int, "_PrefixTrieNode"] = {}
+        # key of the stored prefix ending at this node, if any
+        self.key: Optional[Tuple[int, ...]] = None
+
+
+class PrefixCache:
+    """
+    Memory-bounded LRU store of the key/value states of prompt prefixes, to share the encoding of common prefixes
+    (e.g. a system prompt) across `generate()` calls. Stored prefixes are indexed by a trie on their token ids: a new
+    prompt reuses the states of the longest prefix it shares with any stored entry, and only the remaining tokens are
+    run through the model.
+
+    Pass an instance as `prefix_cache` to `generate()`, or call [`~PrefixCache.prefill`] directly to get the
+    `past_key_values` of a prompt. The cached states use the standard tuple format, with one `(key, value)` tuple per
+    layer, each of shape `(batch_size, num_heads, sequence_length, head_dim)`.
+
+    Example:
+
+    ```python
+    >>> from transformers import AutoModelForCausalLM, AutoTokenizer, PrefixCache
+
+    >>> tokenizer = AutoTokenizer.from_pretrained("gpt2")
+    >>> model = AutoModelForCausalLM.from_pretrained("gpt2")
+    >>> prefix_cache = PrefixCache(max_cached_tokens=4096)
+
+    >>> system_prompt = "You are a helpful assistant that answers questions about geography. "
+    >>> for question in ["What is the capital of France?", "What is the capital of Italy?"]:
+    ...     inputs = tokenizer(system_prompt + question, return_tensors="pt")
+    ...     outputs = model.generate(**inputs, prefix_cache=prefix_cache, max_new_tokens=5)
+    >>> prefix_cache.num_hits
+    1
+    ```
+
+    Parameters:
+        max_cached_tokens (`int`):
+            Maximum number of tokens whose states are kept. The least recently used prefixes are evicted first.
+    """
+
+    def __init__(self, max_cached_tokens: int):
+        if max_cached_tokens <= 0:
+            raise ValueError(f"`max_cached_tokens` has to be strictly positive, but is {max_cached_tokens}.")
+        self.max_cached_tokens = max_cached_tokens
+        self.num_cached_tokens = 0
+        self.num_hits = 0
+        self.num_misses = 0
+
+        self._root = _PrefixTrieNode()
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[Tuple[torch.Tensor, torch.Tensor]]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, token_ids: List[int]) -> Tuple[int, Optional[Tuple[Tuple[torch.Tensor, torch.Tensor]]]]:
+        """
+        Finds the longest prefix of `token_ids` whose states are cached.
+
+        Return:
+            A tuple with the length of the longest cached prefix and the `past_key_values` of a stored entry covering
+            it (which may be longer than the prefix), or `(0, None)` when nothing matches.
+        """
+        node = self._root
+        matched_length = 0
+        for token_id in token_ids:
+            if token_id not in node.children:
+                break
+            node = node.children[token_id]
+            matched_length += 1
+        if matched_length == 0:
+            return 0, None
+
+        # any entry below the deepest matched node holds the states of the matched prefix
+        while node.key is None:
+            node = next(iter(node.children.values()))
+        self._entries.move_to_end(node.key)
+        return matched_length, self._entries[node.key]
+
+    def insert(self, token_ids: List[int], past_key_values: Tuple[Tuple[torch.Tensor, torch.Tensor]]):
+        """
+        Stores the `past_key_values` of the prefix `token_ids`, for a batch of size 1. Stored prefixes of `token_ids`
+        are superseded and dropped, and the least recently used entries are evicted to respect `max_cached_tokens`.
+        """
+        key = tuple(token_ids)
+        if len(key) == 0 or len(key) > self.max_cached_tokens:
+            return
+
+        node = self._root
+        superseded = []
+        for token_id in key:
+            if node.key is not None:
+                superseded.append(node.key)
+            node = node.children.setdefault(token_id, _PrefixTrieNode())
+        if node.key is not None or len(node.children) > 0:
+            # this prefix is already covered by a stored entry
+            self.lookup(key)
+            return
+
+        for superseded_key in superseded:
+            self._remove(superseded_key)
+        node.key = key
+        self._entries[key] = past_key_values
+        self.num_cached_tokens += len(key)
+        while self.num_cached_tokens > self.max_cached_tokens:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Drops all the stored prefixes."""
+        self._root = _PrefixTrieNode()
+        self._entries.clear()
+        self.num_cached_tokens = 0
+
+    @torch.no_grad()
+    def prefill(
+        self,
+        model: "PreTrainedModel",
+        input_ids: torch.LongTensor,
+        attention_mask: Optional[torch.LongTensor] = None,
+    ) -> Optional[Tuple[Tuple[torch.Tensor, torch.Tensor]]]:
+        """
+        Computes the `past_key_values` of all the tokens of `input_ids` but the last one, reusing the longest cached
+        prefix shared by all the rows, and stores the result. The returned cache can be passed to `generate()` along
+        with the full `input_ids`.
+
+        Args:
+            model ([`PreTrainedModel`]):
+                A decoder-only model returning its cache in the standard tuple format.
+            input_ids (`torch.LongTensor` of shape `(batch_size, sequence_length)`):
+                The prompts. Padded batches are not supported, as padding would be part of the cached prefixes.
+            attention_mask (`torch.LongTensor` of shape `(batch_size, sequence_length)`, *optional*):
+                The attention mask of the prompts, used to reject padded batches.
+        """
+        if attention_mask is not None and not bool(attention_mask.all()):
+            raise ValueError("`PrefixCache` does not support padded inputs. Please use unpadded prompts.")
+        batch_size, prefix_length = input_ids.shape[0], input_ids.shape[1] - 1
+        if prefix_length == 0:
+            return None
+
+        prefix_ids = input_ids[:, :prefix_length].tolist()
+        matches = [self.lookup(token_ids) for token_ids in prefix_ids]
+        reused_length = min(matched_length for matched_length, _ in matches)
+        if reused_length > 0:
+            self.num_hits += 1
+            past_key_values = tuple(
+                tuple(
+                    torch.cat([entry[layer_idx][i][:, :, :reused_length] for _, entry in matches], dim=0)
+                    for i in range(2)
+                )
+                for layer_idx in range(len(matches[0][1]))
+            )
+        else:
+            self.num_misses += 1
+            past_key_values = None
+
+        if reused_length < prefix_length:
+            model_inputs = {
+                "input_ids": input_ids[:, reused_length:prefix_length],
+                "past_key_values": past_key_values,
+                "attention_mask": input_ids.new_ones((batch_size, prefix_length)),
+                "use_cache": True,
+                "return_dict": True,
+            }
+            if "position_ids" in inspect.signature(model.forward).parameters:
+                position_ids = torch.arange(reused_length, prefix_length, device=input_ids.device)
+                model_inputs["position_ids"] = position_ids.unsqueeze(0).expand(batch_size, -1)
+            past_key_values = model(**model_inputs).past_key_values
+            _check_standard_cache_format(past_key_values)
+
+            for row, token_ids in enumerate(prefix_ids):
+                # rows of a batch are copied, so that evicting one of them frees its memory
+                row_past = tuple(
+                    tuple(tensor if batch_size == 1 else tensor[row : row + 1].clone() for tensor in layer)
+                    for layer in past_key_values
+                )
+                self.insert(token_ids, row_past)
+        return past_key_values
+
+    def _remove(self, key: Tuple[int, ...]):
+        del self._entries[key]
+        self.num_cached_tokens -= len(key)
+
+        # unset the key and prune the branch that no longer leads to any entry
+        path = [self._root]
+        for token_id in key:
+            path.append(path[-1].children[token_id])
+        path[-1].key = None
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.key is not None or len(node.children) > 0:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+
+def _check_standard_cache_format(past_key_values):
+    if not isinstance(past_key_values, tuple) or any(
+        not isinstance(tensor, torch.Tensor) or tensor.dim() != 4 for layer in past_key_values for tensor in layer
+    ):
+        raise ValueError(
+            "`PrefixCache` requires a model returning its cache in the standard tuple format, with one tensor of "
+            "shape `(batch_size, num_heads, sequence_length, head_dim)` per key and value."
+        )
@@ -94,16 +94,22 @@ class RunCommand(BaseTransformersCLICommand):
 
     def run(self):
         nlp, outputs = self._nlp, []
+        # Formats that support it write the outputs as they are produced instead of keeping them in memory
+        write_incrementally = self._reader.supports_incremental_writes and not self._nlp.binary_output
 
         for entry in self._reader:
             output = nlp(**entry) if self._reader.is_multi_columns else nlp(entry)
             if isinstance(output, dict):
-                outputs.append(output)
+                output = [output]
+            if write_incrementally:
+                self._reader.write(output)
             else:
                 outputs += output
 
         # Saving data
-        if self._nlp.binary_output:
+        if write_incrementally:
+            self._reader.close()
+        elif self._nlp.binary_output:
             binary_path = self._reader.save_binary(outputs)
             logger.warning(f"Current pipeline requires output to be in binary format, saving at {binary_path}")
         else:
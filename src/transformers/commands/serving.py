@@ -12,10 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import functools
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full
 from typing import Any, List, Optional
 
+from ..generation import AsyncTextIteratorStreamer
+from ..generation.stopping_criteria import StoppingCriteriaList, _CancellationCriteria
 from ..pipelines import Pipeline, get_supported_tasks, pipeline
+from ..pipelines.base import _outputs_per_input
 from ..utils import logging
 from . import BaseTransformersCLICommand
 
@@ -24,7 +31,7 @@ try:
     from fastapi import Body, FastAPI, HTTPException
     from fastapi.routing import APIRoute
     from pydantic import BaseModel
-    from starlette.responses import JSONResponse
+    from starlette.responses import JSONResponse, StreamingResponse
     from uvicorn import run
 
     _serve_dependencies_installed = True
@@ -53,7 +60,15 @@ def serve_command_factory(args: Namespace):
         tokenizer=args.tokenizer,
         device=args.device,
     )
-    return ServeCommand(nlp, args.host, args.port, args.workers)
+    return ServeCommand(
+        nlp,
+        args.host,
+        args.port,
+        args.workers,
+        max_batch_size=args.max_batch_size,
+        max_wait_time=args.max_wait_time,
+        stream_timeout=args.stream_timeout,
+    )
 
 
 class ServeModelInfoResult(BaseModel):
@@ -89,6 +104,109 @@ class ServeForwardResult(BaseModel):
     output: Any
 
 
+class MicroBatcher:
+    """
+    Groups the inputs of concurrent requests into batches for the pipeline. The first request of a batch waits at most
+    `max_wait_time` seconds for other requests, and a batch holds at most `max_batch_size` inputs (unless a single
+    request has more). The batches run one at a time in a worker thread, so that the event loop keeps accepting
+    requests while the pipeline runs.
+
+    With `max_batch_size=1`, each request is run on its own, exactly as a direct call to the pipeline.
+
+    Args:
+        pipeline (`Pipeline`):
+            The pipeline to run the requests on.
+        max_batch_size (`int`, *optional*, defaults to 1):
+            The maximum number of inputs in a batch.
+        max_wait_time (`float`, *optional*, defaults to 0.005):
+            The maximum time, in seconds, a request waits for other requests to fill its batch.
+    """
+
+    def __init__(self, pipeline: Pipeline, max_batch_size: int = 1, max_wait_time: float = 0.005):
+        if max_batch_size < 1:
+            raise ValueError(f"`max_batch_size` has to be a strictly positive integer, but is {max_batch_size}")
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        # pipelines are not thread-safe: a single thread runs them
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+        self._worker = None
+
+    async def __call__(self, inputs):
+        loop = asyncio.get_running_loop()
+        if self.max_batch_size == 1:
+            return await loop.run_in_executor(self._executor, self.pipeline, inputs)
+
+        # the queue and the worker are created in the event loop of the server
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._process_batches())
+        result = loop.create_future()
+        await self._queue.put((inputs, result))
+        return await result
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs `function(*args, **kwargs)` in the thread of the batches, for the calls to the pipeline that cannot be
+        batched (e.g. streamed generations), so that the pipeline never runs in two threads at once.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def _process_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            num_inputs = _num_inputs(requests[0][0])
+            deadline = loop.time() + self.max_wait_time
+            while num_inputs < self.max_batch_size and loop.time() < deadline:
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                num_inputs += _num_inputs(request[0])
+
+            # the requests whose client is gone are not run
+            requests = [(inputs, result) for inputs, result in requests if not result.done()]
+            if len(requests) == 0:
+                continue
+            batch = []
+            for inputs, _ in requests:
+                batch.extend(inputs if isinstance(inputs, list) else [inputs])
+            try:
+                outputs = await loop.run_in_executor(
+                    self._executor, lambda: self.pipeline(batch, batch_size=self.max_batch_size)
+                )
+                outputs = _outputs_per_input(outputs, len(batch))
+                start = 0
+                for inputs, result in requests:
+                    if isinstance(inputs, list):
+                        output = outputs[start : start + len(inputs)]
+                    else:
+                        output = outputs[start]
+                    start += _num_inputs(inputs)
+                    if not result.done():
+                        result.set_result(output)
+            except Exception as e:
+                # the worker keeps running: the other requests are not affected
+                for _, result in requests:
+                    if not result.done():
+                        result.set_exception(e)
+
+
+def _num_inputs(inputs) -> int:
+    return len(inputs) if isinstance(inputs, list) else 1
+
+
+def _end_stream(streamer: AsyncTextIteratorStreamer, generation: asyncio.Future):
+    # a generation that failed before streaming anything would otherwise leave the client waiting
+    if generation.cancelled() or generation.exception() is not None:
+        streamer.cancel()
+
+
 class ServeCommand(BaseTransformersCLICommand):
     @staticmethod
     def register_subcommand(parser: ArgumentParser):
@@ -119,10 +237,42 @@ class ServeCommand(BaseTransformersCLICommand):
             default=-1,
             help="Indicate the device to run onto, -1 indicates CPU, >= 0 indicates GPU (default: -1)",
         )
+        serve_parser.add_argument(
+            "--max_batch_size",
+            type=int,
+            default=1,
+            help="Maximum number of inputs of concurrent requests batched together by the pipeline (default: 1).",
+        )
+        serve_parser.add_argument(
+            "--max_wait_time",
+            type=float,
+            default=0.005,
+            help="Maximum time, in seconds, a request waits for other requests to fill its batch (default: 0.005).",
+        )
+        serve_parser.add_argument(
+            "--stream_timeout",
+            type=float,
+            default=10.0,
+            help=(
+                "Maximum time, in seconds, a streamed generation waits for a slow client before it is stopped, as it "
+                "blocks the other requests meanwhile (default: 10.0)."
+            ),
+        )
         serve_parser.set_defaults(func=serve_command_factory)
 
-    def __init__(self, pipeline: Pipeline, host: str, port: int, workers: int):
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        host: str,
+        port: int,
+        workers: int,
+        max_batch_size: int = 1,
+        max_wait_time: float = 0.005,
+        stream_timeout: float = 10.0,
+    ):
         self._pipeline = pipeline
+        self._batcher = MicroBatcher(pipeline, max_batch_size=max_batch_size, max_wait_time=max_wait_time)
+        self._stream_timeout = stream_timeout
 
         self.host = host
         self.port = port
@@ -169,6 +319,9 @@ class ServeCommand(BaseTransformersCLICommand):
                 ],
                 timeout=600,
             )
+            # the generation endpoints stream the text as it is generated
+            if pipeline.framework == "pt" and pipeline.task in ("text-generation", "text2text-generation"):
+                self._app.add_api_route("/generate_stream", self.generate_stream, methods=["POST"])
 
     def run(self):
         run(self._app, host=self.host, port=self.port, workers=self.workers)
@@ -221,8 +374,51 @@ class ServeCommand(BaseTransformersCLICommand):
             return ServeForwardResult(output=[], attention=[])
 
         try:
-            # Forward through the model
-            output = self._pipeline(inputs)
+            # Forward through the model, batched with the concurrent requests
+            output = await self._batcher(inputs)
             return ServeForwardResult(output=output)
         except Exception as e:
             raise HTTPException(500, {"error": str(e)})
+
+    async def generate_stream(self, inputs: str = Body(None, embed=True), parameters: dict = Body(None, embed=True)):
+        """
+        Generates text from the provided prompt and streams it as it is generated: - **inputs**: The prompt -
+        **parameters**: Generation parameters, e.g. `max_new_tokens` or `do_sample`. The generation stops when the
+        client disconnects, or when it waited more than `stream_timeout` seconds for a slow client, since it holds the
+        thread of the pipeline and blocks the other requests.
+        """
+        try:
+            streamer = AsyncTextIteratorStreamer(
+                self._pipeline.tokenizer,
+                skip_prompt=True,
+                max_queue_size=16,
+                put_timeout=self._stream_timeout,
+                skip_special_tokens=True,
+            )
+            stopping_criteria = StoppingCriteriaList([_CancellationCriteria(streamer.cancelled)])
+            # the pipeline preprocesses the prompt and runs the generation in the thread of the batcher
+            generation = asyncio.ensure_future(
+                self._batcher.run(
+                    self._pipeline,
+                    inputs,
+                    streamer=streamer,
+                    stopping_criteria=stopping_criteria,
+                    **(parameters or {}),
+                )
+            )
+            generation.add_done_callback(functools.partial(_end_stream, streamer))
+        except Exception as e:
+            raise HTTPException(500, {"error": str(e)})
+
+        async def stream_text():
+            try:
+                async for text in streamer:
+                    yield text
+                await generation
+            except Full:
+                logger.warning(f"The client did not read the stream for {self._stream_timeout}s, it was stopped.")
+            finally:
+                # stops the generation when the client disconnects
+                streamer.cancel()
+
+        return StreamingResponse(stream_text(), media_type="text/plain")
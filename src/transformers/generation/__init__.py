@@ -19,7 +19,7 @@ from ..utils import OptionalDependencyNotAvailable, _LazyModule, is_flax_availab
 
 _import_structure = {
     "configuration_utils": ["GenerationConfig"],
-    "streamers": ["TextIteratorStreamer", "TextStreamer"],
+    "streamers": ["AsyncTextIteratorStreamer", "TextIteratorStreamer", "TextStreamer"],
 }
 
 try:
@@ -39,7 +39,9 @@ else:
         "BeamScorer",
         "BeamSearchScorer",
         "ConstrainedBeamSearchScorer",
+        "VectorizedBeamSearchScorer",
     ]
+    _import_structure["continuous_batching"] = ["ContinuousBatchingEngine", "GenerationRequest"]
     _import_structure["logits_process"] = [
         "AlternatingCodebooksLogitsProcessor",
         "ClassifierFreeGuidanceLogitsProcessor",
@@ -164,7 +166,7 @@ else:
 
 if TYPE_CHECKING:
     from .configuration_utils import GenerationConfig
-    from .streamers import TextIteratorStreamer, TextStreamer
+    from .streamers import AsyncTextIteratorStreamer, TextIteratorStreamer, TextStreamer
 
     try:
         if not is_torch_available():
@@ -173,7 +175,14 @@ if TYPE_CHECKING:
         pass
     else:
         from .beam_constraints import Constraint, ConstraintListState, DisjunctiveConstraint, PhrasalConstraint
-        from .beam_search import BeamHypotheses, BeamScorer, BeamSearchScorer, ConstrainedBeamSearchScorer
+        from .beam_search import (
+            BeamHypotheses,
+            BeamScorer,
+            BeamSearchScorer,
+            ConstrainedBeamSearchScorer,
+            VectorizedBeamSearchScorer,
+        )
+        from .continuous_batching import ContinuousBatchingEngine, GenerationRequest
         from .logits_process import (
             AlternatingCodebooksLogitsProcessor,
             ClassifierFreeGuidanceLogitsProcessor,
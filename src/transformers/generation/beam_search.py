@@ -407,6 +407,288 @@ class BeamSearchScorer(BeamScorer):
         )
 
 
+class VectorizedBeamSearchScorer(BeamScorer):
+    r"""
+    [`BeamScorer`] implementing standard beam search decoding with tensor operations only. It is a drop-in
+    replacement for [`BeamSearchScorer`] in [`~PreTrainedModel.beam_search`] and [`~PreTrainedModel.beam_sample`]:
+    instead of looping over the batch and the beam candidates in Python, the candidates of all the batch items are
+    processed at once, and the finished hypotheses are kept in tensors rather than in per-item lists. This removes most
+    of the bookkeeping overhead between two forward passes for large batches or numbers of beams.
+
+    Diverse (group) beam search is not supported, use [`BeamSearchScorer`] instead.
+
+    Args:
+        batch_size (`int`):
+            Batch Size of `input_ids` for which standard beam search decoding is run in parallel.
+        num_beams (`int`):
+            Number of beams for beam search.
+        device (`torch.device`):
+            Defines the device type (*e.g.*, `"cpu"` or `"cuda"`) on which this instance of
+            `VectorizedBeamSearchScorer` will be allocated.
+        length_penalty (`float`, *optional*, defaults to 1.0):
+            Exponential penalty to the length that is used with beam-based generation. It is applied as an exponent to
+            the sequence length, which in turn is used to divide the score of the sequence. Since the score is the log
+            likelihood of the sequence (i.e. negative), `length_penalty` > 0.0 promotes longer sequences, while
+            `length_penalty` < 0.0 encourages shorter sequences.
+        do_early_stopping (`bool` or `str`, *optional*, defaults to `False`):
+            Controls the stopping condition for beam-based methods, like beam-search. It accepts the following values:
+            `True`, where the generation stops as soon as there are `num_beams` complete candidates; `False`, where an
+            heuristic is applied and the generation stops when is it very unlikely to find better candidates;
+            `"never"`, where the beam search procedure only stops when there cannot be better candidates (canonical
+            beam search algorithm).
+        num_beam_hyps_to_keep (`int`, *optional*, defaults to 1):
+            The number of beam hypotheses that shall be returned upon calling
+            [`~transformer.VectorizedBeamSearchScorer.finalize`].
+        max_length (`int`, *optional*):
+            The maximum length of the sequence to be generated.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        num_beams: int,
+        device: torch.device,
+        length_penalty: Optional[float] = 1.0,
+        do_early_stopping: Optional[Union[bool, str]] = False,
+        num_beam_hyps_to_keep: Optional[int] = 1,
+        max_length: Optional[int] = None,
+    ):
+        if not isinstance(num_beams, int) or num_beams <= 1:
+            raise ValueError(
+                f"`num_beams` has to be an integer strictly greater than 1, but is {num_beams}. For `num_beams` == 1,"
+                " one should make use of `greedy_search` instead."
+            )
+        if not isinstance(do_early_stopping, bool) and max_length is None:
+            raise ValueError(
+                "When `do_early_stopping` is set to a string, `max_length` must be defined. Ensure it is passed to the"
+                " BeamScorer class instance at initialization time."
+            )
+
+        self.batch_size = batch_size
+        self.num_beams = num_beams
+        self.num_beam_groups = 1
+        self.device = device
+        self.length_penalty = length_penalty
+        self.do_early_stopping = do_early_stopping
+        self.num_beam_hyps_to_keep = num_beam_hyps_to_keep
+        self.max_length = max_length
+
+        # the finished hypotheses of the i-th batch item are stored in the i-th row of these tensors. Sequences and
+        # beam indices are right-padded, and grow with the length of the longest finished hypothesis.
+        self._hyp_scores = torch.zeros((batch_size, num_beams), dtype=torch.float64, device=device)
+        self._hyp_is_set = torch.zeros((batch_size, num_beams), dtype=torch.bool, device=device)
+        self._hyp_lengths = torch.zeros((batch_size, num_beams), dtype=torch.long, device=device)
+        self._hyp_sequences = torch.zeros((batch_size, num_beams, 0), dtype=torch.long, device=device)
+        self._hyp_beam_indices = torch.full((batch_size, num_beams, 0), -1, dtype=torch.long, device=device)
+        self._done = torch.zeros(batch_size, dtype=torch.bool, device=device)
+
+    @property
+    def is_done(self) -> bool:
+        return self._done.all()
+
+    @add_start_docstrings(PROCESS_INPUTS_DOCSTRING)
+    def process(
+        self,
+        input_ids: torch.LongTensor,
+        next_scores: torch.FloatTensor,
+        next_tokens: torch.LongTensor,
+        next_indices: torch.LongTensor,
+        pad_token_id: Optional[int] = None,
+        eos_token_id: Optional[Union[int, List[int]]] = None,
+        beam_indices: Optional[torch.LongTensor] = None,
+        group_index: Optional[int] = 0,
+    ) -> Dict[str, torch.Tensor]:
+        cur_len = input_ids.shape[-1] + 1  # add up to the length which the next_scores is calculated on
+        batch_size, num_beams = self.batch_size, self.num_beams
+        if input_ids.shape[0] != batch_size * num_beams:
+            raise ValueError(
+                f"A beam size of {input_ids.shape[0]} is used as the input, but a beam size of {num_beams} is expected"
+                " by the beam scorer."
+            )
+        if group_index != 0:
+            raise ValueError("`VectorizedBeamSearchScorer` does not support group beam search.")
+        if self._done.any() and (eos_token_id is None or pad_token_id is None):
+            raise ValueError("Generated beams >= num_beams -> eos_token_id and pad_token have to be defined")
+
+        device = input_ids.device
+        num_candidates = next_tokens.shape[1]
+        candidate_ranks = torch.arange(num_candidates, device=device)
+        batch_beam_offsets = torch.arange(batch_size, device=device)[:, None] * num_beams
+        is_running = ~self._done[:, None]
+
+        if eos_token_id is not None:
+            if isinstance(eos_token_id, int):
+                eos_token_id = [eos_token_id]
+            is_eos = torch.isin(next_tokens, torch.tensor(eos_token_id, device=device))
+        else:
+            is_eos = torch.zeros_like(next_tokens, dtype=torch.bool)
+
+        # the first `num_beams` candidates that are not eos tokens are the beams of the next step
+        num_non_eos = (~is_eos).cumsum(dim=1)
+        if ((num_non_eos[:, -1:] < num_beams) & is_running).any():
+            raise ValueError(
+                f"At most {num_beams} tokens in {next_tokens} can be equal to `eos_token_id: {eos_token_id}`. Make"
+                f" sure {next_tokens} are corrected."
+            )
+        is_next_beam = ~is_eos & (num_non_eos <= num_beams)
+        next_beam_ranks = candidate_ranks.expand_as(is_eos).masked_fill(~is_next_beam, num_candidates)
+        next_beam_ranks = next_beam_ranks.sort(dim=1).values
+        next_beam_ranks = next_beam_ranks[:, :num_beams].clamp(max=num_candidates - 1)
+
+        next_beam_scores = next_scores.gather(1, next_beam_ranks).masked_fill(~is_running, 0)
+        next_beam_tokens = next_tokens.gather(1, next_beam_ranks)
+        if pad_token_id is not None:
+            next_beam_tokens = next_beam_tokens.masked_fill(~is_running, pad_token_id)
+        next_beam_indices = next_indices.gather(1, next_beam_ranks) + batch_beam_offsets
+        next_beam_indices = next_beam_indices.masked_fill(~is_running, 0)
+
+        # eos tokens end a hypothesis only if they belong to the top `num_beams` candidates
+        is_finished = is_eos[:, :num_beams] & is_running
+        if is_finished.any():
+            batch_beam_idx = next_indices[:, :num_beams] + batch_beam_offsets
+            if beam_indices is not None:
+                if not isinstance(beam_indices, torch.Tensor):
+                    beam_indices = torch.tensor(beam_indices, dtype=torch.long, device=device)
+                hyp_beam_indices = torch.cat([beam_indices[batch_beam_idx], batch_beam_idx[..., None]], dim=-1)
+            else:
+                hyp_beam_indices = None
+            self._add_hypotheses(
+                input_ids[batch_beam_idx], next_scores[:, :num_beams], is_finished, beam_indices=hyp_beam_indices
+            )
+
+        # check if we are done so that we can save a pad step if all(done)
+        self._done |= self._is_done(next_scores.max(dim=1).values, cur_len)
+
+        return UserDict(
+            {
+                "next_beam_scores": next_beam_scores.view(-1),
+                "next_beam_tokens": next_beam_tokens.view(-1),
+                "next_beam_indices": next_beam_indices.view(-1),
+            }
+        )
+
+    @add_start_docstrings(FINALIZE_INPUTS_DOCSTRING)
+    def finalize(
+        self,
+        input_ids: torch.LongTensor,
+        final_beam_scores: torch.FloatTensor,
+        final_beam_tokens: torch.LongTensor,
+        final_beam_indices: torch.LongTensor,
+        max_length: int,
+        pad_token_id: Optional[int] = None,
+        eos_token_id: Optional[Union[int, List[int]]] = None,
+        beam_indices: Optional[torch.LongTensor] = None,
+    ) -> Tuple[torch.LongTensor]:
+        batch_size, num_beams, num_hyps_to_keep = self.batch_size, self.num_beams, self.num_beam_hyps_to_keep
+        device = input_ids.device
+
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+
+        # all open beam hypotheses of the batch items that are not done are added to the finished hypotheses, which
+        # automatically keep the best beams
+        if beam_indices is not None and not isinstance(beam_indices, torch.Tensor):
+            beam_indices = torch.tensor(beam_indices, dtype=torch.long, device=device)
+        self._add_hypotheses(
+            input_ids.view(batch_size, num_beams, -1),
+            final_beam_scores.view(batch_size, num_beams),
+            ~self._done[:, None].expand(-1, num_beams),
+            beam_indices=beam_indices.view(batch_size, num_beams, -1) if beam_indices is not None else None,
+        )
+
+        # select the best hypotheses, the hypotheses are sorted by decreasing score
+        best_scores = self._hyp_scores[:, :num_hyps_to_keep].reshape(-1).to(torch.float32)
+        sent_lengths = self._hyp_lengths[:, :num_hyps_to_keep].reshape(-1)
+        best_sequences = self._hyp_sequences[:, :num_hyps_to_keep].flatten(0, 1)
+
+        # prepare for adding eos
+        sent_lengths_max = sent_lengths.max().item() + 1
+        sent_max_len = min(sent_lengths_max, max_length) if max_length is not None else sent_lengths_max
+        if pad_token_id is None and sent_lengths.min().item() != sent_lengths_max - 1:
+            raise ValueError("`pad_token_id` has to be defined")
+
+        # fill with hypotheses and eos_token_id if the latter fits in, shorter hypotheses are padded
+        positions = torch.arange(sent_max_len, device=device)[None, :]
+        decoded = _pad_last_dim(best_sequences, sent_max_len, 0)[:, :sent_max_len]
+        if pad_token_id is not None:
+            decoded = decoded.masked_fill(positions > sent_lengths[:, None], pad_token_id)
+        if eos_token_id is not None:
+            decoded = decoded.masked_fill(positions == sent_lengths[:, None], eos_token_id[0])
+
+        if beam_indices is not None:
+            indices = self._hyp_beam_indices[:, :num_hyps_to_keep].flatten(0, 1)
+            indices = _pad_last_dim(indices, sent_max_len, -1)[:, :sent_max_len]
+        else:
+            indices = None
+
+        return UserDict(
+            {
+                "sequences": decoded,
+                "sequence_scores": best_scores,
+                "beam_indices": indices,
+            }
+        )
+
+    def _add_hypotheses(
+        self,
+        sequences: torch.LongTensor,
+        sum_logprobs: torch.FloatTensor,
+        mask: torch.BoolTensor,
+        beam_indices: Optional[torch.LongTensor] = None,
+    ):
+        """
+        Adds the hypotheses of shape `(batch_size, num_candidates, sequence_length)` for which `mask` is set to the
+        finished hypotheses, keeping the `num_beams` best ones per batch item sorted by decreasing score.
+        """
+        scores = sum_logprobs.to(torch.float64) / (sequences.shape[-1] ** self.length_penalty)
+        lengths = torch.full_like(mask, sequences.shape[-1], dtype=torch.long)
+
+        all_scores = torch.cat([self._hyp_scores, scores], dim=1)
+        all_is_set = torch.cat([self._hyp_is_set, mask], dim=1)
+        # stable sort: on ties, the hypotheses that were already stored are kept
+        order = all_scores.masked_fill(~all_is_set, float("-inf")).sort(dim=1, descending=True, stable=True).indices
+        order = order[:, : self.num_beams]
+
+        self._hyp_scores = all_scores.gather(1, order)
+        self._hyp_is_set = all_is_set.gather(1, order)
+        self._hyp_lengths = torch.cat([self._hyp_lengths, lengths], dim=1).gather(1, order)
+        self._hyp_sequences = _gather_padded_rows(self._hyp_sequences, sequences, order, 0)
+        if beam_indices is not None:
+            self._hyp_beam_indices = _gather_padded_rows(self._hyp_beam_indices, beam_indices, order, -1)
+
+    def _is_done(self, best_sum_logprobs: torch.FloatTensor, cur_len: int) -> torch.BoolTensor:
+        """
+        Batch items are done when they have `num_beams` finished hypotheses and none of the hypotheses being
+        generated can become better than the worst finished one.
+        """
+        is_full = self._hyp_is_set.all(dim=1)
+        # `True`: stop as soon as at least `num_beams` hypotheses are finished
+        if self.do_early_stopping is True:
+            return is_full
+
+        # `False`: heuristic -- compute best possible score from `cur_len`. `"never"`: compute the best possible
+        # score, depending on the signal of `length_penalty` (see `BeamHypotheses.is_done`)
+        if self.do_early_stopping is not False and self.length_penalty > 0.0:
+            highest_attainable_score = best_sum_logprobs.to(torch.float64) / self.max_length**self.length_penalty
+        else:
+            highest_attainable_score = best_sum_logprobs.to(torch.float64) / cur_len**self.length_penalty
+        worst_score = self._hyp_scores.masked_fill(~self._hyp_is_set, float("inf")).min(dim=1).values
+        return is_full & (worst_score >= highest_attainable_score)
+
+
+def _pad_last_dim(tensor: torch.Tensor, length: int, value: int) -> torch.Tensor:
+    if tensor.shape[-1] >= length:
+        return tensor
+    return torch.nn.functional.pad(tensor, (0, length - tensor.shape[-1]), value=value)
+
+
+def _gather_padded_rows(stored: torch.Tensor, new: torch.Tensor, order: torch.LongTensor, value: int) -> torch.Tensor:
+    """Gathers `order` along dim 1 of the concatenation of `stored` and `new`, right-padded to the same length."""
+    length = max(stored.shape[-1], new.shape[-1])
+    rows = torch.cat([_pad_last_dim(stored, length, value), _pad_last_dim(new, length, value)], dim=1)
+    return rows.gather(1, order[..., None].expand(-1, -1, length))
+
+
 class ConstrainedBeamSearchScorer(BeamScorer):
     r"""
     [`BeamScorer`] implementing constrained beam search decoding.
@@ -98,6 +98,12 @@ class GenerationConfig(PushToHubMixin):
         use_cache (`bool`, *optional*, defaults to `True`):
             Whether or not the model should use the past last key/values attentions (if applicable to the model) to
             speed up decoding.
+        cache_implementation (`str`, *optional*):
+            Cache class to instantiate for generation. Set to `"static"` to use a [`StaticCache`], which preallocates
+            the key/value buffers for `max_length` tokens once and writes into them in place at each step, instead of
+            concatenating new states to the cache, so that the shapes of the attention stay fixed. Only available for
+            models supporting [`Cache`] instances (e.g. Llama and GPT-NeoX), and not with contrastive search or
+            assisted generation. Ignored when `use_cache` is `False`.
 
         > Parameters for manipulation of the model output logits
 
@@ -248,6 +254,7 @@ class GenerationConfig(PushToHubMixin):
         self.num_beam_groups = kwargs.pop("num_beam_groups", 1)
         self.penalty_alpha = kwargs.pop("penalty_alpha", None)
         self.use_cache = kwargs.pop("use_cache", True)
+        self.cache_implementation = kwargs.pop("cache_implementation", None)
 
         # Parameters for manipulation of the model output logits
         self.temperature = kwargs.pop("temperature", 1.0)
@@ -342,6 +349,8 @@ class GenerationConfig(PushToHubMixin):
         # Validation of individual attributes
         if self.early_stopping not in {True, False, "never"}:
             raise ValueError(f"`early_stopping` must be a boolean or 'never', but is {self.early_stopping}.")
+        if self.cache_implementation not in {None, "static"}:
+            raise ValueError(f"`cache_implementation` must be `None` or 'static', but is {self.cache_implementation}.")
 
         # Validation of attribute relations:
         fix_location = ""
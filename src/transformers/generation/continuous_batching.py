@@ -0,0 +1,413 @@
+# coding=utf-8
+# Copyright 2023 The HuggingFace Inc. team.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple, Union
+
+import torch
+
+from .configuration_utils import GenerationConfig
+from .logits_process import LogitsProcessorList
+from .stopping_criteria import StoppingCriteriaList
+
+
+if TYPE_CHECKING:
+    from ..modeling_utils import PreTrainedModel
+    from .streamers import BaseStreamer
+
+
+@dataclass
+class GenerationRequest:
+    """
+    A single prompt tracked by the [`ContinuousBatchingEngine`].
+
+    Args:
+        request_id (`int`):
+            Unique identifier returned by [`~ContinuousBatchingEngine.add_request`].
+        prompt_length (`int`):
+            Number of tokens in the prompt.
+        sequences (`torch.LongTensor` of shape `(sequence_length,)`):
+            The prompt followed by all the tokens generated so far.
+        generation_config ([`~generation.GenerationConfig`]):
+            The generation configuration used for this request.
+        finished (`bool`):
+            Whether the request reached a stopping condition (EOS token or stopping criteria).
+    """
+
+    request_id: int
+    prompt_length: int
+    sequences: torch.LongTensor
+    generation_config: GenerationConfig
+    logits_processor: LogitsProcessorList = field(repr=False)
+    logits_warper: Optional[LogitsProcessorList] = field(repr=False)
+    stopping_criteria: StoppingCriteriaList = field(repr=False)
+    streamer: Optional["BaseStreamer"] = field(default=None, repr=False)
+    finished: bool = False
+
+    @property
+    def generated_ids(self) -> torch.LongTensor:
+        """The tokens generated for this request, without the prompt."""
+        return self.sequences[self.prompt_length :]
+
+
+class ContinuousBatchingEngine:
+    """
+    Scheduler implementing continuous (in-flight) batching on top of a decoder-only model with a language modeling
+    head. Contrary to [`~generation.GenerationMixin.generate`], which runs a static batch until its longest sequence is
+    done, the engine evicts finished requests after every decoding step and admits waiting prompts into the freed
+    batch slots, so the batch stays full under mixed-length traffic.
+
+    Each request carries its own [`~generation.GenerationConfig`] and therefore its own logits processors, logits
+    warpers and stopping criteria, built with the same helpers `generate()` uses. Only greedy decoding and multinomial
+    sampling (`num_beams=1`) are supported.
+
+    The key/value cache of the running requests is kept as a single left-padded batch in the standard
+    `past_key_values` format (a tuple with one `(key, value)` tuple per layer, each of shape `(batch_size, num_heads,
+    sequence_length, head_dim)`), and the model must compute its position ids from the attention mask in
+    `prepare_inputs_for_generation` (e.g. GPT-2, GPT-NeoX, Llama).
+
+    <Tip warning={true}>
+
+    This API is experimental and may change in the future.
+
+    </Tip>
+
+    Args:
+        model ([`PreTrainedModel`]):
+            A decoder-only model with a language modeling head.
+        max_batch_size (`int`, *optional*, defaults to 8):
+            Maximum number of requests decoded together.
+        generation_config ([`~generation.GenerationConfig`], *optional*):
+            Default generation configuration for the requests. Defaults to `model.generation_config`.
+
+    Examples:
+
+    ```python
+    >>> from transformers import AutoModelForCausalLM, AutoTokenizer, ContinuousBatchingEngine
+
+    >>> tokenizer = AutoTokenizer.from_pretrained("gpt2")
+    >>> model = AutoModelForCausalLM.from_pretrained("gpt2")
+    >>> engine = ContinuousBatchingEngine(model, max_batch_size=4)
+
+    >>> prompts = ["Hello, my dog is", "The capital of France", "One, two,"]
+    >>> outputs = engine.generate([tokenizer(p).input_ids for p in prompts], max_new_tokens=5, do_sample=False)
+    >>> len(outputs)
+    3
+    ```
+    """
+
+    def __init__(
+        self,
+        model: "PreTrainedModel",
+        max_batch_size: int = 8,
+        generation_config: Optional[GenerationConfig] = None,
+    ):
+        if model.config.is_encoder_decoder:
+            raise ValueError("`ContinuousBatchingEngine` only supports decoder-only models.")
+        if max_batch_size < 1:
+            raise ValueError(f"`max_batch_size` has to be a strictly positive integer, but is {max_batch_size}")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.generation_config = generation_config if generation_config is not None else model.generation_config
+
+        self.waiting: Deque[GenerationRequest] = deque()
+        self.running: List[GenerationRequest] = []
+        self._request_counter = itertools.count()
+
+        # batched state of the running requests
+        self._past_key_values: Optional[Tuple[Tuple[torch.Tensor, torch.Tensor]]] = None
+        self._attention_mask: Optional[torch.LongTensor] = None
+
+    def add_request(
+        self,
+        input_ids: Union[torch.LongTensor, List[int]],
+        generation_config: Optional[GenerationConfig] = None,
+        logits_processor: Optional[LogitsProcessorList] = None,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+        streamer: Optional["BaseStreamer"] = None,
+        **kwargs,
+    ) -> int:
+        """
+        Queues a prompt. It will be admitted into the running batch as soon as a slot frees up.
+
+        Args:
+            input_ids (`torch.LongTensor` of shape `(sequence_length,)` or `List[int]`):
+                The prompt token ids, without padding.
+            generation_config ([`~generation.GenerationConfig`], *optional*):
+                Generation configuration for this request. Defaults to the engine's generation configuration.
+            logits_processor (`LogitsProcessorList`, *optional*):
+                Custom logits processors that complement the ones built from the generation configuration.
+            stopping_criteria (`StoppingCriteriaList`, *optional*):
+                Custom stopping criteria that complement the ones built from the generation configuration.
+            streamer (`BaseStreamer`, *optional*):
+                Streamer receiving the prompt and then each new token of this request.
+            kwargs:
+                Ad hoc parametrization of `generation_config`.
+
+        Return:
+            `int`: The id of the request.
+        """
+        if generation_config is None:
+            generation_config = self.generation_config
+        generation_config = copy.deepcopy(generation_config)
+        unused_kwargs = generation_config.update(**kwargs)
+        if len(unused_kwargs) > 0:
+            raise ValueError(
+                f"The following `kwargs` are not generation parameters and are not supported by continuous batching: "
+                f"{list(unused_kwargs)}"
+            )
+        generation_config.validate()
+        if generation_config.num_beams != 1:
+            raise ValueError("Continuous batching only supports greedy decoding and sampling (`num_beams=1`).")
+
+        if not isinstance(input_ids, torch.Tensor):
+            input_ids = torch.tensor(input_ids, dtype=torch.long)
+        if input_ids.dim() == 2 and input_ids.shape[0] == 1:
+            input_ids = input_ids[0]
+        if input_ids.dim() != 1 or input_ids.shape[0] == 0:
+            raise ValueError("`input_ids` has to be a non-empty, unbatched sequence of token ids.")
+        input_ids = input_ids.to(self.model.device)
+
+        prompt_length = input_ids.shape[0]
+        if generation_config.max_new_tokens is not None:
+            generation_config.max_length = generation_config.max_new_tokens + prompt_length
+
+        logits_processor = self.model._get_logits_processor(
+            generation_config=generation_config,
+            input_ids_seq_length=prompt_length,
+            encoder_input_ids=input_ids[None],
+            prefix_allowed_tokens_fn=None,
+            logits_processor=logits_processor if logits_processor is not None else LogitsProcessorList(),
+            model_kwargs={"use_cache": True},
+        )
+        logits_warper = self.model._get_logits_warper(generation_config) if generation_config.do_sample else None
+        stopping_criteria = self.model._get_stopping_criteria(
+            generation_config=generation_config,
+            stopping_criteria=stopping_criteria if stopping_criteria is not None else StoppingCriteriaList(),
+        )
+
+        request = GenerationRequest(
+            request_id=next(self._request_counter),
+            prompt_length=prompt_length,
+            sequences=input_ids,
+            generation_config=generation_config,
+            logits_processor=logits_processor,
+            logits_warper=logits_warper,
+            stopping_criteria=stopping_criteria,
+            streamer=streamer,
+        )
+        self.waiting.append(request)
+        return request.request_id
+
+    def has_unfinished_requests(self) -> bool:
+        """Whether some requests are still waiting or being decoded."""
+        return len(self.waiting) > 0 or len(self.running) > 0
+
+    @torch.no_grad()
+    def step(self) -> List[GenerationRequest]:
+        """
+        Runs one decoding step for the running requests, evicts the ones that finished and prefills waiting requests
+        into the free batch slots.
+
+        Return:
+            `List[GenerationRequest]`: The requests that finished during this step.
+        """
+        finished = []
+        if len(self.running) > 0:
+            finished.extend(self._decode())
+        if len(self.waiting) > 0 and len(self.running) < self.max_batch_size:
+            finished.extend(self._prefill())
+        return finished
+
+    def generate(self, inputs: List[Union[torch.LongTensor, List[int]]], **kwargs) -> List[torch.LongTensor]:
+        """
+        Generates a continuation for each prompt of `inputs` with continuous batching, and returns the full sequences
+        (prompt followed by the generated tokens) in the order of `inputs`.
+
+        Args:
+            inputs (`List[torch.LongTensor]` or `List[List[int]]`):
+                The unpadded prompts.
+            kwargs:
+                Arguments passed to [`~ContinuousBatchingEngine.add_request`] for every prompt.
+        """
+        request_ids = [self.add_request(input_ids, **kwargs) for input_ids in inputs]
+        results: Dict[int, torch.LongTensor] = {}
+        while self.has_unfinished_requests():
+            for request in self.step():
+                results[request.request_id] = request.sequences
+        return [results[request_id] for request_id in request_ids]
+
+    def _select_next_token(self, request: GenerationRequest, next_token_logits: torch.FloatTensor) -> torch.LongTensor:
+        input_ids = request.sequences[None]
+        next_token_scores = request.logits_processor(input_ids, next_token_logits[None])
+        if request.logits_warper is not None:
+            next_token_scores = request.logits_warper(input_ids, next_token_scores)
+            probs = torch.nn.functional.softmax(next_token_scores, dim=-1)
+            return torch.multinomial(probs, num_samples=1)[0]
+        return torch.argmax(next_token_scores, dim=-1)
+
+    def _append_token(self, request: GenerationRequest, next_token: torch.LongTensor):
+        request.sequences = torch.cat([request.sequences, next_token])
+        if request.streamer is not None:
+            request.streamer.put(next_token.cpu())
+
+        eos_token_id = request.generation_config.eos_token_id
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        if eos_token_id is not None and next_token.item() in eos_token_id:
+            request.finished = True
+        elif request.stopping_criteria(request.sequences[None], None):
+            request.finished = True
+
+        if request.finished and request.streamer is not None:
+            request.streamer.end()
+
+    def _prefill(self) -> List[GenerationRequest]:
+        num_admitted = min(self.max_batch_size - len(self.running), len(self.waiting))
+        admitted = [self.waiting.popleft() for _ in range(num_admitted)]
+
+        # left-pad the new prompts into a single batch
+        max_prompt_length = max(request.prompt_length for request in admitted)
+        input_ids = torch.zeros((num_admitted, max_prompt_length), dtype=torch.long, device=self.model.device)
+        attention_mask = torch.zeros_like(input_ids)
+        for i, request in enumerate(admitted):
+            input_ids[i, max_prompt_length - request.prompt_length :] = request.sequences
+            attention_mask[i, max_prompt_length - request.prompt_length :] = 1
+            if request.streamer is not None:
+                request.streamer.put(request.sequences.cpu())
+
+        model_inputs = self.model.prepare_inputs_for_generation(
+            input_ids, attention_mask=attention_mask, use_cache=True
+        )
+        outputs = self.model(**model_inputs, return_dict=True)
+        past_key_values = self.model._extract_past_from_model_output(outputs)
+        _check_standard_cache_format(past_key_values)
+
+        next_token_logits = outputs.logits[:, -1, :]
+        for i, request in enumerate(admitted):
+            self._append_token(request, self._select_next_token(request, next_token_logits[i]))
+
+        self._merge_into_batch(admitted, past_key_values, attention_mask)
+        return [request for request in admitted if request.finished]
+
+    def _decode(self) -> List[GenerationRequest]:
+        input_ids = torch.stack([request.sequences[-1:] for request in self.running])
+        attention_mask = torch.cat([self._attention_mask, self._attention_mask.new_ones((len(self.running), 1))], -1)
+
+        model_inputs = self.model.prepare_inputs_for_generation(
+            input_ids, past_key_values=self._past_key_values, attention_mask=attention_mask, use_cache=True
+        )
+        outputs = self.model(**model_inputs, return_dict=True)
+        self._past_key_values = self.model._extract_past_from_model_output(outputs)
+        self._attention_mask = attention_mask
+
+        next_token_logits = outputs.logits[:, -1, :]
+        for i, request in enumerate(self.running):
+            self._append_token(request, self._select_next_token(request, next_token_logits[i]))
+
+        finished = [request for request in self.running if request.finished]
+        if len(finished) > 0:
+            self._evict_finished()
+        return finished
+
+    def _merge_into_batch(
+        self,
+        admitted: List[GenerationRequest],
+        past_key_values: Tuple[Tuple[torch.Tensor, torch.Tensor]],
+        attention_mask: torch.LongTensor,
+    ):
+        """Appends the freshly prefilled requests to the running batch, left-padding whichever cache is shorter."""
+        keep = [i for i, request in enumerate(admitted) if not request.finished]
+        if len(keep) == 0:
+            return
+        if len(keep) < len(admitted):
+            past_key_values, attention_mask = _select_batch_rows(past_key_values, attention_mask, keep)
+            past_key_values, attention_mask = _trim_left_padding(past_key_values, attention_mask)
+        new_requests = [admitted[i] for i in keep]
+
+        if len(self.running) == 0:
+            self._past_key_values, self._attention_mask = past_key_values, attention_mask
+        else:
+            running_length = self._attention_mask.shape[-1]
+            new_length = attention_mask.shape[-1]
+            running_past = _pad_cache_left(self._past_key_values, new_length - running_length)
+            running_mask = _pad_mask_left(self._attention_mask, new_length - running_length)
+            past_key_values = _pad_cache_left(past_key_values, running_length - new_length)
+            attention_mask = _pad_mask_left(attention_mask, running_length - new_length)
+            self._past_key_values = tuple(
+                tuple(torch.cat([running, new], dim=0) for running, new in zip(running_layer, new_layer))
+                for running_layer, new_layer in zip(running_past, past_key_values)
+            )
+            self._attention_mask = torch.cat([running_mask, attention_mask], dim=0)
+        self.running.extend(new_requests)
+
+    def _evict_finished(self):
+        keep = [i for i, request in enumerate(self.running) if not request.finished]
+        self.running = [self.running[i] for i in keep]
+        if len(keep) == 0:
+            self._past_key_values, self._attention_mask = None, None
+            return
+        past_key_values, attention_mask = _select_batch_rows(self._past_key_values, self._attention_mask, keep)
+        self._past_key_values, self._attention_mask = _trim_left_padding(past_key_values, attention_mask)
+
+
+def _check_standard_cache_format(past_key_values: Any):
+    if past_key_values is None:
+        raise ValueError("Continuous batching requires a model that returns `past_key_values`.")
+    for layer_past in past_key_values:
+        if any(not isinstance(tensor, torch.Tensor) or tensor.dim() != 4 for tensor in layer_past):
+            raise ValueError(
+                "Continuous batching requires the standard cache format, i.e. one tensor of shape `(batch_size, "
+                "num_heads, sequence_length, head_dim)` per key and value."
+            )
+
+
+def _pad_cache_left(past_key_values, padding_length: int):
+    if padding_length <= 0:
+        return past_key_values
+    return tuple(
+        tuple(torch.nn.functional.pad(tensor, (0, 0, padding_length, 0)) for tensor in layer_past)
+        for layer_past in past_key_values
+    )
+
+
+def _pad_mask_left(attention_mask: torch.LongTensor, padding_length: int) -> torch.LongTensor:
+    if padding_length <= 0:
+        return attention_mask
+    return torch.nn.functional.pad(attention_mask, (padding_length, 0))
+
+
+def _select_batch_rows(past_key_values, attention_mask: torch.LongTensor, rows: List[int]):
+    index = torch.tensor(rows, dtype=torch.long, device=attention_mask.device)
+    past_key_values = tuple(
+        tuple(tensor.index_select(0, index.to(tensor.device)) for tensor in layer_past)
+        for layer_past in past_key_values
+    )
+    return past_key_values, attention_mask.index_select(0, index)
+
+
+def _trim_left_padding(past_key_values, attention_mask: torch.LongTensor):
+    """Drops the leading cache positions that are padding for every row of the batch."""
+    num_padding = int(attention_mask.any(dim=0).long().argmax())
+    if num_padding == 0:
+        return past_key_values, attention_mask
+    past_key_values = tuple(
+        tuple(tensor[:, :, num_padding:, :] for tensor in layer_past) for layer_past in past_key_values
+    )
+    return past_key_values, attention_mask[:, num_padding:]
@@ -15,7 +15,7 @@
 
 import inspect
 import math
-from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -688,21 +688,6 @@ def _get_generated_ngrams(banned_ngrams, prev_input_ids, ngram_size, cur_len):
     return banned_ngrams.get(ngram_idx, [])
 
 
-def _calc_banned_ngram_tokens(
-    ngram_size: int, prev_input_ids: torch.Tensor, num_hypos: int, cur_len: int
-) -> List[Iterable[int]]:
-    """Copied from fairseq for no_repeat_ngram in beam_search"""
-    if cur_len + 1 < ngram_size:
-        # return no banned tokens if we haven't generated no_repeat_ngram_size tokens yet
-        return [[] for _ in range(num_hypos)]
-    generated_ngrams = _get_ngrams(ngram_size, prev_input_ids, num_hypos)
-    banned_tokens = [
-        _get_generated_ngrams(generated_ngrams[hypo_idx], prev_input_ids[hypo_idx], ngram_size, cur_len)
-        for hypo_idx in range(num_hypos)
-    ]
-    return banned_tokens
-
-
 class NoRepeatNGramLogitsProcessor(LogitsProcessor):
     r"""
     N-grams are groups of "n" consecutive words, characters, or tokens taken from a sequence of text. Given the
@@ -751,11 +736,25 @@ class NoRepeatNGramLogitsProcessor(LogitsProcessor):
 
     @add_start_docstrings(LOGITS_PROCESSOR_INPUTS_DOCSTRING)
     def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
-        num_batch_hypotheses = scores.shape[0]
+        num_batch_hypotheses, vocab_size = scores.shape
         cur_len = input_ids.shape[-1]
-        banned_batch_tokens = _calc_banned_ngram_tokens(self.ngram_size, input_ids, num_batch_hypotheses, cur_len)
-        for i, banned_tokens in enumerate(banned_batch_tokens):
-            scores[i, banned_tokens] = -float("inf")
+        if cur_len < self.ngram_size:
+            # no banned tokens if the hypotheses don't contain a full n-gram yet
+            return scores
+
+        # the n-grams whose first `ngram_size - 1` tokens match the last `ngram_size - 1` tokens of the hypothesis
+        prefix_size = self.ngram_size - 1
+        next_tokens = input_ids[:, prefix_size:]
+        if prefix_size > 0:
+            ngram_prefixes = input_ids[:, :-1].unfold(1, prefix_size, 1)
+            matches = (ngram_prefixes == input_ids[:, None, cur_len - prefix_size :]).all(dim=-1)
+        else:
+            matches = torch.ones_like(next_tokens, dtype=torch.bool)
+
+        # their last tokens are banned, the tokens of the other n-grams are scattered to an extra, discarded, column
+        banned_tokens = torch.zeros((num_batch_hypotheses, vocab_size + 1), dtype=torch.bool, device=scores.device)
+        banned_tokens.scatter_(1, next_tokens.masked_fill(~matches, vocab_size), True)
+        scores = scores.masked_fill(banned_tokens[:, :vocab_size], -float("inf"))
 
         return scores
 
@@ -121,6 +121,16 @@ class MaxTimeCriteria(StoppingCriteria):
         return time.time() - self.initial_timestamp > self.max_time
 
 
+class _CancellationCriteria(StoppingCriteria):
+    """Stops the generation once `cancelled`, a `threading.Event`, is set from another thread."""
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return self.cancelled.is_set()
+
+
 class StoppingCriteriaList(list):
     @add_start_docstrings(STOPPING_CRITERIA_INPUTS_DOCSTRING)
     def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
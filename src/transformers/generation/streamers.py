@@ -13,7 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from queue import Queue
+import asyncio
+from queue import Full, Queue
+from threading import Event, Semaphore
 from typing import TYPE_CHECKING, Optional
 
 
@@ -74,9 +76,11 @@ class TextStreamer(BaseStreamer):
         self.skip_prompt = skip_prompt
         self.decode_kwargs = decode_kwargs
 
-        # variables used in the streaming process
+        # variables used in the streaming process: `token_cache[:read_offset]` are the last decoded tokens, kept as
+        # context to decode the next ones, and `text_cache` is the decoded text that wasn't printed yet
         self.token_cache = []
-        self.print_len = 0
+        self.read_offset = 0
+        self.text_cache = ""
         self.next_tokens_are_prompt = True
 
     def put(self, value):
@@ -92,41 +96,58 @@ class TextStreamer(BaseStreamer):
             self.next_tokens_are_prompt = False
             return
 
-        # Add the new token to the cache and decodes the entire thing.
+        # Add the new tokens to the cache and decode them, along with the last decoded tokens.
         self.token_cache.extend(value.tolist())
-        text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
+        self.text_cache += self._decode_new_tokens()
 
         # After the symbol for a new line, we flush the cache.
-        if text.endswith("\n"):
-            printable_text = text[self.print_len :]
-            self.token_cache = []
-            self.print_len = 0
+        if self.text_cache.endswith("\n"):
+            printable_text = self.text_cache
         # If the last token is a CJK character, we print the characters.
-        elif len(text) > 0 and self._is_chinese_char(ord(text[-1])):
-            printable_text = text[self.print_len :]
-            self.print_len += len(printable_text)
+        elif len(self.text_cache) > 0 and self._is_chinese_char(ord(self.text_cache[-1])):
+            printable_text = self.text_cache
         # Otherwise, prints until the last space char (simple heuristic to avoid printing incomplete words,
         # which may change with the subsequent token -- there are probably smarter ways to do this!)
         else:
-            printable_text = text[self.print_len : text.rfind(" ") + 1]
-            self.print_len += len(printable_text)
+            printable_text = self.text_cache[: self.text_cache.rfind(" ") + 1]
+        self.text_cache = self.text_cache[len(printable_text) :]
 
         self.on_finalized_text(printable_text)
 
     def end(self):
         """Flushes any remaining cache and prints a newline to stdout."""
         # Flush the cache, if it exists
-        if len(self.token_cache) > 0:
-            text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
-            printable_text = text[self.print_len :]
-            self.token_cache = []
-            self.print_len = 0
-        else:
-            printable_text = ""
+        printable_text = self.text_cache + self._decode_new_tokens(final=True)
+        self.token_cache = []
+        self.read_offset = 0
+        self.text_cache = ""
 
         self.next_tokens_are_prompt = True
         self.on_finalized_text(printable_text, stream_end=True)
 
+    def _decode_new_tokens(self, final: bool = False) -> str:
+        """
+        Returns the text of the tokens that were not decoded yet. They are decoded along with the last decoded tokens,
+        so that tokenizers whose decoding depends on the previous tokens (e.g. byte-level BPE or sentencepiece) give
+        the same text as when decoding the whole sequence. Each token is then decoded a bounded number of times,
+        instead of decoding the whole sequence on each new token.
+        """
+        prefix_text = self.tokenizer.decode(self.token_cache[: self.read_offset], **self.decode_kwargs)
+        text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
+        if text == prefix_text:
+            # the new tokens add no text (e.g. skipped special tokens): they are dropped, so that a long run of them
+            # does not grow the cache, and the last decoded tokens stay the context of the next ones
+            del self.token_cache[self.read_offset :]
+            return ""
+        # The last tokens may be an incomplete multi-byte character, wait for the next ones unless this is the end
+        if len(text) < len(prefix_text) or (text.endswith("\ufffd") and not final):
+            return ""
+
+        # only the tokens that were just decoded are kept as context for the next ones
+        del self.token_cache[: self.read_offset]
+        self.read_offset = len(self.token_cache)
+        return text[len(prefix_text) :]
+
     def on_finalized_text(self, text: str, stream_end: bool = False):
         """Prints the new text to stdout. If the stream is ending, also prints a newline."""
         print(text, flush=True, end="" if not stream_end else None)
@@ -225,3 +246,139 @@ class TextIteratorStreamer(TextStreamer):
             raise StopIteration()
         else:
             return value
+
+
+class AsyncTextIteratorStreamer(TextStreamer):
+    """
+    Streamer that stores print-ready text in an `asyncio` queue, to be used by a downstream application as an async
+    iterator. It is meant to be used with [`~generation.GenerationMixin.agenerate`], which runs the generation in a
+    worker thread of the event loop: the text is consumed with `async for`, without blocking the event loop.
+
+    When `max_queue_size` is set, the generation blocks once that many chunks of text are waiting to be consumed, so
+    that a slow consumer doesn't let the generated text pile up in memory, and `put_timeout` bounds how long it blocks
+    before giving up on the consumer. Calling
+    [`~AsyncTextIteratorStreamer.cancel`] ends the iteration and stops the generation at its next step.
+
+    <Tip warning={true}>
+
+    The API for the streamer classes is still under development and may change in the future.
+
+    </Tip>
+
+    Parameters:
+        tokenizer (`AutoTokenizer`):
+            The tokenized used to decode the tokens.
+        skip_prompt (`bool`, *optional*, defaults to `False`):
+            Whether to skip the prompt to `.generate()` or not. Useful e.g. for chatbots.
+        timeout (`float`, *optional*):
+            The timeout for the text queue, on both the generation and the consumer sides. If `None`, the queue will
+            block indefinitely.
+        max_queue_size (`int`, *optional*):
+            The maximum number of chunks of text waiting to be consumed before the generation blocks. If `None`, the
+            queue is unbounded.
+        put_timeout (`float`, *optional*):
+            The maximum time the generation waits for the consumer when `max_queue_size` chunks of text are waiting,
+            after which it raises a `queue.Full` exception, which stops it. Defaults to `timeout`.
+        decode_kwargs (`dict`, *optional*):
+            Additional keyword arguments to pass to the tokenizer's `decode` method.
+
+    Examples:
+
+        ```python
+        >>> import asyncio
+        >>> from transformers import AsyncTextIteratorStreamer, AutoModelForCausalLM, AutoTokenizer
+
+        >>> tok = AutoTokenizer.from_pretrained("gpt2")
+        >>> model = AutoModelForCausalLM.from_pretrained("gpt2")
+        >>> inputs = tok(["An increasing sequence: one,"], return_tensors="pt")
+
+
+        >>> async def main():
+        ...     # The streamer has to be created from within the event loop that consumes it.
+        ...     streamer = AsyncTextIteratorStreamer(tok, max_queue_size=8)
+        ...     generation = asyncio.create_task(model.agenerate(**inputs, streamer=streamer, max_new_tokens=20))
+        ...     generated_text = ""
+        ...     async for new_text in streamer:
+        ...         generated_text += new_text
+        ...     await generation
+        ...     return generated_text
+
+
+        >>> asyncio.run(main())
+        'An increasing sequence: one, two, three, four, five, six, seven, eight, nine, ten, eleven,'
+        ```
+    """
+
+    def __init__(
+        self,
+        tokenizer: "AutoTokenizer",
+        skip_prompt: bool = False,
+        timeout: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+        put_timeout: Optional[float] = None,
+        **decode_kwargs,
+    ):
+        super().__init__(tokenizer, skip_prompt, **decode_kwargs)
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            raise ValueError(
+                "AsyncTextIteratorStreamer has to be created from within the event loop that consumes it, e.g. in a "
+                "coroutine."
+            )
+        if max_queue_size is not None and max_queue_size < 1:
+            raise ValueError(f"`max_queue_size` has to be a strictly positive integer, but is {max_queue_size}")
+        self.text_queue = asyncio.Queue()
+        self.stop_signal = None
+        self.timeout = timeout
+        self.max_queue_size = max_queue_size
+        self.put_timeout = put_timeout if put_timeout is not None else timeout
+        self.cancelled = Event()
+        # the number of chunks of text that can still be queued before the generation blocks
+        self._free_slots = Semaphore(max_queue_size) if max_queue_size is not None else None
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        """
+        Put the new text in the queue, waiting for a free slot if the queue is full. If the stream is ending, also put
+        a stop signal in the queue. Called from the thread running the generation.
+        """
+        self._put(text)
+        if stream_end:
+            self._put(self.stop_signal)
+
+    def _put(self, value):
+        if self.cancelled.is_set():
+            return
+        if self._free_slots is not None:
+            if not self._free_slots.acquire(timeout=self.put_timeout):
+                raise Full()
+            # `cancel` releases a slot to wake the generation up
+            if self.cancelled.is_set():
+                return
+        self.loop.call_soon_threadsafe(self.text_queue.put_nowait, value)
+
+    def cancel(self):
+        """
+        Ends the iteration over the streamer and stops the generation at its next step. Can be called from any thread.
+        """
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        if self._free_slots is not None:
+            self._free_slots.release()
+        # wakes up a consumer waiting for the next chunk of text
+        self.loop.call_soon_threadsafe(self.text_queue.put_nowait, self.stop_signal)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.cancelled.is_set():
+            raise StopAsyncIteration()
+        value = await asyncio.wait_for(self.text_queue.get(), timeout=self.timeout)
+        if self._free_slots is not None:
+            self._free_slots.release()
+        if value == self.stop_signal or self.cancelled.is_set():
+            raise StopAsyncIteration()
+        else:
+            return value
@@ -14,8 +14,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import copy
+import functools
 import inspect
+import threading
 import warnings
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
@@ -24,6 +27,7 @@ import torch
 import torch.distributed as dist
 from torch import nn
 
+from ..cache_utils import PrefixCache, StaticCache
 from ..integrations.deepspeed import is_deepspeed_zero3_enabled
 from ..modeling_outputs import CausalLMOutputWithPast, Seq2SeqLMOutput
 from ..models.auto import (
@@ -35,7 +39,7 @@ from ..models.auto import (
 )
 from ..utils import ExplicitEnum, ModelOutput, is_accelerate_available, logging
 from .beam_constraints import DisjunctiveConstraint, PhrasalConstraint
-from .beam_search import BeamScorer, BeamSearchScorer, ConstrainedBeamSearchScorer
+from .beam_search import BeamScorer, BeamSearchScorer, ConstrainedBeamSearchScorer, VectorizedBeamSearchScorer
 from .configuration_utils import GenerationConfig
 from .logits_process import (
     EncoderNoRepeatNGramLogitsProcessor,
@@ -67,11 +71,14 @@ from .logits_process import (
 )
 from .stopping_criteria import (
     MaxLengthCriteria,
+    MaxNewTokensCriteria,
     MaxTimeCriteria,
     StoppingCriteria,
     StoppingCriteriaList,
+    _CancellationCriteria,
     validate_stopping_criteria,
 )
+from .streamers import AsyncTextIteratorStreamer
 
 
 if TYPE_CHECKING:
@@ -736,6 +743,12 @@ class GenerationMixin:
             for key in dict_to_expand:
                 if dict_to_expand[key] is not None and isinstance(dict_to_expand[key], torch.Tensor):
                     dict_to_expand[key] = dict_to_expand[key].repeat_interleave(expand_size, dim=0)
+                elif key == "past_key_values" and isinstance(dict_to_expand[key], tuple):
+                    # e.g. the states of a prompt prefix, computed before the expansion
+                    dict_to_expand[key] = tuple(
+                        tuple(tensor.repeat_interleave(expand_size, dim=0) for tensor in layer)
+                        for layer in dict_to_expand[key]
+                    )
             return dict_to_expand
 
         if input_ids is not None:
@@ -1310,6 +1323,7 @@ class GenerationMixin:
         streamer: Optional["BaseStreamer"] = None,
         negative_prompt_ids: Optional[torch.Tensor] = None,
         negative_prompt_attention_mask: Optional[torch.Tensor] = None,
+        prefix_cache: Optional[PrefixCache] = None,
         **kwargs,
     ) -> Union[GenerateOutput, torch.LongTensor]:
         r"""
@@ -1372,6 +1386,10 @@ class GenerationMixin:
                 size. This is an experimental feature, subject to breaking API changes in future versions.
             negative_prompt_attention_mask (`torch.LongTensor` of shape `(batch_size, sequence_length)`, *optional*):
                 Attention_mask for `negative_prompt_ids`.
+            prefix_cache ([`PrefixCache`], *optional*):
+                Store of the key/value states of previous prompts. The longest prefix the prompt shares with a stored
+                prompt is not recomputed, and the states of the prompt are stored for subsequent calls. Only supported
+                for unpadded prompts of decoder-only models.
             kwargs (`Dict[str, Any]`, *optional*):
                 Ad hoc parametrization of `generate_config` and/or additional model-specific kwargs that will be
                 forwarded to the `forward` function of the model. If the model is an encoder-decoder model, encoder
@@ -1531,6 +1549,36 @@ class GenerationMixin:
                 "`streamer` cannot be used with beam search (yet!). Make sure that `num_beams` is set to 1."
             )
 
+        if generation_config.cache_implementation is not None:
+            if model_kwargs.get("past_key_values") is not None:
+                raise ValueError(
+                    "Passing both `cache_implementation` and `past_key_values` is unsupported. Please use only one."
+                )
+            if not self._supports_cache_class:
+                raise ValueError(
+                    f"{self.__class__.__name__} does not support `cache_implementation`, as it does not accept `Cache`"
+                    " instances as `past_key_values`."
+                )
+            if generation_mode in (GenerationMode.CONTRASTIVE_SEARCH, GenerationMode.ASSISTED_GENERATION):
+                raise ValueError(f"`cache_implementation` is not supported with {generation_mode.value}.")
+            # without `use_cache`, the model is run on the whole sequence at each step and nothing is cached
+            if generation_config.cache_implementation == "static" and model_kwargs["use_cache"]:
+                model_kwargs["past_key_values"] = StaticCache(max_cache_len=generation_config.max_length)
+
+        if prefix_cache is not None:
+            if self.config.is_encoder_decoder:
+                raise ValueError("`prefix_cache` is only supported for decoder-only models.")
+            if model_kwargs.get("past_key_values") is not None or generation_config.cache_implementation is not None:
+                raise ValueError(
+                    "`prefix_cache` can't be combined with `past_key_values` or `cache_implementation`. Please use"
+                    " only one."
+                )
+            if generation_mode in (GenerationMode.CONTRASTIVE_SEARCH, GenerationMode.ASSISTED_GENERATION):
+                raise ValueError(f"`prefix_cache` is not supported with {generation_mode.value}.")
+            model_kwargs["past_key_values"] = prefix_cache.prefill(
+                self, input_ids, attention_mask=model_kwargs.get("attention_mask")
+            )
+
         if self.device.type != input_ids.device.type:
             warnings.warn(
                 "You are calling .generate() with the `input_ids` being on a device type different"
@@ -1565,11 +1613,28 @@ class GenerationMixin:
                     "num_return_sequences has to be 1 when doing assisted generate, "
                     f"but is {generation_config.num_return_sequences}."
                 )
-            if batch_size > 1:
-                raise ValueError("assisted generate is only supported for batch_size = 1")
+            if batch_size > 1 and (self.config.is_encoder_decoder or assistant_model.config.is_encoder_decoder):
+                raise ValueError("assisted generate is only supported for batch_size = 1 with encoder-decoder models")
             if not model_kwargs["use_cache"]:
                 raise ValueError("assisted generate requires `use_cache=True`")
 
+            if batch_size > 1:
+                # 11. run batched speculative decoding
+                return self.speculative_decoding(
+                    input_ids,
+                    assistant_model=assistant_model,
+                    do_sample=generation_config.do_sample,
+                    logits_processor=logits_processor,
+                    logits_warper=self._get_logits_warper(generation_config) if generation_config.do_sample else None,
+                    stopping_criteria=stopping_criteria,
+                    pad_token_id=generation_config.pad_token_id,
+                    eos_token_id=generation_config.eos_token_id,
+                    output_scores=generation_config.output_scores,
+                    return_dict_in_generate=generation_config.return_dict_in_generate,
+                    synced_gpus=synced_gpus,
+                    **model_kwargs,
+                )
+
             # 11. If the assistant model is an encoder-decoder, prepare its encoder outputs
             if assistant_model.config.is_encoder_decoder:
                 assistant_model_kwargs = copy.deepcopy(model_kwargs)
@@ -1661,7 +1726,7 @@ class GenerationMixin:
 
         elif generation_mode == GenerationMode.BEAM_SEARCH:
             # 11. prepare beam search scorer
-            beam_scorer = BeamSearchScorer(
+            beam_scorer = VectorizedBeamSearchScorer(
                 batch_size=batch_size,
                 num_beams=generation_config.num_beams,
                 device=inputs_tensor.device,
@@ -1696,7 +1761,7 @@ class GenerationMixin:
             logits_warper = self._get_logits_warper(generation_config)
 
             # 12. prepare beam search scorer
-            beam_scorer = BeamSearchScorer(
+            beam_scorer = VectorizedBeamSearchScorer(
                 batch_size=batch_size,
                 num_beams=generation_config.num_beams,
                 device=inputs_tensor.device,
@@ -1835,6 +1900,55 @@ class GenerationMixin:
                 **model_kwargs,
             )
 
+    async def agenerate(
+        self,
+        inputs: Optional[torch.Tensor] = None,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+        streamer: Optional["BaseStreamer"] = None,
+        **kwargs,
+    ) -> Union[GenerateOutput, torch.LongTensor]:
+        r"""
+        Asynchronous version of [`~generation.GenerationMixin.generate`], to serve concurrent requests from an
+        `asyncio` event loop. The generation runs in the default executor of the event loop, so the number of
+        concurrent generations is bounded by the size of that executor and the event loop is never blocked.
+
+        If the task awaiting `agenerate` is cancelled, the generation stops at its next step. Pass an
+        [`AsyncTextIteratorStreamer`] as `streamer` to consume the generated text with `async for`: calling its
+        `cancel` method also stops the generation, and its `max_queue_size` makes the generation wait for a slow
+        consumer.
+
+        Parameters:
+            inputs (`torch.Tensor` of varying shape depending on the modality, *optional*):
+                The sequence used as a prompt for the generation or as model inputs to the encoder. See
+                [`~generation.GenerationMixin.generate`].
+            stopping_criteria (`StoppingCriteriaList`, *optional*):
+                Custom stopping criteria that complement the default stopping criteria built from arguments and a
+                generation config.
+            streamer (`BaseStreamer`, *optional*):
+                Streamer object that will be used to stream the generated sequences.
+            kwargs (`Dict[str, Any]`, *optional*):
+                Any other argument of [`~generation.GenerationMixin.generate`].
+
+        Return:
+            [`~utils.ModelOutput`] or `torch.LongTensor`: The output of [`~generation.GenerationMixin.generate`].
+        """
+        cancelled = streamer.cancelled if isinstance(streamer, AsyncTextIteratorStreamer) else threading.Event()
+        stopping_criteria = StoppingCriteriaList(stopping_criteria if stopping_criteria is not None else [])
+        stopping_criteria.append(_CancellationCriteria(cancelled))
+
+        generate = functools.partial(
+            self.generate, inputs, stopping_criteria=stopping_criteria, streamer=streamer, **kwargs
+        )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, generate)
+        except BaseException:
+            # stops the generation if the task was cancelled, and ends the iteration over the streamer
+            if isinstance(streamer, AsyncTextIteratorStreamer):
+                streamer.cancel()
+            else:
+                cancelled.set()
+            raise
+
     @torch.no_grad()
     def contrastive_search(
         self,
@@ -2971,7 +3085,10 @@ class GenerationMixin:
             else self.generation_config.return_dict_in_generate
         )
 
-        batch_size = len(beam_scorer._beam_hyps)
+        if isinstance(beam_scorer, VectorizedBeamSearchScorer):
+            batch_size = beam_scorer.batch_size
+        else:
+            batch_size = len(beam_scorer._beam_hyps)
         num_beams = beam_scorer.num_beams
 
         batch_beam_size, cur_len = input_ids.shape
@@ -3303,7 +3420,10 @@ class GenerationMixin:
             else self.generation_config.return_dict_in_generate
         )
 
-        batch_size = len(beam_scorer._beam_hyps)
+        if isinstance(beam_scorer, VectorizedBeamSearchScorer):
+            batch_size = beam_scorer.batch_size
+        else:
+            batch_size = len(beam_scorer._beam_hyps)
         num_beams = beam_scorer.num_beams
 
         batch_beam_size, cur_len = input_ids.shape
@@ -4481,16 +4601,22 @@ class GenerationMixin:
                     new_logits[:, i, :] = logits_warper(candidate_input_ids[:, : cur_len + i], new_logits[:, i, :])
 
             # 3. Obtain the next tokens from the original model logits.
+            candidate_new_tokens = candidate_input_ids[:, -candidate_length:]
             if do_sample:
+                # 4. Rejection sampling: the assistant forecasted tokens are accepted with the probability the
+                # original model gives them, and the first rejected one is resampled from the original model's
+                # distribution without it, so that the sampled sequences follow the original model's distribution.
                 probs = new_logits[:, -candidate_length - 1 :, :].softmax(dim=-1)
-                selected_tokens = torch.multinomial(probs[0, :, :], num_samples=1).squeeze(1)[None, :]
+                n_matches, next_token = _speculative_sampling(candidate_new_tokens, None, probs)
+                n_matches = n_matches[0]
+                selected_tokens = torch.cat((candidate_new_tokens, next_token[:, None]), dim=-1)
+                selected_tokens[:, n_matches] = next_token
             else:
                 selected_tokens = new_logits[:, -candidate_length - 1 :, :].argmax(dim=-1)
 
-            # 4. Compare the argmax from the original model logits with the assistant forecasted tokens. We can keep
-            # the assistant forecasted tokens until the first mismatch, or until the max length is reached.
-            candidate_new_tokens = candidate_input_ids[:, -candidate_length:]
-            n_matches = ((~(candidate_new_tokens == selected_tokens[:, :-1])).cumsum(dim=-1) < 1).sum()
+                # 4. Compare the argmax from the original model logits with the assistant forecasted tokens. We can
+                # keep the assistant forecasted tokens until the first mismatch, or until the max length is reached.
+                n_matches = ((~(candidate_new_tokens == selected_tokens[:, :-1])).cumsum(dim=-1) < 1).sum()
 
             # 5. Update variables according to the number of matching assistant tokens. Remember: the token generated
             # by the model after the last candidate match is also valid, as it is generated from a correct sequence.
@@ -4618,6 +4744,297 @@ class GenerationMixin:
         else:
             return input_ids
 
+    def speculative_decoding(
+        self,
+        input_ids: torch.LongTensor,
+        assistant_model: "PreTrainedModel",
+        do_sample: bool = False,
+        logits_processor: Optional[LogitsProcessorList] = None,
+        logits_warper: Optional[LogitsProcessorList] = None,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+        pad_token_id: Optional[int] = None,
+        eos_token_id: Optional[Union[int, List[int]]] = None,
+        output_attentions: Optional[bool] = None,
+        output_hidden_states: Optional[bool] = None,
+        output_scores: Optional[bool] = None,
+        return_dict_in_generate: Optional[bool] = None,
+        synced_gpus: bool = False,
+        **model_kwargs,
+    ):
+        r"""
+        Generates sequences of token ids for batches of prompts with decoder-only models using **greedy decoding** or
+        **sample** (depending on `do_sample`), assisted by a smaller draft model, as in [Fast Inference from
+        Transformers via Speculative Decoding](https://arxiv.org/abs/2211.17192).
+
+        At each iteration, the assistant model drafts `assistant_model.max_assistant_tokens` tokens per sequence, and
+        the model verifies all of them in a single forward pass. With greedy decoding, the drafted tokens are kept up
+        to the first one that differs from the model's argmax. With sampling, they are accepted through rejection
+        sampling, which makes the generated sequences follow the distribution of the model. Each sequence keeps its
+        own number of accepted tokens: the sequences that accepted fewer tokens are left-padded to keep the batch
+        rectangular. The number of drafted tokens is then adjusted from the acceptance rate of the batch.
+
+        <Tip warning={true}>
+
+        In most cases, you do not need to call [`~generation.GenerationMixin.speculative_decoding`] directly. Use
+        generate() with an `assistant_model` and a batch of several prompts instead. For an overview of generation
+        strategies and code examples, check the [following guide](../generation_strategies).
+
+        </Tip>
+
+        Parameters:
+            input_ids (`torch.LongTensor` of shape `(batch_size, sequence_length)`):
+                The sequences used as prompts for the generation. They may be left-padded, in which case
+                `attention_mask` must be passed in `model_kwargs`.
+            assistant_model (`PreTrainedModel`):
+                A decoder-only model with the same tokenizer, used to draft the candidate tokens. It should be much
+                faster than the model you're calling generate from.
+            do_sample (`bool`, *optional*, defaults to `False`):
+                Whether or not to use sampling ; use greedy decoding otherwise.
+            logits_processor (`LogitsProcessorList`, *optional*):
+                An instance of [`LogitsProcessorList`]. List of instances of class derived from [`LogitsProcessor`]
+                used to modify the prediction scores of the language modeling head applied at each generation step.
+            logits_warper (`LogitsProcessorList`, *optional*):
+                An instance of [`LogitsProcessorList`]. List of instances of class derived from [`LogitsWarper`] used
+                to warp the prediction score distribution of the language modeling head applied before multinomial
+                sampling at each generation step.
+            stopping_criteria (`StoppingCriteriaList`, *optional*):
+                An instance of [`StoppingCriteriaList`]. List of instances of class derived from [`StoppingCriteria`]
+                used to tell if the generation loop should stop. It must contain a [`MaxLengthCriteria`].
+            pad_token_id (`int`, *optional*):
+                The id of the *padding* token.
+            eos_token_id (`Union[int, List[int]]`, *optional*):
+                The id of the *end-of-sequence* token. Optionally, use a list to set multiple *end-of-sequence* tokens.
+            output_attentions (`bool`, *optional*, defaults to `False`):
+                Not supported, as the sequences of the batch don't share the same positions.
+            output_hidden_states (`bool`, *optional*, defaults to `False`):
+                Not supported, as the sequences of the batch don't share the same positions.
+            output_scores (`bool`, *optional*, defaults to `False`):
+                Whether or not to return the prediction scores. Only supported for a batch of one sequence.
+            return_dict_in_generate (`bool`, *optional*, defaults to `False`):
+                Whether or not to return a [`~utils.ModelOutput`] instead of a plain tuple.
+            synced_gpus (`bool`, *optional*, defaults to `False`):
+                Not supported.
+            model_kwargs:
+                Additional model specific keyword arguments. Only `attention_mask` is used.
+
+        Return:
+            [`~generation.GreedySearchDecoderOnlyOutput`], [`~generation.SampleDecoderOnlyOutput`] or
+            `torch.LongTensor`: A `torch.LongTensor` containing the generated tokens (default behaviour) or a
+            [`~generation.GreedySearchDecoderOnlyOutput`] (resp. [`~generation.SampleDecoderOnlyOutput`]) if
+            `return_dict_in_generate=True` and `do_sample=False` (resp. `do_sample=True`).
+
+        Examples:
+
+        ```python
+        >>> from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        >>> tokenizer = AutoTokenizer.from_pretrained("gpt2", padding_side="left")
+        >>> model = AutoModelForCausalLM.from_pretrained("gpt2")
+        >>> assistant_model = AutoModelForCausalLM.from_pretrained("distilgpt2")
+        >>> # set pad_token_id to eos_token_id because GPT2 does not have a PAD token
+        >>> tokenizer.pad_token = tokenizer.eos_token
+        >>> model.generation_config.pad_token_id = model.generation_config.eos_token_id
+
+        >>> inputs = tokenizer(["It might be possible to", "Today is a"], return_tensors="pt", padding=True)
+        >>> outputs = model.generate(**inputs, assistant_model=assistant_model, do_sample=True, max_new_tokens=20)
+        ```"""
+        # Assistant: initialize assistant-related variables
+        if not hasattr(assistant_model, "max_assistant_tokens"):
+            assistant_model.max_assistant_tokens = 5  # this value, which will be updated, persists across calls
+
+        # init values
+        logits_processor = logits_processor if logits_processor is not None else LogitsProcessorList()
+        logits_warper = logits_warper if logits_warper is not None else LogitsProcessorList()
+        stopping_criteria = stopping_criteria if stopping_criteria is not None else StoppingCriteriaList()
+        pad_token_id = pad_token_id if pad_token_id is not None else self.generation_config.pad_token_id
+        eos_token_id = eos_token_id if eos_token_id is not None else self.generation_config.eos_token_id
+        if eos_token_id is not None and pad_token_id is None:
+            raise ValueError("If `eos_token_id` is defined, make sure that `pad_token_id` is defined.")
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        eos_token_id_tensor = torch.tensor(eos_token_id).to(input_ids.device) if eos_token_id is not None else None
+        output_scores = output_scores if output_scores is not None else self.generation_config.output_scores
+        # resolved like in the other generation methods, so that the unsupported outputs are never silently dropped
+        output_attentions = (
+            output_attentions if output_attentions is not None else self.generation_config.output_attentions
+        )
+        output_hidden_states = (
+            output_hidden_states if output_hidden_states is not None else self.generation_config.output_hidden_states
+        )
+        return_dict_in_generate = (
+            return_dict_in_generate
+            if return_dict_in_generate is not None
+            else self.generation_config.return_dict_in_generate
+        )
+
+        batch_size = input_ids.shape[0]
+        if self.config.is_encoder_decoder or assistant_model.config.is_encoder_decoder:
+            raise ValueError("Speculative decoding is only supported for decoder-only models.")
+        if output_attentions or output_hidden_states or synced_gpus:
+            raise ValueError(
+                "Speculative decoding does not support `output_attentions`, `output_hidden_states` and `synced_gpus`."
+            )
+        if return_dict_in_generate and output_scores and batch_size > 1:
+            raise ValueError("Speculative decoding only supports `output_scores` for a batch of one sequence.")
+        max_len = stopping_criteria.max_length
+        if max_len is None:
+            raise ValueError("Speculative decoding requires `stopping_criteria` to contain a `MaxLengthCriteria`.")
+        # the maximum length is enforced per sequence, the other criteria are checked on the whole batch
+        stopping_criteria = StoppingCriteriaList(
+            [
+                criteria
+                for criteria in stopping_criteria
+                if not isinstance(criteria, (MaxLengthCriteria, MaxNewTokensCriteria))
+            ]
+        )
+
+        # init attention / hidden states / scores tuples
+        scores = () if (return_dict_in_generate and output_scores) else None
+
+        # keep track of which sequences are already finished, and of their number of generated tokens
+        prompt_len = input_ids.shape[-1]
+        unfinished_sequences = input_ids.new(batch_size).fill_(int(prompt_len < max_len))
+        num_generated_tokens = torch.zeros_like(unfinished_sequences)
+
+        # The sequences of the batch are kept right-aligned: each sequence is preceded by the padding of its prompt and
+        # by `num_inserted_pads` padding tokens, masked in `attention_mask`. The cache of the model holds all the
+        # tokens but the last one, and the cache of the assistant all the tokens but the last two, which are fed to
+        # the assistant at the next iteration.
+        attention_mask = model_kwargs.get("attention_mask")
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        num_inserted_pads = torch.zeros_like(unfinished_sequences)
+        past_key_values = None
+        assistant_past_key_values = None
+
+        while unfinished_sequences.max() > 0:
+            cur_len = input_ids.shape[-1]
+            remaining_tokens = (max_len - prompt_len - num_generated_tokens) * unfinished_sequences
+            num_draft_tokens = min(int(assistant_model.max_assistant_tokens), remaining_tokens.max().item() - 1)
+
+            #  1. Draft the next tokens with the assistant model
+            candidate_input_ids, candidate_attention_mask = input_ids, attention_mask
+            draft_probs = []
+            for draft_idx in range(num_draft_tokens):
+                if assistant_past_key_values is None:
+                    num_fed_tokens = candidate_input_ids.shape[-1]
+                else:
+                    num_fed_tokens = 2 if draft_idx == 0 else 1
+                assistant_outputs = _forward_new_tokens(
+                    assistant_model,
+                    candidate_input_ids,
+                    candidate_attention_mask,
+                    assistant_past_key_values,
+                    num_fed_tokens,
+                )
+                assistant_past_key_values = assistant_outputs.past_key_values
+
+                next_token_scores = logits_processor(candidate_input_ids, assistant_outputs.logits[:, -1, :])
+                if do_sample:
+                    next_token_scores = logits_warper(candidate_input_ids, next_token_scores)
+                    probs = nn.functional.softmax(next_token_scores, dim=-1)
+                    draft_tokens = torch.multinomial(probs, num_samples=1).squeeze(1)
+                    draft_probs.append(probs)
+                else:
+                    draft_tokens = torch.argmax(next_token_scores, dim=-1)
+                candidate_input_ids = torch.cat([candidate_input_ids, draft_tokens[:, None]], dim=-1)
+                candidate_attention_mask = torch.cat(
+                    [candidate_attention_mask, candidate_attention_mask.new_ones((batch_size, 1))], dim=-1
+                )
+            if num_draft_tokens == 0:
+                # the assistant cache is not fed anymore, it will be recomputed if needed
+                assistant_past_key_values = None
+
+            # 2. Score the drafted tokens, and the token after them, with a single forward pass of the model
+            num_fed_tokens = candidate_input_ids.shape[-1] if past_key_values is None else num_draft_tokens + 1
+            outputs = _forward_new_tokens(
+                self, candidate_input_ids, candidate_attention_mask, past_key_values, num_fed_tokens
+            )
+            next_token_scores = []
+            for i in range(num_draft_tokens + 1):
+                logits = outputs.logits[:, i - num_draft_tokens - 1, :]
+                token_scores = logits_processor(candidate_input_ids[:, : cur_len + i], logits)
+                if do_sample:
+                    token_scores = logits_warper(candidate_input_ids[:, : cur_len + i], token_scores)
+                next_token_scores.append(token_scores)
+            next_token_scores = torch.stack(next_token_scores, dim=1)
+
+            # 3. Accept the drafted tokens and pick the next one, for each sequence
+            draft_tokens = candidate_input_ids[:, cur_len:]
+            if do_sample:
+                draft_probs = torch.stack(draft_probs, dim=1) if num_draft_tokens > 0 else None
+                num_accepted, next_tokens = _speculative_sampling(
+                    draft_tokens, draft_probs, nn.functional.softmax(next_token_scores, dim=-1)
+                )
+            else:
+                selected_tokens = next_token_scores.argmax(dim=-1)
+                num_accepted = (draft_tokens == selected_tokens[:, :-1]).long().cumprod(dim=-1).sum(dim=-1)
+                next_tokens = selected_tokens.gather(1, num_accepted[:, None]).squeeze(1)
+            new_tokens = torch.cat([draft_tokens, next_tokens[:, None]], dim=-1)
+            new_tokens = new_tokens.scatter(1, num_accepted[:, None], next_tokens[:, None])
+
+            # 4. Stop the sequences at their maximum length or at their first eos token
+            num_new_tokens = torch.minimum(num_accepted + 1, remaining_tokens)
+            new_token_positions = torch.arange(num_draft_tokens + 1, device=input_ids.device)
+            is_finished = num_new_tokens == remaining_tokens
+            if eos_token_id_tensor is not None:
+                is_eos = torch.isin(new_tokens, eos_token_id_tensor) & (new_token_positions < num_new_tokens[:, None])
+                num_new_tokens = torch.where(is_eos.any(dim=-1), is_eos.int().argmax(dim=-1) + 1, num_new_tokens)
+                is_finished = is_finished | is_eos.any(dim=-1)
+
+            # Sequences that were already finished get padding tokens, as many as the longest continuation, so that
+            # they are not shifted.
+            num_added_tokens = (num_new_tokens * unfinished_sequences).max().item()
+            num_new_tokens = num_new_tokens.masked_fill(unfinished_sequences == 0, num_added_tokens)
+            new_tokens = new_tokens[:, :num_added_tokens]
+            is_new_token = new_token_positions[:num_added_tokens] < num_new_tokens[:, None]
+            if pad_token_id is not None:
+                new_tokens = new_tokens.masked_fill(unfinished_sequences[:, None] == 0, pad_token_id)
+            num_generated_tokens += num_new_tokens * unfinished_sequences
+
+            # 5. Append the new tokens, left-padding the sequences that accepted fewer tokens than the others, and
+            # drop the padding columns that are shared by all the sequences. The caches are aligned accordingly.
+            shifts = num_added_tokens - num_new_tokens
+            num_dropped_columns = (num_inserted_pads + shifts).min()
+            num_inserted_pads += shifts - num_dropped_columns
+            shifts -= num_dropped_columns
+            new_len = cur_len + num_added_tokens - num_dropped_columns.item()
+
+            input_ids = _shift_right(torch.cat([input_ids, new_tokens], dim=-1), shifts, new_len, pad_token_id or 0)
+            attention_mask = _shift_right(torch.cat([attention_mask, is_new_token.long()], dim=-1), shifts, new_len, 0)
+            past_key_values = _shift_past_key_values(outputs.past_key_values, shifts, new_len - 1)
+            if assistant_past_key_values is not None:
+                assistant_past_key_values = _shift_past_key_values(assistant_past_key_values, shifts, new_len - 2)
+
+            # 6. Adjust the number of drafted tokens to the acceptance rate of the unfinished sequences: drafting more
+            # tokens pays off when most of them are accepted, and wastes assistant forward passes otherwise.
+            if num_draft_tokens > 0:
+                num_unfinished = unfinished_sequences.sum()
+                acceptance_rate = (num_accepted * unfinished_sequences).sum() / (num_draft_tokens * num_unfinished)
+                if acceptance_rate >= 0.8:
+                    assistant_model.max_assistant_tokens += 2.0
+                elif acceptance_rate < 0.5:
+                    assistant_model.max_assistant_tokens = max(1.0, assistant_model.max_assistant_tokens - 1.0)
+
+            if return_dict_in_generate and output_scores:
+                scores += tuple(next_token_scores[:, i, :] for i in range(num_added_tokens))
+
+            # stop when each sentence is finished, or when another criteria is met
+            unfinished_sequences = unfinished_sequences.mul((~is_finished).long())
+            if stopping_criteria(input_ids, scores):
+                break
+
+        # remove the padding inserted in the sequences: they are laid out as with the other generation methods, with
+        # the padding of the finished sequences on the right
+        output_len = prompt_len + num_generated_tokens.max().item()
+        input_ids = _shift_right(input_ids, -num_inserted_pads, output_len, pad_token_id or 0)
+
+        if return_dict_in_generate:
+            output_class = SampleDecoderOnlyOutput if do_sample else GreedySearchDecoderOnlyOutput
+            return output_class(sequences=input_ids, scores=scores)
+        else:
+            return input_ids
+
 
 def _crop_past_key_values(model, past_key_values, maximum_length):
     """Crops the past key values up to a certain maximum length."""
@@ -4667,6 +5084,101 @@ def _crop_past_key_values(model, past_key_values, maximum_length):
     return past_key_values
 
 
+def _speculative_sampling(
+    draft_tokens: torch.LongTensor, draft_probs: Optional[torch.FloatTensor], target_probs: torch.FloatTensor
+) -> Tuple[torch.LongTensor, torch.LongTensor]:
+    """
+    Rejection sampling of speculative decoding (see https://arxiv.org/abs/2211.17192). Each drafted token `x` is
+    accepted with probability `min(1, p(x) / q(x))`, where `p` is the distribution of the model and `q` the one of
+    the assistant, and the token after the accepted ones is sampled from `max(0, p - q)` (normalized) where a drafted
+    token was rejected, or from `p` when all of them were accepted. The generated tokens then follow `p`.
+
+    Args:
+        draft_tokens (`torch.LongTensor` of shape `(batch_size, num_draft_tokens)`):
+            The drafted tokens.
+        draft_probs (`torch.FloatTensor` of shape `(batch_size, num_draft_tokens, vocab_size)`, *optional*):
+            The distributions the drafted tokens were sampled from. If `None`, the drafted tokens are considered to
+            be picked deterministically, e.g. with greedy decoding.
+        target_probs (`torch.FloatTensor` of shape `(batch_size, num_draft_tokens + 1, vocab_size)`):
+            The distributions of the model for the drafted tokens and the token after them.
+
+    Return:
+        A tuple with the number of accepted tokens and the next token, both of shape `(batch_size,)`.
+    """
+    batch_size, vocab_size = draft_tokens.shape[0], target_probs.shape[-1]
+    if draft_probs is None:
+        draft_probs = nn.functional.one_hot(draft_tokens, vocab_size).to(target_probs.dtype)
+
+    draft_token_probs = draft_probs.gather(-1, draft_tokens[..., None]).squeeze(-1)
+    target_token_probs = target_probs[:, :-1].gather(-1, draft_tokens[..., None]).squeeze(-1)
+    is_accepted = torch.rand_like(target_token_probs) * draft_token_probs < target_token_probs
+    num_accepted = is_accepted.long().cumprod(dim=-1).sum(dim=-1)
+
+    draft_probs = torch.cat([draft_probs, draft_probs.new_zeros((batch_size, 1, vocab_size))], dim=1)
+    index = num_accepted[:, None, None].expand(-1, 1, vocab_size)
+    next_target_probs = target_probs.gather(1, index).squeeze(1)
+    residual_probs = (next_target_probs - draft_probs.gather(1, index).squeeze(1)).clamp(min=0)
+    residual_mass = residual_probs.sum(dim=-1, keepdim=True)
+    # when `p <= q` everywhere, `p == q` and nothing can be rejected: `p` is only used for numerical safety
+    residual_probs = torch.where(residual_mass > 0, residual_probs / residual_mass.clamp(min=1e-12), next_target_probs)
+    next_tokens = torch.multinomial(residual_probs, num_samples=1).squeeze(1)
+    return num_accepted, next_tokens
+
+
+def _forward_new_tokens(model, input_ids, attention_mask, past_key_values, num_new_tokens):
+    """Runs `model` on the last `num_new_tokens` tokens of left-padded `input_ids`, the others being cached."""
+    model_inputs = {
+        "input_ids": input_ids[:, -num_new_tokens:],
+        "attention_mask": attention_mask,
+        "past_key_values": past_key_values,
+        "use_cache": True,
+        "return_dict": True,
+    }
+    if "position_ids" in inspect.signature(model.forward).parameters:
+        position_ids = attention_mask.long().cumsum(-1) - 1
+        position_ids.masked_fill_(attention_mask == 0, 1)
+        model_inputs["position_ids"] = position_ids[:, -num_new_tokens:]
+    return model(**model_inputs)
+
+
+def _shift_right(tensor: torch.Tensor, shifts: torch.LongTensor, length: int, fill_value: int) -> torch.Tensor:
+    """
+    Shifts each row of a 2D tensor right by `shifts` (left for negative shifts), keeping its first `length` positions.
+    The positions that don't come from the tensor are filled with `fill_value`.
+    """
+    positions = torch.arange(length, device=tensor.device)[None, :] - shifts[:, None]
+    is_filled = (positions < 0) | (positions >= tensor.shape[-1])
+    return tensor.gather(1, positions.clamp(0, tensor.shape[-1] - 1)).masked_fill(is_filled, fill_value)
+
+
+def _shift_past_key_values(past_key_values, shifts: torch.LongTensor, length: int):
+    """
+    Shifts each sequence of the cache right by `shifts` (left for negative shifts) along the sequence dimension,
+    keeping its first `length` positions. The positions that don't come from the cache are only meant to be masked.
+    The cache has to be in the standard format, with one tensor of shape `(batch_size, num_heads, sequence_length,
+    head_dim)` per key and value.
+    """
+    if not isinstance(past_key_values, tuple) or any(
+        not isinstance(tensor, torch.Tensor) or tensor.dim() != 4 for layer in past_key_values for tensor in layer
+    ):
+        raise ValueError(
+            "Speculative decoding requires models returning their cache in the standard tuple format, with one "
+            "tensor of shape `(batch_size, num_heads, sequence_length, head_dim)` per key and value."
+        )
+    if not shifts.any():
+        return tuple(tuple(tensor[:, :, :length] for tensor in layer) for layer in past_key_values)
+
+    positions = torch.arange(length, device=shifts.device)[None, :] - shifts[:, None]
+    positions = positions.clamp(0, past_key_values[0][0].shape[2] - 1)
+    return tuple(
+        tuple(
+            tensor.gather(2, positions[:, None, :, None].expand(-1, tensor.shape[1], -1, tensor.shape[-1]))
+            for tensor in layer
+        )
+        for layer in past_key_values
+    )
+
+
 def _split_model_outputs(outputs, new_outputs, cur_len, added_len, is_decoder_attention=False):
     """
     Given the (decoder/cross attentions)/(decoder hidden states) for multiple generated tokens, splits it into a tuple
@@ -18,11 +18,17 @@ import gc
 import importlib.metadata
 import inspect
 import json
+import math
+import mmap
 import os
 import re
 import shutil
+import struct
+import sys
 import tempfile
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from dataclasses import dataclass
 from functools import partial, wraps
@@ -43,6 +49,7 @@ from .pytorch_utils import (  # noqa: F401
     apply_chunking_to_forward,
     find_pruneable_heads_and_indices,
     id_tensor_storage,
+    is_torch_greater_or_equal_than_2_1,
     prune_conv1d_layer,
     prune_layer,
     prune_linear_layer,
@@ -291,17 +298,120 @@ def dtype_byte_size(dtype):
     return bit_size // 8
 
 
+def _balanced_partition(sizes: List[int], max_size: int) -> List[List[int]]:
+    """
+    Splits the indices of `sizes` in consecutive groups whose total size does not exceed `max_size`, with as few groups
+    as possible and the largest group as small as possible. Items bigger than `max_size` are in their own group.
+    """
+
+    def num_groups(capacity, segment):
+        count, current = 1, 0
+        for idx in segment:
+            if current + sizes[idx] > capacity:
+                count, current = count + 1, 0
+            current += sizes[idx]
+        return count
+
+    def partition(segment):
+        if len(segment) == 0:
+            return []
+        total = sum(sizes[idx] for idx in segment)
+        largest = max(sizes[idx] for idx in segment)
+        num_target = max(1, -(-total // max_size))
+        while True:
+            # Smallest capacity fitting the segment in `num_target` groups
+            low, high = max(largest, -(-total // num_target)), total
+            while low < high:
+                mid = (low + high) // 2
+                if num_groups(mid, segment) <= num_target:
+                    high = mid
+                else:
+                    low = mid + 1
+            if low <= max_size:
+                break
+            num_target += 1
+        groups, current = [[]], 0
+        for idx in segment:
+            if current + sizes[idx] > low and len(groups[-1]) > 0:
+                groups.append([])
+                current = 0
+            groups[-1].append(idx)
+            current += sizes[idx]
+        return groups
+
+    groups = []
+    segment = []
+    for idx, size in enumerate(sizes):
+        if size > max_size:
+            groups += partition(segment) + [[idx]]
+            segment = []
+        else:
+            segment.append(idx)
+    return groups + partition(segment)
+
+
+def _save_shards_in_parallel(shards, save_directory, save_function, safe_serialization, num_workers):
+    """
+    Saves the shards of a checkpoint from a thread pool, serializing at most `num_workers` shards at once.
+    """
+
+    def save_shard(shard_file, shard):
+        path = os.path.join(save_directory, shard_file)
+        if safe_serialization:
+            safe_save_file(shard, path, metadata={"format": "pt"})
+        else:
+            save_function(shard, path)
+        return path
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = collections.deque()
+        for shard_file, shard in shards.items():
+            # Wait for a shard to be written before serializing another one, to bound the memory used
+            if len(pending) == num_workers:
+                pending.popleft().result()
+            pending.append(executor.submit(save_shard, shard_file, shard))
+        for future in pending:
+            future.result()
+
+
+def _flush_to_disk(paths, directory):
+    """
+    Flushes the files written at `paths` to the disk with `os.fsync`, then the entries of `directory`, so that a saved
+    checkpoint survives a crash of the machine. The files that were not written by this process are skipped.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+    # Directories cannot be opened on Windows
+    if os.name != "nt":
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
 def shard_checkpoint(
-    state_dict: Dict[str, torch.Tensor], max_shard_size: Union[int, str] = "10GB", weights_name: str = WEIGHTS_NAME
+    state_dict: Dict[str, torch.Tensor],
+    max_shard_size: Union[int, str] = "10GB",
+    weights_name: str = WEIGHTS_NAME,
+    sharding_strategy: str = "sequential",
 ):
     """
     Splits a model state dictionary in sub-checkpoints so that the final size of each sub-checkpoint does not exceed a
     given size.
 
-    The sub-checkpoints are determined by iterating through the `state_dict` in the order of its keys, so there is no
-    optimization made to make each sub-checkpoint as close as possible to the maximum size passed. For example, if the
-    limit is 10GB and we have weights of sizes [6GB, 6GB, 2GB, 6GB, 2GB, 2GB] they will get sharded as [6GB], [6+2GB],
-    [6+2+2GB] and not [6+2+2GB], [6+2GB], [6GB].
+    With the `"sequential"` strategy, the sub-checkpoints are determined by iterating through the `state_dict` in the
+    order of its keys, so there is no optimization made to make each sub-checkpoint as close as possible to the maximum
+    size passed. For example, if the limit is 10GB and we have weights of sizes [6GB, 6GB, 2GB, 6GB, 2GB, 2GB] they
+    will get sharded as [6GB], [6+2GB], [6+2+2GB] and not [6+2+2GB], [6+2GB], [6GB].
+
+    With the `"balanced"` strategy, the weights of a same layer (the weights whose names start with the same prefix
+    ending with an index, like `model.layers.3.`) are kept in the same sub-checkpoint, and the sub-checkpoints are as
+    few and as close in size as possible while keeping the order of the keys. For example, with a limit of 10GB, 25
+    weights of 1GB are sharded as [10GB], [10GB], [5GB] with the `"sequential"` strategy and as [9GB], [9GB], [7GB]
+    with the `"balanced"` one.
 
     <Tip warning={true}>
 
@@ -317,11 +427,17 @@ def shard_checkpoint(
             (like `"5MB"`).
         weights_name (`str`, *optional*, defaults to `"pytorch_model.bin"`):
             The name of the model save file.
+        sharding_strategy (`str`, *optional*, defaults to `"sequential"`):
+            How the weights are split in sub-checkpoints, `"sequential"` or `"balanced"`.
     """
+    if sharding_strategy not in ["sequential", "balanced"]:
+        raise ValueError(f"`sharding_strategy` should be 'sequential' or 'balanced', got {sharding_strategy}.")
     max_shard_size = convert_file_size_to_int(max_shard_size)
 
+    # With the balanced strategy, a block holds the weights of a layer and the blocks are grouped in shards at the end
     sharded_state_dicts = [{}]
-    last_block_size = 0
+    block_sizes = [0]
+    last_block_layer = None
     total_size = 0
     storage_id_to_block = {}
 
@@ -341,17 +457,30 @@ def shard_checkpoint(
 
         weight_size = weight.numel() * dtype_byte_size(weight.dtype)
 
-        # If this weight is going to tip up over the maximal size, we split, but only if we have put at least one
-        # weight in the current shard.
-        if last_block_size + weight_size > max_shard_size and len(sharded_state_dicts[-1]) > 0:
+        if sharding_strategy == "balanced":
+            layer_match = re.match(r"(\d+|.*?\.\d+)\.", key)
+            layer = layer_match.group(1) if layer_match is not None else key
+            split = layer != last_block_layer
+            last_block_layer = layer
+        else:
+            # If this weight is going to tip up over the maximal size, we split, but only if we have put at least one
+            # weight in the current shard.
+            split = block_sizes[-1] + weight_size > max_shard_size
+        if split and len(sharded_state_dicts[-1]) > 0:
             sharded_state_dicts.append({})
-            last_block_size = 0
+            block_sizes.append(0)
 
         sharded_state_dicts[-1][key] = weight
-        last_block_size += weight_size
+        block_sizes[-1] += weight_size
         total_size += weight_size
         storage_id_to_block[storage_id] = len(sharded_state_dicts) - 1
 
+    if sharding_strategy == "balanced":
+        sharded_state_dicts = [
+            {key: weight for block_id in group for key, weight in sharded_state_dicts[block_id].items()}
+            for group in _balanced_partition(block_sizes, max_shard_size)
+        ]
+
     # If we only have one shard, we return it
     if len(sharded_state_dicts) == 1:
         return {weights_name: sharded_state_dicts[0]}, None
@@ -458,9 +587,61 @@ def load_sharded_checkpoint(model, folder, strict=True, prefer_safe=True):
     return torch.nn.modules.module._IncompatibleKeys(missing_keys, unexpected_keys)
 
 
-def load_state_dict(checkpoint_file: Union[str, os.PathLike]):
+_SAFETENSORS_DTYPES = {
+    "BOOL": torch.bool,
+    "U8": torch.uint8,
+    "I8": torch.int8,
+    "I16": torch.int16,
+    "I32": torch.int32,
+    "I64": torch.int64,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F32": torch.float32,
+    "F64": torch.float64,
+}
+if hasattr(torch, "float8_e4m3fn"):
+    _SAFETENSORS_DTYPES["F8_E4M3"] = torch.float8_e4m3fn
+    _SAFETENSORS_DTYPES["F8_E5M2"] = torch.float8_e5m2
+
+
+def mmap_safetensors_file(checkpoint_file: Union[str, os.PathLike]) -> Dict[str, torch.Tensor]:
     """
-    Reads a PyTorch checkpoint file, returning properly formatted errors if they arise.
+    Reads a safetensors file without copying its content: the returned tensors are views on a copy-on-write memory map
+    of the file. They do not use any memory of their own until they are modified, and processes mapping the same file
+    share the same pages of the page cache.
+    """
+    with open(checkpoint_file, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        header.pop("__metadata__", None)
+        # safetensors files are little-endian
+        if sys.byteorder != "little" or any(info["dtype"] not in _SAFETENSORS_DTYPES for info in header.values()):
+            return safe_load_file(checkpoint_file)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if start == end:
+            state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        # The tensors keep a reference to `buffer`, which is unmapped once none of them is left
+        tensor = torch.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=math.prod(info["shape"]),
+            offset=8 + header_size + start,
+        )
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def load_state_dict(checkpoint_file: Union[str, os.PathLike], use_mmap: bool = False):
+    """
+    Reads a PyTorch checkpoint file, returning properly formatted errors if they arise. With `use_mmap=True`, the
+    tensors are memory-mapped from the file instead of being copied in memory (for PyTorch checkpoints, this requires
+    PyTorch >= 2.1).
     """
     if checkpoint_file.endswith(".safetensors") and is_safetensors_available():
         # Check format of the archive
@@ -475,6 +656,8 @@ def load_state_dict(checkpoint_file: Union[str, os.PathLike]):
             raise NotImplementedError(
                 f"Conversion from a {metadata['format']} safetensors archive to PyTorch is not implemented yet."
             )
+        if use_mmap:
+            return mmap_safetensors_file(checkpoint_file)
         return safe_load_file(checkpoint_file)
     try:
         if (
@@ -485,7 +668,12 @@ def load_state_dict(checkpoint_file: Union[str, os.PathLike]):
             map_location = "meta"
         else:
             map_location = "cpu"
-        return torch.load(checkpoint_file, map_location=map_location)
+        extra_args = {}
+        if use_mmap and is_torch_greater_or_equal_than_2_1:
+            extra_args["mmap"] = True
+        elif use_mmap:
+            logger.warning_once("Memory-mapping PyTorch checkpoints requires PyTorch >= 2.1, they will be copied.")
+        return torch.load(checkpoint_file, map_location=map_location, **extra_args)
     except Exception as e:
         try:
             with open(checkpoint_file) as f:
@@ -508,6 +696,49 @@ def load_state_dict(checkpoint_file: Union[str, os.PathLike]):
             )
 
 
+def _iter_state_dicts(
+    checkpoint_files: List[str],
+    num_workers: int = 1,
+    memory_budget: Optional[Union[int, str]] = None,
+    use_mmap: bool = False,
+):
+    """
+    Yields the checkpoint files and their state dicts, in order. With `num_workers > 1`, the next files are read in a
+    thread pool while the current state dict is being used, as long as the total size of the files read and not yet
+    released does not exceed `memory_budget` (one file is always read).
+    """
+    if num_workers <= 1 or len(checkpoint_files) <= 1:
+        for checkpoint_file in checkpoint_files:
+            yield checkpoint_file, load_state_dict(checkpoint_file, use_mmap=use_mmap)
+        return
+
+    if memory_budget is not None:
+        memory_budget = convert_file_size_to_int(memory_budget)
+    sizes = [os.path.getsize(checkpoint_file) for checkpoint_file in checkpoint_files]
+    pending = collections.deque()
+    pending_size = 0
+    next_idx = 0
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        try:
+            for idx, checkpoint_file in enumerate(checkpoint_files):
+                while (
+                    next_idx < len(checkpoint_files)
+                    and len(pending) < num_workers
+                    and (memory_budget is None or len(pending) == 0 or pending_size + sizes[next_idx] <= memory_budget)
+                ):
+                    pending.append(executor.submit(load_state_dict, checkpoint_files[next_idx], use_mmap=use_mmap))
+                    pending_size += sizes[next_idx]
+                    next_idx += 1
+                state_dict = pending.popleft().result()
+                yield checkpoint_file, state_dict
+                # The caller is done with this state dict once it asks for the next one
+                del state_dict
+                pending_size -= sizes[idx]
+        finally:
+            for future in pending:
+                future.cancel()
+
+
 def set_initialized_submodules(model, state_dict_keys):
     """
     Sets the `_is_hf_initialized` flag in all submodules of a given model when all its weights are in the loaded state
@@ -757,6 +988,211 @@ def _load_state_dict_into_meta_model(
     return error_msgs, offload_index, state_dict_index
 
 
+class LazyCheckpointLoader:
+    """
+    Loads the weights of a model instantiated on the meta device from safetensors checkpoint files, layer by layer. The
+    layers (the modules of the outermost `nn.ModuleList`s of the model) are only loaded the first time they are called,
+    the other weights are loaded right away.
+
+    Args:
+        model ([`PreTrainedModel`]):
+            The model, with its parameters on the meta device.
+        weight_map (`Dict[str, str]`):
+            The checkpoint file containing each weight of the checkpoint.
+        device (`str` or `torch.device`, *optional*, defaults to `"cpu"`):
+            The device on which to load the weights.
+        prefetch_layers (`int`, *optional*, defaults to 0):
+            The number of next layers read in a background thread when a layer is loaded.
+        keep_in_fp32_modules (`List[str]`, *optional*):
+            The modules kept in `torch.float32` when the model is in `torch.float16`.
+    """
+
+    def __init__(self, model, weight_map, device="cpu", prefetch_layers=0, keep_in_fp32_modules=None):
+        self.model = model
+        self.weight_map = weight_map
+        self.device = torch.device(device) if not isinstance(device, int) else torch.device("cuda", device)
+        self.prefetch_layers = prefetch_layers
+        self.keep_in_fp32_modules = keep_in_fp32_modules if keep_in_fp32_modules is not None else []
+        self._files = {}
+        self._files_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1) if prefetch_layers > 0 else None
+        self._prefetched = {}
+
+        # Same renaming of the keys as in `_load_pretrained_model`
+        self._prefix = model.base_model_prefix
+        expected_keys = list(model.state_dict().keys())
+        has_prefix_module = len(self._prefix) > 0 and any(key.startswith(self._prefix) for key in weight_map)
+        expects_prefix_module = len(self._prefix) > 0 and any(key.startswith(self._prefix) for key in expected_keys)
+        self._remove_prefix_from_model = not has_prefix_module and expects_prefix_module
+        self._add_prefix_to_model = has_prefix_module and not expects_prefix_module
+        expected_keys = {self._checkpoint_key(key) for key in expected_keys}
+        model_buffers = {self._checkpoint_key(key) for key, _ in model.named_buffers()}
+        self.missing_keys = [key for key in expected_keys if key not in weight_map]
+        self.unexpected_keys = [key for key in weight_map if key not in expected_keys and key not in model_buffers]
+
+        # All the modules holding each parameter, so that tied parameters are loaded once
+        self._param_owners = collections.defaultdict(list)
+        for module_name, module in model.named_modules(remove_duplicate=False):
+            for name, param in module._parameters.items():
+                if param is not None:
+                    self._param_owners[id(param)].append((module, name, f"{module_name}.{name}".lstrip(".")))
+
+        self._layers = []
+        modules = dict(model.named_modules())
+        for name, module in modules.items():
+            parent_name = name.rsplit(".", 1)[0] if "." in name else ""
+            if (
+                len(name) > 0
+                and isinstance(modules[parent_name], nn.ModuleList)
+                and not any(name.startswith(f"{layer_name}.") for layer_name, _ in self._layers)
+            ):
+                self._layers.append((name, module))
+        self._handles = [
+            module.register_forward_pre_hook(partial(self._load_layer_hook, idx))
+            for idx, (_, module) in enumerate(self._layers)
+        ]
+
+        layer_modules = {id(module) for _, module in self._layers}
+        entries = self._get_entries(model, "", excluded=layer_modules)
+        self._assign(entries, self._read(entries))
+        if len(self._layers) == 0:
+            self._close()
+
+    def _checkpoint_key(self, key):
+        if self._remove_prefix_from_model and key.startswith(f"{self._prefix}."):
+            return key[len(self._prefix) + 1 :]
+        elif self._add_prefix_to_model:
+            return f"{self._prefix}.{key}"
+        return key
+
+    def _get_entries(self, module, prefix, excluded=()):
+        """
+        Returns the parameters still on the meta device and the buffers of `module` and its submodules, except the
+        submodules in `excluded`, as tuples `(is_buffer, owners)` where `owners` are the `(module, name, key)` using
+        the tensor.
+        """
+        entries = []
+        if id(module) in excluded:
+            return entries
+        for name, param in module._parameters.items():
+            if param is not None and param.device.type == "meta":
+                entries.append((False, self._param_owners[id(param)]))
+        for name, buffer in module._buffers.items():
+            if buffer is not None:
+                entries.append((True, [(module, name, f"{prefix}.{name}".lstrip("."))]))
+        for name, child in module._modules.items():
+            if child is not None:
+                entries += self._get_entries(child, f"{prefix}.{name}".lstrip("."), excluded=excluded)
+        return entries
+
+    def _get_file(self, path):
+        with self._files_lock:
+            if path not in self._files:
+                self._files[path] = safe_open(path, framework="pt")
+            return self._files[path]
+
+    def _read(self, entries):
+        """
+        Reads the tensors of `entries` from the checkpoint, `None` for the tensors not in the checkpoint.
+        """
+        values = []
+        for _, owners in entries:
+            keys = [self._checkpoint_key(key) for _, _, key in owners]
+            key = next((key for key in keys if key in self.weight_map), None)
+            values.append(self._get_file(self.weight_map[key]).get_tensor(key) if key is not None else None)
+        return values
+
+    def _assign(self, entries, values):
+        # The parameters missing from the checkpoint are initialized before the others are loaded, since
+        # `_init_weights` initializes all the parameters of a module
+        modules_to_init = []
+        for is_buffer, owners in [entry for entry, value in zip(entries, values) if value is None]:
+            if not is_buffer and self._set_parameter(owners, None):
+                modules_to_init.append(owners[0][0])
+        if len(modules_to_init) > 0 and hasattr(self.model, "_init_weights"):
+            with torch.no_grad():
+                for module in modules_to_init:
+                    self.model._init_weights(module)
+
+        for (is_buffer, owners), value in zip(entries, values):
+            if is_buffer:
+                module, name, _ = owners[0]
+                buffer = module._buffers[name]
+                value = buffer if value is None else value.to(buffer.dtype)
+                module._buffers[name] = value.to(self.device)
+            elif value is not None:
+                self._set_parameter(owners, value)
+
+    def _set_parameter(self, owners, value):
+        """
+        Replaces a parameter on the meta device by `value` (or an empty tensor if `None`) in all the modules using it.
+        Returns `False` if the parameter was already loaded (because it is tied to a parameter loaded before).
+        """
+        module, name, key = owners[0]
+        param = module._parameters[name]
+        if param.device.type != "meta":
+            return False
+        dtype = param.dtype
+        if dtype == torch.float16 and any(fp32_module in key for fp32_module in self.keep_in_fp32_modules):
+            dtype = torch.float32
+        if value is None:
+            value = torch.empty(param.shape, dtype=dtype, device=self.device)
+        elif torch.is_floating_point(value):
+            value = value.to(device=self.device, dtype=dtype)
+        else:
+            value = value.to(self.device)
+        new_param = param.__class__(value, requires_grad=param.requires_grad)
+        for owner_module, owner_name, _ in owners:
+            owner_module._parameters[owner_name] = new_param
+        self._param_owners.pop(id(param), None)
+        return True
+
+    def _load_layer_hook(self, idx, module, args):
+        self.load_layer(idx)
+
+    def load_layer(self, idx: int):
+        """
+        Loads the weights of the `idx`-th layer if it is not loaded yet, and starts reading the next layers if
+        `prefetch_layers > 0`.
+        """
+        with self._lock:
+            if self._handles[idx] is None:
+                return
+            self._handles[idx].remove()
+            self._handles[idx] = None
+
+            layer_name, layer = self._layers[idx]
+            if idx in self._prefetched:
+                entries, future = self._prefetched.pop(idx)
+                values = future.result()
+            else:
+                entries = self._get_entries(layer, layer_name)
+                values = self._read(entries)
+            self._assign(entries, values)
+
+            for next_idx in range(idx + 1, min(idx + 1 + self.prefetch_layers, len(self._layers))):
+                if self._handles[next_idx] is not None and next_idx not in self._prefetched:
+                    next_entries = self._get_entries(self._layers[next_idx][1], self._layers[next_idx][0])
+                    self._prefetched[next_idx] = (next_entries, self._executor.submit(self._read, next_entries))
+
+            if all(handle is None for handle in self._handles):
+                self._close()
+
+    def load_all_layers(self):
+        """
+        Loads the weights of all the layers not loaded yet.
+        """
+        for idx in range(len(self._layers)):
+            self.load_layer(idx)
+
+    def _close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._files = {}
+        self._param_owners = {}
+
+
 def _add_variant(weights_name: str, variant: Optional[str] = None) -> str:
     if variant is not None:
         splits = weights_name.split(".")
@@ -1099,6 +1535,8 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
 
     is_parallelizable = False
     supports_gradient_checkpointing = False
+    # whether the model accepts a `Cache` instance as `past_key_values`
+    _supports_cache_class = False
 
     @property
     def dummy_inputs(self) -> Dict[str, torch.Tensor]:
@@ -1756,6 +2194,8 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         variant: Optional[str] = None,
         token: Optional[Union[str, bool]] = None,
         save_peft_format: bool = True,
+        sharding_strategy: str = "sequential",
+        num_saving_workers: int = 1,
         **kwargs,
     ):
         """
@@ -1802,6 +2242,15 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 For backward compatibility with PEFT library, in case adapter weights are attached to the model, all
                 keys of the state dict of adapters needs to be pre-pended with `base_model.model`. Advanced users can
                 disable this behaviours by setting `save_peft_format` to `False`.
+            sharding_strategy (`str`, *optional*, defaults to `"sequential"`):
+                How the weights are split in checkpoint shards. `"sequential"` fills each shard in the order of the
+                weights, `"balanced"` keeps the weights of each layer in the same shard and makes shards of sizes as
+                close as possible (see [`~modeling_utils.shard_checkpoint`]).
+            num_saving_workers (`int`, *optional*, defaults to 1):
+                The number of threads writing the checkpoint shards. At most this number of shards are serialized (and
+                held in memory) at once. A custom `save_function` (e.g. `xm.save` on TPUs, which synchronizes the
+                processes) cannot be used with more than one worker. Whatever the number of workers, the weights files
+                are flushed to the disk with `os.fsync` once they are all written.
             kwargs (`Dict[str, Any]`, *optional*):
                 Additional key word arguments passed along to the [`~utils.PushToHubMixin.push_to_hub`] method.
         """
@@ -1841,6 +2290,12 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         if safe_serialization and not is_safetensors_available():
             raise ImportError("`safe_serialization` requires the `safetensors library: `pip install safetensors`.")
 
+        if num_saving_workers > 1 and save_function is not torch.save:
+            raise ValueError(
+                "A custom `save_function` cannot be used with `num_saving_workers > 1`, as it may not be thread-safe "
+                "or may synchronize processes (like `xm.save` on TPUs). Use `num_saving_workers=1`."
+            )
+
         if os.path.isfile(save_directory):
             logger.error(f"Provided path ({save_directory}) should be a directory, not a file")
             return
@@ -1956,7 +2411,9 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         else:
             weights_name = ADAPTER_SAFE_WEIGHTS_NAME if safe_serialization else ADAPTER_WEIGHTS_NAME
 
-        shards, index = shard_checkpoint(state_dict, max_shard_size=max_shard_size, weights_name=weights_name)
+        shards, index = shard_checkpoint(
+            state_dict, max_shard_size=max_shard_size, weights_name=weights_name, sharding_strategy=sharding_strategy
+        )
 
         # Clean the folder from a previous save
         for filename in os.listdir(save_directory):
@@ -1979,14 +2436,18 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 os.remove(full_filename)
 
         # Save the model
-        for shard_file, shard in shards.items():
-            if safe_serialization:
-                # At some point we will need to deal better with save_function (used for TPU and other distributed
-                # joyfulness), but for now this enough.
-                safe_save_file(shard, os.path.join(save_directory, shard_file), metadata={"format": "pt"})
-            else:
-                save_function(shard, os.path.join(save_directory, shard_file))
+        if num_saving_workers > 1 and len(shards) > 1:
+            _save_shards_in_parallel(shards, save_directory, save_function, safe_serialization, num_saving_workers)
+        else:
+            for shard_file, shard in shards.items():
+                if safe_serialization:
+                    # At some point we will need to deal better with save_function (used for TPU and other distributed
+                    # joyfulness), but for now this enough.
+                    safe_save_file(shard, os.path.join(save_directory, shard_file), metadata={"format": "pt"})
+                else:
+                    save_function(shard, os.path.join(save_directory, shard_file))
 
+        written_files = [os.path.join(save_directory, shard_file) for shard_file in shards]
         if index is None:
             path_to_weights = os.path.join(save_directory, _add_variant(WEIGHTS_NAME, variant))
             logger.info(f"Model weights saved in {path_to_weights}")
@@ -1997,11 +2458,13 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             with open(save_index_file, "w", encoding="utf-8") as f:
                 content = json.dumps(index, indent=2, sort_keys=True) + "\n"
                 f.write(content)
+            written_files.append(save_index_file)
             logger.info(
                 f"The model is bigger than the maximum size per checkpoint ({max_shard_size}) and is going to be "
                 f"split in {len(shards)} checkpoint shards. You can find where each parameters has been saved in the "
                 f"index located at {save_index_file}."
             )
+        _flush_to_disk(written_files, save_directory)
 
         if push_to_hub:
             self._upload_modified_files(
@@ -2260,6 +2723,29 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             use_safetensors (`bool`, *optional*, defaults to `None`):
                 Whether or not to use `safetensors` checkpoints. Defaults to `None`. If not specified and `safetensors`
                 is not installed, it will be set to `False`.
+            num_loading_workers (`int`, *optional*, defaults to 1):
+                The number of threads reading the shards of a sharded checkpoint. With more than one, the next shards
+                are read while the weights of the current one are loaded in the model.
+            loading_memory_budget (`int` or `str`, *optional*):
+                When `num_loading_workers > 1`, the maximum total size of the shards read in advance and held in CPU
+                memory (like `"20GB"`). A shard is always read even if it is bigger. Defaults to no limit other than
+                `num_loading_workers`.
+            use_mmap (`bool`, *optional*, defaults to `False`):
+                Whether or not to memory-map the checkpoint files instead of copying them in memory. The weights
+                loaded on CPU then share the memory of the file (copy-on-write), so several processes loading the same
+                model share the same pages. Weights that are converted to another dtype (see `torch_dtype`) or moved
+                to another device are still copied. Implies `low_cpu_mem_usage=True`. Memory-mapping PyTorch (`.bin`)
+                checkpoints requires PyTorch >= 2.1.
+            lazy_loading (`bool`, *optional*, defaults to `False`):
+                Whether or not to load the weights of each layer (the modules of the `nn.ModuleList`s of the model)
+                only the first time it is called, to get a model ready to use faster or to only load the first layers
+                of a model. The other weights are loaded right away. Requires a safetensors checkpoint and implies
+                `low_cpu_mem_usage=True`. The model can only be put on a single device, with `device_map`, and the
+                weights of the layers not loaded yet stay on the meta device, so call
+                `model._lazy_checkpoint_loader.load_all_layers()` before saving or moving the model.
+            prefetch_layers (`int`, *optional*, defaults to 0):
+                With `lazy_loading=True`, the number of next layers read in a background thread when a layer is
+                loaded.
 
             kwargs (remaining dictionary of keyword arguments, *optional*):
                 Can be used to update the configuration object (after it being loaded) and initiate the model (e.g.,
@@ -2343,6 +2829,11 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         variant = kwargs.pop("variant", None)
         _adapter_model_path = kwargs.pop("_adapter_model_path", None)
         adapter_name = kwargs.pop("adapter_name", "default")
+        num_loading_workers = kwargs.pop("num_loading_workers", 1)
+        loading_memory_budget = kwargs.pop("loading_memory_budget", None)
+        use_mmap = kwargs.pop("use_mmap", False)
+        lazy_loading = kwargs.pop("lazy_loading", False)
+        prefetch_layers = kwargs.pop("prefetch_layers", 0)
 
         if is_fsdp_enabled():
             low_cpu_mem_usage = True
@@ -2436,6 +2927,27 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             elif not low_cpu_mem_usage:
                 raise ValueError("Passing along a `device_map` requires `low_cpu_mem_usage=True`")
 
+        if use_mmap:
+            if low_cpu_mem_usage is None:
+                low_cpu_mem_usage = True
+            elif not low_cpu_mem_usage:
+                raise ValueError("Passing `use_mmap=True` requires `low_cpu_mem_usage=True`")
+
+        lazy_loading_device = "cpu"
+        if lazy_loading:
+            if from_tf or from_flax or load_in_8bit or load_in_4bit or quantization_config is not None:
+                raise ValueError("`lazy_loading=True` is not compatible with TF, Flax or quantized checkpoints.")
+            if device_map is not None:
+                if not isinstance(device_map, dict) or list(device_map.keys()) != [""]:
+                    raise ValueError("With `lazy_loading=True`, the `device_map` can only be a single device.")
+                # The weights are put on their device when they are loaded, so the model is not dispatched
+                lazy_loading_device = device_map[""]
+                device_map = None
+            if low_cpu_mem_usage is None:
+                low_cpu_mem_usage = True
+            elif not low_cpu_mem_usage:
+                raise ValueError("Passing `lazy_loading=True` requires `low_cpu_mem_usage=True`")
+
         if low_cpu_mem_usage:
             if device_map is not None:
                 # The max memory utils require PyTorch >= 1.10 to have torch.cuda.mem_get_info.
@@ -2879,8 +3391,8 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         # load pt weights early so that we know which dtype to init the model under
         if from_pt:
             if not is_sharded and state_dict is None:
-                # Time to load the checkpoint
-                state_dict = load_state_dict(resolved_archive_file)
+                # Time to load the checkpoint (only memory-mapped for lazy loading, to get its keys without reading it)
+                state_dict = load_state_dict(resolved_archive_file, use_mmap=use_mmap or lazy_loading)
 
             # set dtype to instantiate the model under:
             # 1. If torch_dtype is not None, we use that dtype
@@ -2901,7 +3413,7 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                             elif not is_sharded:
                                 torch_dtype = get_state_dict_dtype(state_dict)
                             else:
-                                one_state_dict = load_state_dict(resolved_archive_file[0])
+                                one_state_dict = load_state_dict(resolved_archive_file[0], use_mmap=use_mmap)
                                 torch_dtype = get_state_dict_dtype(one_state_dict)
                                 del one_state_dict  # free CPU memory
                             logger.info(
@@ -3165,30 +3677,54 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             if dtype_orig is not None:
                 torch.set_default_dtype(dtype_orig)
 
-            (
-                model,
-                missing_keys,
-                unexpected_keys,
-                mismatched_keys,
-                offload_index,
-                error_msgs,
-            ) = cls._load_pretrained_model(
-                model,
-                state_dict,
-                loaded_state_dict_keys,  # XXX: rename?
-                resolved_archive_file,
-                pretrained_model_name_or_path,
-                ignore_mismatched_sizes=ignore_mismatched_sizes,
-                sharded_metadata=sharded_metadata,
-                _fast_init=_fast_init,
-                low_cpu_mem_usage=low_cpu_mem_usage,
-                device_map=device_map,
-                offload_folder=offload_folder,
-                offload_state_dict=offload_state_dict,
-                dtype=torch_dtype,
-                is_quantized=(getattr(model, "quantization_method", None) == QuantizationMethod.BITS_AND_BYTES),
-                keep_in_fp32_modules=keep_in_fp32_modules,
-            )
+            if lazy_loading:
+                archive_file = resolved_archive_file[0] if is_sharded else resolved_archive_file
+                if not archive_file.endswith(".safetensors"):
+                    raise ValueError("`lazy_loading=True` requires a safetensors checkpoint.")
+                if is_sharded:
+                    folder = os.path.dirname(archive_file)
+                    weight_map = {k: os.path.join(folder, f) for k, f in sharded_metadata["weight_map"].items()}
+                else:
+                    weight_map = {key: archive_file for key in loaded_state_dict_keys}
+                model.tie_weights()
+                model._lazy_checkpoint_loader = LazyCheckpointLoader(
+                    model,
+                    weight_map,
+                    device=lazy_loading_device,
+                    prefetch_layers=prefetch_layers,
+                    keep_in_fp32_modules=keep_in_fp32_modules,
+                )
+                missing_keys = model._lazy_checkpoint_loader.missing_keys
+                unexpected_keys = model._lazy_checkpoint_loader.unexpected_keys
+                mismatched_keys, offload_index, error_msgs = [], None, []
+            else:
+                (
+                    model,
+                    missing_keys,
+                    unexpected_keys,
+                    mismatched_keys,
+                    offload_index,
+                    error_msgs,
+                ) = cls._load_pretrained_model(
+                    model,
+                    state_dict,
+                    loaded_state_dict_keys,  # XXX: rename?
+                    resolved_archive_file,
+                    pretrained_model_name_or_path,
+                    ignore_mismatched_sizes=ignore_mismatched_sizes,
+                    sharded_metadata=sharded_metadata,
+                    _fast_init=_fast_init,
+                    low_cpu_mem_usage=low_cpu_mem_usage,
+                    device_map=device_map,
+                    offload_folder=offload_folder,
+                    offload_state_dict=offload_state_dict,
+                    dtype=torch_dtype,
+                    is_quantized=(getattr(model, "quantization_method", None) == QuantizationMethod.BITS_AND_BYTES),
+                    keep_in_fp32_modules=keep_in_fp32_modules,
+                    num_loading_workers=num_loading_workers,
+                    loading_memory_budget=loading_memory_budget,
+                    use_mmap=use_mmap,
+                )
 
         model.is_loaded_in_4bit = load_in_4bit
         model.is_loaded_in_8bit = load_in_8bit
@@ -3282,6 +3818,9 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         dtype=None,
         is_quantized=False,
         keep_in_fp32_modules=None,
+        num_loading_workers=1,
+        loading_memory_budget=None,
+        use_mmap=False,
     ):
         is_safetensors = False
         if is_quantized:
@@ -3539,13 +4078,17 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             else:
                 disk_only_shard_files = []
 
+            # Skip the load for shards that only contain disk-offloaded weights when using safetensors for the offload.
+            shard_files = [f for f in resolved_archive_file if f not in disk_only_shard_files]
+            state_dicts = _iter_state_dicts(
+                shard_files,
+                num_workers=num_loading_workers,
+                memory_budget=loading_memory_budget,
+                use_mmap=use_mmap,
+            )
             if len(resolved_archive_file) > 1:
-                resolved_archive_file = logging.tqdm(resolved_archive_file, desc="Loading checkpoint shards")
-            for shard_file in resolved_archive_file:
-                # Skip the load for shards that only contain disk-offloaded weights when using safetensors for the offload.
-                if shard_file in disk_only_shard_files:
-                    continue
-                state_dict = load_state_dict(shard_file)
+                state_dicts = logging.tqdm(state_dicts, total=len(shard_files), desc="Loading checkpoint shards")
+            for shard_file, state_dict in state_dicts:
 
                 # Mistmatched keys contains tuples key/shape1/shape2 of weights in the checkpoint that have a shape not
                 # matching the weights in the model.
@@ -22,6 +22,7 @@ from torch import nn
 from torch.nn import BCEWithLogitsLoss, CrossEntropyLoss, MSELoss
 
 from ...activations import ACT2FN
+from ...cache_utils import Cache
 from ...file_utils import (
     add_code_sample_docstrings,
     add_start_docstrings,
@@ -63,6 +64,7 @@ class GPTNeoXPreTrainedModel(PreTrainedModel):
     supports_gradient_checkpointing = True
     _no_split_modules = ["GPTNeoXLayer"]
     _skip_keys_device_placement = "past_key_values"
+    _supports_cache_class = True
 
     def _init_weights(self, module):
         """Initialize the weights"""
@@ -84,9 +86,10 @@ class GPTNeoXPreTrainedModel(PreTrainedModel):
 
 
 class GPTNeoXAttention(nn.Module):
-    def __init__(self, config):
+    def __init__(self, config, layer_idx: Optional[int] = None):
         super().__init__()
         self.config = config
+        self.layer_idx = layer_idx
         self.num_attention_heads = config.num_attention_heads
         self.hidden_size = config.hidden_size
         if self.hidden_size % self.num_attention_heads != 0:
@@ -147,7 +150,7 @@ class GPTNeoXAttention(nn.Module):
         attention_mask: torch.FloatTensor,
         position_ids: torch.LongTensor,
         head_mask: Optional[torch.FloatTensor] = None,
-        layer_past: Optional[Tuple[torch.Tensor]] = None,
+        layer_past: Optional[Union[Cache, Tuple[torch.Tensor]]] = None,
         use_cache: Optional[bool] = False,
         output_attentions: Optional[bool] = False,
     ):
@@ -176,7 +179,9 @@ class GPTNeoXAttention(nn.Module):
 
         # Compute token offset for rotary embeddings (when decoding)
         seq_len = key.shape[-2]
-        if has_layer_past:
+        if isinstance(layer_past, Cache):
+            seq_len += layer_past.get_seq_length(self.layer_idx)
+        elif has_layer_past:
             seq_len += layer_past[0].shape[-2]
         cos, sin = self.rotary_emb(value, seq_len=seq_len)
         query, key = apply_rotary_pos_emb(query_rot, key_rot, cos, sin, position_ids)
@@ -184,15 +189,20 @@ class GPTNeoXAttention(nn.Module):
         key = torch.cat((key, key_pass), dim=-1)
 
         # Cache QKV values
-        if has_layer_past:
-            past_key = layer_past[0]
-            past_value = layer_past[1]
-            key = torch.cat((past_key, key), dim=-2)
-            value = torch.cat((past_value, value), dim=-2)
-        present = (key, value) if use_cache else None
+        if isinstance(layer_past, Cache):
+            # the cache stores the new key and value in place and returns the ones of the whole sequence
+            key, value = layer_past.update(key, value, self.layer_idx)
+            present = layer_past if use_cache else None
+        else:
+            if has_layer_past:
+                past_key = layer_past[0]
+                past_value = layer_past[1]
+                key = torch.cat((past_key, key), dim=-2)
+                value = torch.cat((past_value, value), dim=-2)
+            present = (key, value) if use_cache else None
 
         # Compute attention
-        attn_output, attn_weights = self._attn(query, key, value, attention_mask, head_mask)
+        attn_output, attn_weights = self._attn(query, key, value, attention_mask, head_mask, query_end=seq_len)
 
         # Reshape outputs
         attn_output = self._merge_heads(attn_output, self.num_attention_heads, self.head_size)
@@ -229,19 +239,21 @@ class GPTNeoXAttention(nn.Module):
         # -> [bs, seq_len, hidden_size]
         return tensor
 
-    def _attn(self, query, key, value, attention_mask=None, head_mask=None):
+    def _attn(self, query, key, value, attention_mask=None, head_mask=None, query_end=None):
         # q, k, v: [bs, num_attention_heads, seq_len, attn_head_size]
         # compute causal mask from causal mask buffer
         batch_size, num_attention_heads, query_length, attn_head_size = query.size()
         key_length = key.size(-2)
+        # the keys of caches of fixed length extend past the end of the sequence, which is masked
+        query_end = key_length if query_end is None else query_end
 
         # dynamically increase the causal mask with the key length, if needed.
         if key_length > self.bias.shape[-1]:
             self._init_bias(key_length, device=key.device)
-        causal_mask = self.bias[:, :, key_length - query_length : key_length, :key_length]
+        causal_mask = self.bias[:, :, query_end - query_length : query_end, :key_length]
 
         query = query.view(batch_size * num_attention_heads, query_length, attn_head_size)
-        key = key.view(batch_size * num_attention_heads, key_length, attn_head_size)
+        key = key.reshape(batch_size * num_attention_heads, key_length, attn_head_size)
         attn_scores = torch.zeros(
             batch_size * num_attention_heads,
             query_length,
@@ -393,14 +405,14 @@ class GPTNeoXMLP(nn.Module):
 
 
 class GPTNeoXLayer(nn.Module):
-    def __init__(self, config):
+    def __init__(self, config, layer_idx: Optional[int] = None):
         super().__init__()
         self.use_parallel_residual = config.use_parallel_residual
         self.input_layernorm = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_eps)
         self.post_attention_layernorm = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_eps)
         self.post_attention_dropout = nn.Dropout(config.hidden_dropout)
         self.post_mlp_dropout = nn.Dropout(config.hidden_dropout)
-        self.attention = GPTNeoXAttention(config)
+        self.attention = GPTNeoXAttention(config, layer_idx=layer_idx)
         self.mlp = GPTNeoXMLP(config)
 
     def forward(
@@ -410,7 +422,7 @@ class GPTNeoXLayer(nn.Module):
         position_ids: Optional[torch.LongTensor] = None,
         head_mask: Optional[torch.FloatTensor] = None,
         use_cache: Optional[bool] = False,
-        layer_past: Optional[Tuple[torch.Tensor]] = None,
+        layer_past: Optional[Union[Cache, Tuple[torch.Tensor]]] = None,
         output_attentions: Optional[bool] = False,
     ):
         attention_layer_outputs = self.attention(
@@ -513,7 +525,9 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
 
         self.embed_in = nn.Embedding(config.vocab_size, config.hidden_size)
         self.emb_dropout = nn.Dropout(config.hidden_dropout)
-        self.layers = nn.ModuleList([GPTNeoXLayer(config) for _ in range(config.num_hidden_layers)])
+        self.layers = nn.ModuleList(
+            [GPTNeoXLayer(config, layer_idx=layer_idx) for layer_idx in range(config.num_hidden_layers)]
+        )
         self.final_layer_norm = nn.LayerNorm(config.hidden_size, eps=config.layer_norm_eps)
 
         self.gradient_checkpointing = False
@@ -541,7 +555,7 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
         position_ids: Optional[torch.LongTensor] = None,
         head_mask: Optional[torch.FloatTensor] = None,
         inputs_embeds: Optional[torch.FloatTensor] = None,
-        past_key_values: Optional[Tuple[Tuple[torch.FloatTensor]]] = None,
+        past_key_values: Optional[Union[Cache, Tuple[Tuple[torch.FloatTensor]]]] = None,
         use_cache: Optional[bool] = None,
         output_attentions: Optional[bool] = None,
         output_hidden_states: Optional[bool] = None,
@@ -552,7 +566,10 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
             Contains precomputed key and value hidden states of the attention blocks. Can be used to speed up decoding.
             If `past_key_values` are used, the user can optionally input only the last `decoder_input_ids` (those that
             don't have their past key value states given to this model) of shape `(batch_size, 1)` instead of all
-            `decoder_input_ids` of shape `(batch_size, sequence_length)`.
+            `decoder_input_ids` of shape `(batch_size, sequence_length)`. A [`Cache`] instance (e.g. [`PagedCache`])
+            can also be passed, in which case the model writes the new key and value states into it in place and
+            returns the same instance. With a cache of fixed length (e.g. [`StaticCache`]), `attention_mask` can be up
+            to the length of the cache.
         use_cache (`bool`, *optional*):
             If set to `True`, `past_key_values` key value states are returned and can be used to speed up decoding (see
             `past_key_values`).
@@ -579,6 +596,8 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
         if past_key_values is None:
             past_length = 0
             past_key_values = tuple([None] * self.config.num_hidden_layers)
+        elif isinstance(past_key_values, Cache):
+            past_length = past_key_values.get_seq_length()
         else:
             past_length = past_key_values[0][0].size(-2)
 
@@ -593,6 +612,12 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
         if attention_mask is not None:
             assert batch_size > 0, "batch_size has to be defined and > 0"
             attention_mask = attention_mask.view(batch_size, -1)
+            max_cache_length = past_key_values.get_max_length() if isinstance(past_key_values, Cache) else None
+            if max_cache_length is not None:
+                # the keys and values of the cache have `max_cache_length` positions, and the causal mask already
+                # hides the ones past the end of the sequence
+                padding_length = max_cache_length - attention_mask.shape[-1]
+                attention_mask = nn.functional.pad(attention_mask, (0, padding_length), value=1)
             # We create a 3D attention mask from a 2D tensor mask.
             # Sizes are [batch_size, 1, 1, to_seq_length]
             # So we can broadcast to [batch_size, num_heads, from_seq_length, to_seq_length]
@@ -630,6 +655,9 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
         presents = () if use_cache else None
         all_attentions = () if output_attentions else None
         all_hidden_states = () if output_hidden_states else None
+        cache = past_key_values if isinstance(past_key_values, Cache) else None
+        if cache is not None:
+            past_key_values = (cache,) * self.config.num_hidden_layers
         for i, (layer, layer_past) in enumerate(zip(self.layers, past_key_values)):
             if output_hidden_states:
                 all_hidden_states = all_hidden_states + (hidden_states,)
@@ -671,6 +699,9 @@ class GPTNeoXModel(GPTNeoXPreTrainedModel):
         if output_hidden_states:
             all_hidden_states = all_hidden_states + (hidden_states,)
 
+        if use_cache and cache is not None:
+            presents = cache
+
         if not return_dict:
             return tuple(v for v in [hidden_states, presents, all_hidden_states, all_attentions] if v is not None)
 
@@ -712,7 +743,7 @@ class GPTNeoXForCausalLM(GPTNeoXPreTrainedModel):
         position_ids: Optional[torch.LongTensor] = None,
         inputs_embeds: Optional[torch.FloatTensor] = None,
         head_mask: Optional[torch.FloatTensor] = None,
-        past_key_values: Optional[Tuple[Tuple[torch.FloatTensor]]] = None,
+        past_key_values: Optional[Union[Cache, Tuple[Tuple[torch.FloatTensor]]]] = None,
         labels: Optional[torch.LongTensor] = None,
         use_cache: Optional[bool] = None,
         output_attentions: Optional[bool] = None,
@@ -804,7 +835,7 @@ class GPTNeoXForCausalLM(GPTNeoXPreTrainedModel):
         input_shape = input_ids.shape
 
         # cut decoder_input_ids if past is used
-        if past_key_values and past_key_values[0] is not None:
+        if past_key_values and (isinstance(past_key_values, Cache) or past_key_values[0] is not None):
             input_ids = input_ids[:, -1:]
 
         position_ids = kwargs.get("position_ids", None)
@@ -836,6 +867,9 @@ class GPTNeoXForCausalLM(GPTNeoXPreTrainedModel):
         return model_inputs
 
     def _reorder_cache(self, past_key_values, beam_idx):
+        if isinstance(past_key_values, Cache):
+            past_key_values.reorder_cache(beam_idx)
+            return past_key_values
         reordered_past = ()
         for layer_past in past_key_values:
             reordered_past += (
@@ -47,10 +47,14 @@ from .audio_classification import AudioClassificationPipeline
 from .automatic_speech_recognition import AutomaticSpeechRecognitionPipeline
 from .base import (
     ArgumentHandler,
+    ArrowPipelineDataFormat,
     CsvPipelineDataFormat,
+    DataParallelPipeline,
+    JsonLinesPipelineDataFormat,
     JsonPipelineDataFormat,
     PipedPipelineDataFormat,
     Pipeline,
+    PipelineCache,
     PipelineDataFormat,
     PipelineException,
     PipelineRegistry,
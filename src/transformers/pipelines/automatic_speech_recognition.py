@@ -11,8 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import itertools
 from collections import defaultdict
-from typing import TYPE_CHECKING, Dict, Optional, Union
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Union
 
 import numpy as np
 import requests
@@ -58,31 +59,36 @@ def rescale_stride(stride, ratio):
     return new_strides
 
 
+def _chunk_item(chunk, feature_extractor, stride_left, stride_right, is_last, rescale=True, dtype=None):
+    processed = feature_extractor(chunk, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
+    if dtype is not None:
+        processed = processed.to(dtype=dtype)
+
+    chunk_len = chunk.shape[0]
+    stride = (chunk_len, stride_left, stride_right)
+    if "input_features" in processed:
+        processed_len = processed["input_features"].shape[-1]
+    elif "input_values" in processed:
+        processed_len = processed["input_values"].shape[-1]
+    if processed_len != chunk.shape[-1] and rescale:
+        ratio = processed_len / chunk_len
+        stride = rescale_stride([stride], ratio)[0]
+    return {"is_last": is_last, "stride": stride, **processed}
+
+
 def chunk_iter(inputs, feature_extractor, chunk_len, stride_left, stride_right, rescale=True, dtype=None):
     inputs_len = inputs.shape[0]
     step = chunk_len - stride_left - stride_right
     for chunk_start_idx in range(0, inputs_len, step):
         chunk_end_idx = chunk_start_idx + chunk_len
         chunk = inputs[chunk_start_idx:chunk_end_idx]
-        processed = feature_extractor(chunk, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
-        if dtype is not None:
-            processed = processed.to(dtype=dtype)
         _stride_left = 0 if chunk_start_idx == 0 else stride_left
         # all right strides must be full, otherwise it is the last item
         is_last = chunk_end_idx > inputs_len if stride_right > 0 else chunk_end_idx >= inputs_len
         _stride_right = 0 if is_last else stride_right
 
-        chunk_len = chunk.shape[0]
-        stride = (chunk_len, _stride_left, _stride_right)
-        if "input_features" in processed:
-            processed_len = processed["input_features"].shape[-1]
-        elif "input_values" in processed:
-            processed_len = processed["input_values"].shape[-1]
-        if processed_len != chunk.shape[-1] and rescale:
-            ratio = processed_len / chunk_len
-            stride = rescale_stride([stride], ratio)[0]
         if chunk.shape[0] > _stride_left:
-            yield {"is_last": is_last, "stride": stride, **processed}
+            yield _chunk_item(chunk, feature_extractor, _stride_left, _stride_right, is_last, rescale, dtype)
         if is_last:
             break
 
@@ -483,22 +489,7 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
             raise ValueError("We expect a single channel audio input for AutomaticSpeechRecognitionPipeline")
 
         if chunk_length_s:
-            if stride_length_s is None:
-                stride_length_s = chunk_length_s / 6
-
-            if isinstance(stride_length_s, (int, float)):
-                stride_length_s = [stride_length_s, stride_length_s]
-
-            # XXX: Carefuly, this variable will not exist in `seq2seq` setting.
-            # Currently chunking is not possible at this level for `seq2seq` so
-            # it's ok.
-            align_to = getattr(self.model.config, "inputs_to_logits_ratio", 1)
-            chunk_len = int(round(chunk_length_s * self.feature_extractor.sampling_rate / align_to) * align_to)
-            stride_left = int(round(stride_length_s[0] * self.feature_extractor.sampling_rate / align_to) * align_to)
-            stride_right = int(round(stride_length_s[1] * self.feature_extractor.sampling_rate / align_to) * align_to)
-
-            if chunk_len < stride_left + stride_right:
-                raise ValueError("Chunk length must be superior to stride length")
+            chunk_len, stride_left, stride_right = self._get_chunk_lengths(chunk_length_s, stride_length_s)
 
             rescale = self.type != "seq2seq_whisper"
             # make sure that
@@ -519,6 +510,144 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
                 processed["stride"] = stride
             yield {"is_last": True, **processed, **extra}
 
+    def _get_chunk_lengths(self, chunk_length_s, stride_length_s=None):
+        """
+        Converts `chunk_length_s` and `stride_length_s` to the number of samples of a chunk and of its left and right
+        strides.
+        """
+        if stride_length_s is None:
+            stride_length_s = chunk_length_s / 6
+
+        if isinstance(stride_length_s, (int, float)):
+            stride_length_s = [stride_length_s, stride_length_s]
+
+        # XXX: Carefuly, this variable will not exist in `seq2seq` setting.
+        # Currently chunking is not possible at this level for `seq2seq` so
+        # it's ok.
+        align_to = getattr(self.model.config, "inputs_to_logits_ratio", 1)
+        chunk_len = int(round(chunk_length_s * self.feature_extractor.sampling_rate / align_to) * align_to)
+        stride_left = int(round(stride_length_s[0] * self.feature_extractor.sampling_rate / align_to) * align_to)
+        stride_right = int(round(stride_length_s[1] * self.feature_extractor.sampling_rate / align_to) * align_to)
+
+        if chunk_len <= stride_left + stride_right:
+            raise ValueError("Chunk length must be superior to stride length")
+        return chunk_len, stride_left, stride_right
+
+    def stream(self, inputs: Iterable[np.ndarray], **kwargs):
+        """
+        Transcribes audio as it arrives. The audio is cut in overlapping chunks like with `chunk_length_s`, each chunk
+        is transcribed as soon as the audio following its right stride has been received, and the transcript of all
+        the chunks so far is yielded, merged with the same stride logic as
+        [`~AutomaticSpeechRecognitionPipeline.__call__`]. Since the right stride of the last transcribed chunk is only
+        decoded with the next chunk, the partial transcripts only contain audio that was decoded with its right
+        context, and the last transcript is the same as the one of [`~AutomaticSpeechRecognitionPipeline.__call__`] on
+        the whole audio.
+
+        With CTC models (without language model) and seq2seq models other than Whisper, the chunks are merged from left
+        to right, so the chunks already transcribed are replaced by the tokens of their merged transcript: the memory
+        and the merge of each step do not grow with the length of the stream, only the decoding of the transcript
+        does. The decoding of Whisper and of CTC models with a language model needs all the chunks, so they are kept
+        and decoded again at each step, and the cost of each step grows with the length of the stream.
+
+        Args:
+            inputs (`Iterable[np.ndarray]`):
+                The audio, as consecutive pieces of raw single channel audio (`np.ndarray` of shape (n, )) sampled at
+                the sampling rate of the feature extractor, e.g. read from a microphone or a socket.
+            chunk_length_s (`float`):
+                The length of the chunks to transcribe, either passed here or when creating the pipeline.
+            stride_length_s (`float`, *optional*, defaults to `chunk_length_s / 6`):
+                The length of the stride on the left and right of each chunk.
+            kwargs:
+                The other arguments of [`~AutomaticSpeechRecognitionPipeline.__call__`], e.g. `return_timestamps` or
+                `generate_kwargs`.
+
+        Return:
+            A generator of the transcripts of the audio received so far, in the format of
+            [`~AutomaticSpeechRecognitionPipeline.__call__`]. The last one is the transcript of the whole audio.
+        """
+        preprocess_params, forward_params, postprocess_params = self._sanitize_parameters(**kwargs)
+        preprocess_params = {**self._preprocess_params, **preprocess_params}
+        forward_params = {**self._forward_params, **forward_params}
+        postprocess_params = {**self._postprocess_params, **postprocess_params}
+
+        chunk_length_s = preprocess_params.get("chunk_length_s")
+        if not chunk_length_s:
+            raise ValueError("`chunk_length_s` is required to transcribe a stream of audio.")
+        chunk_len, stride_left, stride_right = self._get_chunk_lengths(
+            chunk_length_s, preprocess_params.get("stride_length_s")
+        )
+        step = chunk_len - stride_left - stride_right
+        rescale = self.type != "seq2seq_whisper"
+
+        # `buffer` holds the audio received from the sample `buffer_start` on, `chunk_start` is the first sample of the
+        # next chunk to transcribe
+        buffer = np.zeros(0, dtype=np.float32)
+        buffer_start = 0
+        chunk_start = 0
+        model_outputs = []
+        for audio in itertools.chain(inputs, [None]):
+            is_exhausted = audio is None
+            if not is_exhausted:
+                if not isinstance(audio, np.ndarray):
+                    raise ValueError(f"We expect a numpy ndarray as input, got `{type(audio)}`")
+                if len(audio.shape) != 1:
+                    raise ValueError("We expect a single channel audio input for AutomaticSpeechRecognitionPipeline")
+                buffer = np.concatenate([buffer, audio])
+            inputs_len = buffer_start + buffer.shape[0]
+
+            num_outputs = len(model_outputs)
+            while True:
+                chunk_end = chunk_start + chunk_len
+                if is_exhausted:
+                    # same rules as `chunk_iter` once the length of the audio is known
+                    is_last = chunk_end > inputs_len if stride_right > 0 else chunk_end >= inputs_len
+                elif chunk_end < inputs_len:
+                    is_last = False
+                else:
+                    break
+                chunk = buffer[chunk_start - buffer_start : chunk_end - buffer_start]
+                _stride_left = 0 if chunk_start == 0 else stride_left
+                _stride_right = 0 if is_last else stride_right
+                if chunk.shape[0] > _stride_left:
+                    model_inputs = _chunk_item(
+                        chunk, self.feature_extractor, _stride_left, _stride_right, is_last, rescale, self.torch_dtype
+                    )
+                    model_outputs.append(self.forward(model_inputs, **forward_params))
+                if is_last:
+                    break
+                chunk_start += step
+
+            # The audio before the next chunk is not needed anymore
+            buffer = buffer[chunk_start - buffer_start :]
+            buffer_start = chunk_start
+
+            if len(model_outputs) > num_outputs or (is_exhausted and len(model_outputs) > 0):
+                # `postprocess` consumes the outputs it is given
+                yield self.postprocess([dict(output) for output in model_outputs], **postprocess_params)
+                model_outputs = self._merge_stream_outputs(model_outputs)
+
+    def _merge_stream_outputs(self, model_outputs):
+        """
+        Replaces the outputs of the chunks transcribed so far by a single output holding the tokens of their merged
+        transcript, for the models whose chunks are merged from left to right.
+        """
+        if len(model_outputs) < 2:
+            return model_outputs
+        if self.type == "ctc":
+            # the strides are cut off the tokens of each chunk, and the tokens are concatenated
+            items = []
+            for output in model_outputs:
+                total_n, left, right = output["stride"]
+                items.append(output["tokens"][:, left : total_n - right])
+            tokens = torch.cat(items, dim=1)
+            return [{"tokens": tokens, "stride": (tokens.shape[1], 0, 0)}]
+        if self.type == "seq2seq":
+            # merging the merged sequence with the next chunk gives the same sequence as merging all the chunks
+            sequences = [output["tokens"].numpy() for output in model_outputs]
+            tokens = _find_longest_common_sequence(sequences, self.tokenizer).astype(np.int64)
+            return [{"tokens": torch.from_numpy(tokens[None, :]), "stride": model_outputs[-1]["stride"]}]
+        return model_outputs
+
     def _forward(self, model_inputs, return_timestamps=False, generate_kwargs=None):
         if generate_kwargs is None:
             generate_kwargs = {}
@@ -13,18 +13,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import collections
+import copy
 import csv
+import hashlib
 import importlib
+import itertools
 import json
+import mmap
 import os
 import pickle
+import queue
 import sys
+import threading
 import traceback
 import types
 import warnings
 from abc import ABC, abstractmethod
+from array import array
 from collections import UserDict
 from contextlib import contextmanager
+from multiprocessing.reduction import ForkingPickler
 from os.path import abspath, exists
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
@@ -34,7 +42,15 @@ from ..image_processing_utils import BaseImageProcessor
 from ..modelcard import ModelCard
 from ..models.auto.configuration_auto import AutoConfig
 from ..tokenization_utils import PreTrainedTokenizer
-from ..utils import ModelOutput, add_end_docstrings, infer_framework, is_tf_available, is_torch_available, logging
+from ..utils import (
+    ModelOutput,
+    add_end_docstrings,
+    infer_framework,
+    is_pyarrow_available,
+    is_tf_available,
+    is_torch_available,
+    logging,
+)
 
 
 GenericTensor = Union[List["GenericTensor"], "torch.Tensor", "tf.Tensor"]
@@ -438,7 +454,9 @@ class PipelineDataFormat:
     currently includes:
 
     - JSON
+    - JSON Lines
     - CSV
+    - Arrow and Parquet
     - stdin/stdout (pipe)
 
     `PipelineDataFormat` also includes some utilities to work with multi-columns like mapping from datasets columns to
@@ -452,7 +470,9 @@ class PipelineDataFormat:
             Whether or not to overwrite the `output_path`.
     """
 
-    SUPPORTED_FORMATS = ["json", "csv", "pipe"]
+    SUPPORTED_FORMATS = ["json", "jsonl", "csv", "arrow", "parquet", "pipe"]
+    # Whether the outputs can be written as they are produced with `write`
+    supports_incremental_writes = False
 
     def __init__(
         self,
@@ -491,6 +511,21 @@ class PipelineDataFormat:
         """
         raise NotImplementedError()
 
+    def write(self, data: List[dict]):
+        """
+        Append the provided data object to the outputs already written, for formats that support incremental writes.
+
+        Args:
+            data (`List[dict]`): The data to store.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support incremental writes, use `save`.")
+
+    def close(self):
+        """
+        Release the files opened by the data format.
+        """
+        pass
+
     def save_binary(self, data: Union[dict, List[dict]]) -> str:
         """
         Save the provided data object as a pickle-formatted binary data on the disk.
@@ -522,7 +557,8 @@ class PipelineDataFormat:
 
         Args:
             format (`str`):
-                The format of the desired pipeline. Acceptable values are `"json"`, `"csv"` or `"pipe"`.
+                The format of the desired pipeline. Acceptable values are `"json"`, `"jsonl"`, `"csv"`, `"arrow"`,
+                `"parquet"` or `"pipe"`.
             output_path (`str`, *optional*):
                 Where to save the outgoing data.
             input_path (`str`, *optional*):
@@ -537,12 +573,16 @@ class PipelineDataFormat:
         """
         if format == "json":
             return JsonPipelineDataFormat(output_path, input_path, column, overwrite=overwrite)
+        elif format == "jsonl":
+            return JsonLinesPipelineDataFormat(output_path, input_path, column, overwrite=overwrite)
         elif format == "csv":
             return CsvPipelineDataFormat(output_path, input_path, column, overwrite=overwrite)
+        elif format in ["arrow", "parquet"]:
+            return ArrowPipelineDataFormat(output_path, input_path, column, overwrite=overwrite)
         elif format == "pipe":
             return PipedPipelineDataFormat(output_path, input_path, column, overwrite=overwrite)
         else:
-            raise KeyError(f"Unknown reader {format} (Available reader are json/csv/pipe)")
+            raise KeyError(f"Unknown reader {format} (Available reader are json/jsonl/csv/arrow/parquet/pipe)")
 
 
 class CsvPipelineDataFormat(PipelineDataFormat):
@@ -631,6 +671,218 @@ class JsonPipelineDataFormat(PipelineDataFormat):
             json.dump(data, f)
 
 
+def _write_json_lines(f, data: List[dict]):
+    for entry in data:
+        f.write(json.dumps(entry) + "\n")
+    f.flush()
+
+
+class _JsonLinesOutputMixin:
+    """
+    Writes the outputs of a [`~pipelines.PipelineDataFormat`] as a JSON Lines file, either at once with `save` or as
+    they are produced with `write`.
+    """
+
+    supports_incremental_writes = True
+    _output_file = None
+
+    def __getstate__(self):
+        # Files cannot be pickled (e.g. to `DataLoader` workers), the output file is opened again when needed
+        state = self.__dict__.copy()
+        state["_output_file"] = None
+        return state
+
+    def save(self, data: List[dict]):
+        """
+        Save the provided data object in a JSON Lines file.
+
+        Args:
+            data (`List[dict]`): The data to store.
+        """
+        with open(self.output_path, "w") as f:
+            _write_json_lines(f, data)
+
+    def write(self, data: List[dict]):
+        """
+        Append the provided data object to the JSON Lines file of the outputs, and flush it so that the outputs
+        written so far are not lost if the process is interrupted.
+
+        Args:
+            data (`List[dict]`): The data to store.
+        """
+        if self._output_file is None:
+            self._output_file = open(self.output_path, "w")
+        _write_json_lines(self._output_file, data)
+
+    def close(self):
+        if self._output_file is not None:
+            self._output_file.close()
+            self._output_file = None
+        super().close()
+
+
+class JsonLinesPipelineDataFormat(_JsonLinesOutputMixin, PipelineDataFormat):
+    """
+    Support for pipelines using JSON Lines file format, with one JSON entry per line.
+
+    The input file is memory-mapped instead of being loaded, and an entry is only parsed when it is read, so that
+    corpora larger than the memory can be processed. The entries can be read in order by iterating, or at random by
+    indexing, which relies on an index of the offsets of the lines built on first use. The outputs are written as JSON
+    lines too, and can be written as they are produced with [`~pipelines.JsonLinesPipelineDataFormat.write`].
+
+    Args:
+        output_path (`str`, *optional*): Where to save the outgoing data.
+        input_path (`str`, *optional*): Where to look for the input data.
+        column (`str`, *optional*): The column to read.
+        overwrite (`bool`, *optional*, defaults to `False`):
+            Whether or not to overwrite the `output_path`.
+    """
+
+    def __init__(
+        self,
+        output_path: Optional[str],
+        input_path: Optional[str],
+        column: Optional[str],
+        overwrite=False,
+    ):
+        super().__init__(output_path, input_path, column, overwrite=overwrite)
+        self._input = None
+        self._line_offsets = None
+
+    def _get_input(self):
+        if self._input is None:
+            with open(self.input_path, "rb") as f:
+                # Empty files cannot be memory-mapped
+                if os.fstat(f.fileno()).st_size == 0:
+                    self._input = b""
+                else:
+                    self._input = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._input
+
+    def _iter_lines(self):
+        data = self._get_input()
+        start = 0
+        while start < len(data):
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            yield start, data[start:end]
+            start = end + 1
+
+    def _parse(self, line: bytes):
+        entry = json.loads(line)
+        if self.is_multi_columns:
+            return {k: entry[c] for k, c in self.column}
+        return entry[self.column[0]]
+
+    def __iter__(self):
+        for _, line in self._iter_lines():
+            if line.strip():
+                yield self._parse(line)
+
+    def __len__(self):
+        if self._line_offsets is None:
+            # Only the offsets of the lines are kept, blank lines are skipped
+            self._line_offsets = array("Q", (start for start, line in self._iter_lines() if line.strip()))
+        return len(self._line_offsets)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Index {i} is out of range for {len(self)} entries")
+        data = self._get_input()
+        start = self._line_offsets[i]
+        end = data.find(b"\n", start)
+        return self._parse(data[start : end if end != -1 else len(data)])
+
+    def __getstate__(self):
+        # Memory maps cannot be pickled either, the input is mapped again when needed
+        state = super().__getstate__()
+        state["_input"] = None
+        return state
+
+    def close(self):
+        if isinstance(self._input, mmap.mmap):
+            self._input.close()
+        self._input = None
+        super().close()
+
+
+class ArrowPipelineDataFormat(_JsonLinesOutputMixin, PipelineDataFormat):
+    """
+    Support for pipelines reading Arrow (IPC file or stream) or Parquet files, which requires `pyarrow`.
+
+    The input file is memory-mapped and read lazily one record batch at a time, and only the columns used by the
+    pipeline are converted to Python objects. Files ending with `.parquet` are read as Parquet, and the other files as
+    Arrow. The outputs are written as JSON lines, like with [`~pipelines.JsonLinesPipelineDataFormat`], and can be
+    written as they are produced with [`~pipelines.ArrowPipelineDataFormat.write`].
+
+    Args:
+        output_path (`str`, *optional*): Where to save the outgoing data.
+        input_path (`str`, *optional*): Where to look for the input data.
+        column (`str`, *optional*): The column to read.
+        overwrite (`bool`, *optional*, defaults to `False`):
+            Whether or not to overwrite the `output_path`.
+    """
+
+    def __init__(
+        self,
+        output_path: Optional[str],
+        input_path: Optional[str],
+        column: Optional[str],
+        overwrite=False,
+    ):
+        if not is_pyarrow_available():
+            raise ImportError(
+                "pyarrow is required to read Arrow and Parquet files in pipelines. It can be installed with "
+                "`pip install pyarrow`."
+            )
+        super().__init__(output_path, input_path, column, overwrite=overwrite)
+
+    def _check_columns(self, schema, columns):
+        missing = [c for c in columns if schema.get_field_index(c) == -1]
+        if len(missing) > 0:
+            raise KeyError(f"Columns {missing} are not in {self.input_path}, available columns are {schema.names}")
+
+    def _iter_record_batches(self, columns):
+        import pyarrow as pa
+
+        if self.input_path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            parquet_file = pq.ParquetFile(self.input_path, memory_map=True)
+            self._check_columns(parquet_file.schema_arrow, columns)
+            yield from parquet_file.iter_batches(columns=columns)
+            return
+
+        with pa.memory_map(self.input_path, "r") as source:
+            try:
+                reader = pa.ipc.open_file(source)
+            except pa.ArrowInvalid:
+                # Not an IPC file, it should use the streaming format
+                source.seek(0)
+                reader = None
+            if reader is not None:
+                self._check_columns(reader.schema, columns)
+                for i in range(reader.num_record_batches):
+                    yield reader.get_batch(i)
+            else:
+                reader = pa.ipc.open_stream(source)
+                self._check_columns(reader.schema, columns)
+                yield from reader
+
+    def __iter__(self):
+        columns = [c for _, c in self.column] if self.is_multi_columns else self.column[:1]
+        for batch in self._iter_record_batches(columns):
+            values = {c: batch.column(batch.schema.get_field_index(c)).to_pylist() for c in columns}
+            for i in range(batch.num_rows):
+                if self.is_multi_columns:
+                    yield {k: values[c][i] for k, c in self.column}
+                else:
+                    yield values[columns[0]][i]
+
+
 class PipedPipelineDataFormat(PipelineDataFormat):
     """
     Read data from piped input to the python process. For multi columns data, columns should separated by \t
@@ -693,6 +945,144 @@ class _ScikitCompat(ABC):
         raise NotImplementedError()
 
 
+class PipelineCache:
+    """
+    A bounded cache of the outputs of a pipeline, to avoid computing again the outputs of inputs that were already
+    seen. An output is looked up by the content of its input and by the parameters of the call (after
+    `_sanitize_parameters`), and the least recently used outputs are evicted first.
+
+    Pass it to a pipeline with `pipeline(..., cache=PipelineCache())`. It is used when the pipeline is called on a
+    single input, which is then run as without cache, or on a list of inputs, whose duplicated inputs are only
+    processed once (generators and datasets are not cached). A cache should only be shared by pipelines using the same
+    model.
+
+    Args:
+        max_size (`int`, *optional*, defaults to 1024):
+            The maximum number of outputs kept in memory.
+        cache_dir (`str`, *optional*):
+            A directory where the outputs are also stored as JSON files, so that they survive the process and are not
+            limited by `max_size`. Outputs are not removed from the directory. The outputs that JSON cannot store
+            as they are (e.g. tensors, images or tuples) are only kept in memory.
+    """
+
+    def __init__(self, max_size: int = 1024, cache_dir: Optional[str] = None):
+        if max_size < 1:
+            raise ValueError(f"`max_size` should be a positive integer, got {max_size}")
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.num_hits = 0
+        self.num_misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        `float`: The fraction of the inputs whose output did not need to be computed.
+        """
+        num_lookups = self.num_hits + self.num_misses
+        return self.num_hits / num_lookups if num_lookups > 0 else 0.0
+
+    def get_key(self, pipeline: "Pipeline", item, preprocess_params, forward_params, postprocess_params):
+        """
+        Returns the key of an input and of the parameters of a call, or `None` if they cannot be hashed.
+        """
+        params = [sorted(params.items()) for params in (preprocess_params, forward_params, postprocess_params)]
+        model_name = getattr(pipeline.model.config, "_name_or_path", None) if pipeline.model is not None else None
+        try:
+            content = pickle.dumps((pipeline.__class__.__name__, model_name, item, params))
+        except Exception:
+            return None
+        return hashlib.sha256(content).hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Looks up the output stored with `key`, and updates the hit and miss counts.
+
+        Returns:
+            `Tuple[bool, Any]`: Whether the output was found, and a copy of the output.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.num_hits += 1
+                return True, copy.deepcopy(self._entries[key])
+        if self.cache_dir is not None and os.path.exists(self._get_path(key)):
+            try:
+                with open(self._get_path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except Exception:
+                logger.warning(f"The cached output {self._get_path(key)} could not be loaded, it will be computed")
+            else:
+                self._add(key, value)
+                with self._lock:
+                    self.num_hits += 1
+                return True, copy.deepcopy(value)
+        with self._lock:
+            self.num_misses += 1
+        return False, None
+
+    def record_hit(self):
+        """
+        Counts a hit for an output found without looking it up, e.g. the output of an input duplicated in a call.
+        """
+        with self._lock:
+            self.num_hits += 1
+
+    def set(self, key: str, value):
+        """
+        Stores a copy of the output `value` with `key`.
+        """
+        value = copy.deepcopy(value)
+        self._add(key, value)
+        if self.cache_dir is not None:
+            content = _to_json(value)
+            if content is None:
+                logger.warning_once(
+                    f"Some outputs cannot be stored as JSON in {self.cache_dir}, they are only cached in memory."
+                )
+                return
+            # Written to a temporary file first so that other processes never read a partial file
+            tmp_path = f"{self._get_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self._get_path(key))
+
+    def _add(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all the outputs kept in memory and resets the hit and miss counts. The outputs stored in `cache_dir`
+        are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.num_hits = 0
+            self.num_misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _to_json(value) -> Optional[str]:
+    # Only the values that JSON gives back unchanged are stored, e.g. not the tuples, which are loaded as lists
+    try:
+        content = json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+    return content if json.loads(content) == value else None
+
+
 PIPELINE_INIT_ARGS = r"""
     Arguments:
         model ([`PreTrainedModel`] or [`TFPreTrainedModel`]):
@@ -719,6 +1109,21 @@ PIPELINE_INIT_ARGS = r"""
             When the pipeline will use *DataLoader* (when passing a dataset, on GPU for a Pytorch model), the size of
             the batch to use, for inference this is not always beneficial, please read [Batching with
             pipelines](https://huggingface.co/transformers/main_classes/pipelines.html#pipeline-batching) .
+        group_by_length (`bool`, *optional*, defaults to `False`):
+            When the pipeline is called on a list of inputs with a `batch_size` greater than 1, whether or not to batch
+            together the inputs of similar lengths once preprocessed, to reduce padding. The outputs are still returned
+            in the order of the inputs.
+        max_tokens_per_batch (`int`, *optional*):
+            When the pipeline will use *DataLoader*, batches the inputs by number of tokens instead of `batch_size`:
+            inputs are added to a batch as long as it holds at most `max_tokens_per_batch` tokens, padding included.
+            An input longer than that makes a batch on its own.
+        overlap_stages (`bool`, *optional*, defaults to `False`):
+            When the pipeline will use *DataLoader*, whether or not to run the preprocessing, the forward pass of the
+            model and the postprocessing in separate threads connected by bounded queues, so that e.g. the
+            postprocessing of a batch overlaps with the forward pass of the next one.
+        cache ([`~pipelines.PipelineCache`], *optional*):
+            A cache of the outputs of the pipeline, used to return the outputs of inputs already seen with the same
+            parameters without computing them again.
         args_parser ([`~pipelines.ArgumentHandler`], *optional*):
             Reference to the object in charge of parsing supplied pipeline parameters.
         device (`int`, *optional*, defaults to -1):
@@ -734,6 +1139,9 @@ if is_torch_available():
         PipelineDataset,
         PipelineIterator,
         PipelinePackIterator,
+        PipelineStageIterator,
+        PipelineTokenBudgetIterator,
+        _get_padded_length,
     )
 
 
@@ -827,6 +1235,10 @@ class Pipeline(_ScikitCompat):
         self.call_count = 0
         self._batch_size = kwargs.pop("batch_size", None)
         self._num_workers = kwargs.pop("num_workers", None)
+        self._group_by_length = kwargs.pop("group_by_length", False)
+        self._max_tokens_per_batch = kwargs.pop("max_tokens_per_batch", None)
+        self._overlap_stages = kwargs.pop("overlap_stages", False)
+        self._cache = kwargs.pop("cache", None)
         self._preprocess_params, self._forward_params, self._postprocess_params = self._sanitize_parameters(**kwargs)
 
         if self.image_processor is None and self.feature_extractor is not None:
@@ -1050,7 +1462,15 @@ class Pipeline(_ScikitCompat):
         return model_outputs
 
     def get_iterator(
-        self, inputs, num_workers: int, batch_size: int, preprocess_params, forward_params, postprocess_params
+        self,
+        inputs,
+        num_workers: int,
+        batch_size: int,
+        preprocess_params,
+        forward_params,
+        postprocess_params,
+        max_tokens_per_batch: Optional[int] = None,
+        overlap_stages: bool = False,
     ):
         if isinstance(inputs, collections.abc.Sized):
             dataset = PipelineDataset(inputs, self.preprocess, preprocess_params)
@@ -1066,15 +1486,43 @@ class Pipeline(_ScikitCompat):
         if "TOKENIZERS_PARALLELISM" not in os.environ:
             logger.info("Disabling tokenizer parallelism, we're using DataLoader multithreading already")
             os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        dataloader, loader_batch_size = self._get_dataloader(dataset, num_workers, batch_size, max_tokens_per_batch)
+        if overlap_stages:
+            dataloader = PipelineStageIterator(dataloader)
+        model_iterator = PipelineIterator(
+            dataloader, self.forward, forward_params, loader_batch_size=loader_batch_size
+        )
+        if overlap_stages:
+            model_iterator = PipelineStageIterator(model_iterator)
+        final_iterator = PipelineIterator(model_iterator, self.postprocess, postprocess_params)
+        return final_iterator
+
+    def _get_dataloader(self, dataset, num_workers: int, batch_size: int, max_tokens_per_batch: Optional[int] = None):
+        """
+        Returns the loader of the batches of preprocessed items of `dataset`, and the maximum size of its batches.
+        """
         # TODO hack by collating feature_extractor and image_processor
         feature_extractor = self.feature_extractor if self.feature_extractor is not None else self.image_processor
+        if max_tokens_per_batch is not None:
+            # the items are loaded one by one, and packed into batches in the main process
+            dataloader = DataLoader(dataset, num_workers=num_workers, batch_size=1, collate_fn=no_collate_fn)
+            collate_fn = pad_collate_fn(self.tokenizer, feature_extractor)
+            return PipelineTokenBudgetIterator(dataloader, collate_fn, max_tokens_per_batch), max_tokens_per_batch
         collate_fn = no_collate_fn if batch_size == 1 else pad_collate_fn(self.tokenizer, feature_extractor)
         dataloader = DataLoader(dataset, num_workers=num_workers, batch_size=batch_size, collate_fn=collate_fn)
-        model_iterator = PipelineIterator(dataloader, self.forward, forward_params, loader_batch_size=batch_size)
-        final_iterator = PipelineIterator(model_iterator, self.postprocess, postprocess_params)
-        return final_iterator
+        return dataloader, batch_size
 
-    def __call__(self, inputs, *args, num_workers=None, batch_size=None, **kwargs):
+    def __call__(
+        self,
+        inputs,
+        *args,
+        num_workers=None,
+        batch_size=None,
+        group_by_length=None,
+        max_tokens_per_batch=None,
+        overlap_stages=None,
+        **kwargs,
+    ):
         if args:
             logger.warning(f"Ignoring args : {args}")
 
@@ -1088,6 +1536,14 @@ class Pipeline(_ScikitCompat):
                 batch_size = 1
             else:
                 batch_size = self._batch_size
+        if group_by_length is None:
+            group_by_length = self._group_by_length
+        if max_tokens_per_batch is None:
+            max_tokens_per_batch = self._max_tokens_per_batch
+        if overlap_stages is None:
+            overlap_stages = self._overlap_stages
+        # with a token budget, the batches are as large as the budget allows
+        is_batched = batch_size > 1 or max_tokens_per_batch is not None
 
         preprocess_params, forward_params, postprocess_params = self._sanitize_parameters(**kwargs)
 
@@ -1113,31 +1569,176 @@ class Pipeline(_ScikitCompat):
         # TODO make the get_iterator work also for `tf` (and `flax`).
         can_use_iterator = self.framework == "pt" and (is_dataset or is_generator or is_list)
 
-        if is_list:
-            if can_use_iterator:
-                final_iterator = self.get_iterator(
-                    inputs, num_workers, batch_size, preprocess_params, forward_params, postprocess_params
+        run_list_kwargs = {
+            "num_workers": num_workers,
+            "batch_size": batch_size,
+            "group_by_length": group_by_length and is_batched,
+            "max_tokens_per_batch": max_tokens_per_batch,
+            "overlap_stages": overlap_stages,
+        }
+        key = None
+        if self._cache is not None and not (is_dataset or is_generator):
+            if is_list:
+                return self.run_cached(
+                    inputs, preprocess_params, forward_params, postprocess_params, **run_list_kwargs
                 )
-                outputs = list(final_iterator)
-                return outputs
-            else:
-                return self.run_multi(inputs, preprocess_params, forward_params, postprocess_params)
+            # A single input is run as without cache, only its output is cached
+            key = self._cache.get_key(self, inputs, preprocess_params, forward_params, postprocess_params)
+            if key is not None:
+                is_cached, output = self._cache.get(key)
+                if is_cached:
+                    return output
+
+        if is_list:
+            return self.run_list(inputs, preprocess_params, forward_params, postprocess_params, **run_list_kwargs)
         elif can_use_iterator:
             return self.get_iterator(
-                inputs, num_workers, batch_size, preprocess_params, forward_params, postprocess_params
+                inputs,
+                num_workers,
+                batch_size,
+                preprocess_params,
+                forward_params,
+                postprocess_params,
+                max_tokens_per_batch=max_tokens_per_batch,
+                overlap_stages=overlap_stages,
             )
         elif is_iterable:
             return self.iterate(inputs, preprocess_params, forward_params, postprocess_params)
         elif self.framework == "pt" and isinstance(self, ChunkPipeline):
-            return next(
+            outputs = next(
                 iter(
                     self.get_iterator(
-                        [inputs], num_workers, batch_size, preprocess_params, forward_params, postprocess_params
+                        [inputs],
+                        num_workers,
+                        batch_size,
+                        preprocess_params,
+                        forward_params,
+                        postprocess_params,
+                        max_tokens_per_batch=max_tokens_per_batch,
+                        overlap_stages=overlap_stages,
                     )
                 )
             )
         else:
-            return self.run_single(inputs, preprocess_params, forward_params, postprocess_params)
+            outputs = self.run_single(inputs, preprocess_params, forward_params, postprocess_params)
+        if key is not None:
+            self._cache.set(key, outputs)
+        return outputs
+
+    def run_list(
+        self,
+        inputs: list,
+        preprocess_params,
+        forward_params,
+        postprocess_params,
+        num_workers: int = 0,
+        batch_size: int = 1,
+        group_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        overlap_stages: bool = False,
+    ):
+        """
+        Runs the pipeline on a list of inputs and returns the list of their outputs.
+        """
+        can_use_iterator = self.framework == "pt"
+        if can_use_iterator and group_by_length and not isinstance(self, ChunkPipeline):
+            return self.run_grouped_by_length(
+                inputs,
+                num_workers,
+                batch_size,
+                preprocess_params,
+                forward_params,
+                postprocess_params,
+                max_tokens_per_batch=max_tokens_per_batch,
+                overlap_stages=overlap_stages,
+            )
+        elif can_use_iterator:
+            final_iterator = self.get_iterator(
+                inputs,
+                num_workers,
+                batch_size,
+                preprocess_params,
+                forward_params,
+                postprocess_params,
+                max_tokens_per_batch=max_tokens_per_batch,
+                overlap_stages=overlap_stages,
+            )
+            outputs = list(final_iterator)
+            return outputs
+        else:
+            return self.run_multi(inputs, preprocess_params, forward_params, postprocess_params)
+
+    def run_cached(self, inputs: list, preprocess_params, forward_params, postprocess_params, **kwargs):
+        """
+        Runs the pipeline on a list of inputs, only computing the outputs of the inputs that are not in the cache of
+        the pipeline, once per distinct input. The new outputs are added to the cache. `kwargs` are passed to
+        [`~Pipeline.run_list`].
+        """
+        outputs = [None] * len(inputs)
+        # the positions of each distinct input to compute, by key
+        missing = {}
+        uncached = []
+        for i, item in enumerate(inputs):
+            key = self._cache.get_key(self, item, preprocess_params, forward_params, postprocess_params)
+            if key is None:
+                uncached.append(i)
+            elif key in missing:
+                missing[key].append(i)
+                self._cache.record_hit()
+            else:
+                is_cached, output = self._cache.get(key)
+                if is_cached:
+                    outputs[i] = output
+                else:
+                    missing[key] = [i]
+
+        to_compute = [positions[0] for positions in missing.values()] + uncached
+        if len(to_compute) > 0:
+            new_outputs = self.run_list(
+                [inputs[i] for i in to_compute], preprocess_params, forward_params, postprocess_params, **kwargs
+            )
+            for key, positions, output in zip(missing.keys(), missing.values(), new_outputs):
+                self._cache.set(key, output)
+                outputs[positions[0]] = output
+                for i in positions[1:]:
+                    outputs[i] = copy.deepcopy(output)
+            for i, output in zip(uncached, new_outputs[len(missing) :]):
+                outputs[i] = output
+        return outputs
+
+    def run_grouped_by_length(
+        self,
+        inputs,
+        num_workers: int,
+        batch_size: int,
+        preprocess_params,
+        forward_params,
+        postprocess_params,
+        max_tokens_per_batch: Optional[int] = None,
+        overlap_stages: bool = False,
+    ):
+        """
+        Runs the pipeline on a list of inputs, batching together the inputs whose preprocessed lengths are the closest,
+        so that batches are padded as little as possible. The outputs are returned in the order of `inputs`.
+        """
+        model_inputs = [self.preprocess(item, **preprocess_params) for item in inputs]
+        # a stable sort, so that inputs of the same length keep their order
+        order = sorted(range(len(model_inputs)), key=lambda i: _get_padded_length(model_inputs[i]))
+
+        dataloader, loader_batch_size = self._get_dataloader(
+            [model_inputs[i] for i in order], num_workers, batch_size, max_tokens_per_batch
+        )
+        model_iterator = PipelineIterator(
+            dataloader, self.forward, forward_params, loader_batch_size=loader_batch_size
+        )
+        if overlap_stages:
+            model_iterator = PipelineStageIterator(model_iterator)
+        final_iterator = PipelineIterator(model_iterator, self.postprocess, postprocess_params)
+
+        outputs = [None] * len(inputs)
+        for i, output in zip(order, final_iterator):
+            outputs[i] = output
+        return outputs
 
     def run_multi(self, inputs, preprocess_params, forward_params, postprocess_params):
         return [self.run_single(item, preprocess_params, forward_params, postprocess_params) for item in inputs]
@@ -1165,7 +1766,15 @@ class ChunkPipeline(Pipeline):
         return outputs
 
     def get_iterator(
-        self, inputs, num_workers: int, batch_size: int, preprocess_params, forward_params, postprocess_params
+        self,
+        inputs,
+        num_workers: int,
+        batch_size: int,
+        preprocess_params,
+        forward_params,
+        postprocess_params,
+        max_tokens_per_batch: Optional[int] = None,
+        overlap_stages: bool = False,
     ):
         if "TOKENIZERS_PARALLELISM" not in os.environ:
             logger.info("Disabling tokenizer parallelism, we're using DataLoader multithreading already")
@@ -1178,15 +1787,229 @@ class ChunkPipeline(Pipeline):
             num_workers = 1
         dataset = PipelineChunkIterator(inputs, self.preprocess, preprocess_params)
 
-        # TODO hack by collating feature_extractor and image_processor
-        feature_extractor = self.feature_extractor if self.feature_extractor is not None else self.image_processor
-        collate_fn = no_collate_fn if batch_size == 1 else pad_collate_fn(self.tokenizer, feature_extractor)
-        dataloader = DataLoader(dataset, num_workers=num_workers, batch_size=batch_size, collate_fn=collate_fn)
-        model_iterator = PipelinePackIterator(dataloader, self.forward, forward_params, loader_batch_size=batch_size)
+        dataloader, loader_batch_size = self._get_dataloader(dataset, num_workers, batch_size, max_tokens_per_batch)
+        if overlap_stages:
+            dataloader = PipelineStageIterator(dataloader)
+        model_iterator = PipelinePackIterator(
+            dataloader, self.forward, forward_params, loader_batch_size=loader_batch_size
+        )
+        if overlap_stages:
+            model_iterator = PipelineStageIterator(model_iterator)
         final_iterator = PipelineIterator(model_iterator, self.postprocess, postprocess_params)
         return final_iterator
 
 
+def _outputs_per_input(outputs, num_inputs: int) -> list:
+    """
+    Returns the outputs of a pipeline called on a list of `num_inputs` inputs as a list with one output per input.
+    Some pipelines (e.g. question answering or conversational) return the output of a single input unwrapped.
+    """
+    if num_inputs == 1 and not (isinstance(outputs, list) and len(outputs) == 1):
+        return [outputs]
+    return outputs
+
+
+def _data_parallel_worker(pipeline, cores, task_queue, result_queue):
+    """Runs `pipeline` on the chunks of inputs of `task_queue`, in a process pinned to `cores`."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        call_id, index, inputs, kwargs = task
+        try:
+            outputs = _outputs_per_input(pipeline(inputs, **kwargs), len(inputs))
+            # Pickled here rather than by the queue, which drops the objects it cannot pickle and never delivers them
+            result = (call_id, index, ForkingPickler.dumps(outputs), None)
+        except Exception as e:
+            result = (call_id, index, None, _get_picklable_exception(e))
+        result_queue.put(result)
+
+
+def _get_picklable_exception(exception: Exception) -> Exception:
+    """Returns `exception` if it can be sent to another process, else a `RuntimeError` with its repr and traceback."""
+    try:
+        pickle.loads(pickle.dumps(exception))
+        return exception
+    except Exception:
+        return RuntimeError(
+            f"{exception!r} was raised in a process of the `DataParallelPipeline`:\n"
+            + "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        )
+
+
+class DataParallelPipeline:
+    """
+    Runs a PyTorch pipeline on CPU in several processes, each pinned to its own set of cores. Intra-op parallelism
+    scales poorly past a socket: several processes, each running on fewer cores, give a better throughput on machines
+    with many cores. The weights of the model are moved to shared memory, so that the processes share them instead of
+    each loading its own copy.
+
+    The inputs are sent to the processes by chunks of `chunk_size`, and the outputs are returned in the order of the
+    inputs. At most two chunks per process are in flight at any time, so that inputs coming from a generator are not
+    all loaded at once.
+
+    The processes are started with the `spawn` method: as for `torch.multiprocessing`, scripts creating a
+    `DataParallelPipeline` have to be guarded by `if __name__ == "__main__":`.
+
+    Args:
+        pipeline ([`Pipeline`]):
+            The pipeline to run. Its model has to be a PyTorch model on CPU.
+        num_processes (`int`):
+            The number of processes to run the pipeline in.
+        core_sets (`List[List[int]]`, *optional*):
+            The cores each process is pinned to. Defaults to splitting the cores available to the current process in
+            `num_processes` contiguous sets, which keeps each process on one socket when `num_processes` is a multiple
+            of the number of sockets.
+        chunk_size (`int`, *optional*, defaults to 64):
+            The number of inputs sent to a process at once.
+
+    Example:
+
+    ```python
+    >>> from transformers import DataParallelPipeline, pipeline
+
+    >>> classifier = pipeline("text-classification", model="distilbert-base-uncased-finetuned-sst-2-english")
+    >>> with DataParallelPipeline(classifier, num_processes=4) as parallel_classifier:
+    ...     outputs = parallel_classifier(["This restaurant is awesome"] * 1000, batch_size=8)
+    ```
+    """
+
+    def __init__(
+        self,
+        pipeline: "Pipeline",
+        num_processes: int,
+        core_sets: Optional[List[List[int]]] = None,
+        chunk_size: int = 64,
+    ):
+        if pipeline.framework != "pt" or pipeline.device.type != "cpu":
+            raise ValueError("`DataParallelPipeline` only supports PyTorch pipelines running on CPU.")
+        if chunk_size < 1:
+            raise ValueError(f"`chunk_size` has to be a strictly positive integer, but is {chunk_size}")
+        if core_sets is None:
+            if hasattr(os, "sched_getaffinity"):
+                cores = sorted(os.sched_getaffinity(0))
+            else:
+                cores = list(range(os.cpu_count()))
+            if num_processes < 1 or num_processes > len(cores):
+                raise ValueError(
+                    f"`num_processes` has to be between 1 and the number of available cores ({len(cores)}), but is "
+                    f"{num_processes}"
+                )
+            core_sets = [
+                cores[i * len(cores) // num_processes : (i + 1) * len(cores) // num_processes]
+                for i in range(num_processes)
+            ]
+        elif len(core_sets) != num_processes or any(len(cores) == 0 for cores in core_sets):
+            raise ValueError(f"`core_sets` has to contain {num_processes} non-empty sets of cores.")
+
+        self.pipeline = pipeline
+        self.num_processes = num_processes
+        self.core_sets = core_sets
+        self.chunk_size = chunk_size
+
+        pipeline.model.share_memory()
+        context = torch.multiprocessing.get_context("spawn")
+        self._task_queue = context.Queue()
+        self._result_queue = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_data_parallel_worker,
+                args=(pipeline, cores, self._task_queue, self._result_queue),
+                daemon=True,
+            )
+            for cores in core_sets
+        ]
+        for process in self._processes:
+            process.start()
+        self._call_id = 0
+
+    def __call__(self, inputs, **kwargs):
+        """
+        Runs the pipeline on `inputs`, a single input, a list of inputs or an iterable of inputs (e.g. a generator).
+        The keyword arguments are passed to the pipeline, e.g. `batch_size`.
+
+        Return:
+            The output of the pipeline for a single input, the list of the outputs for a list of inputs, and a
+            generator of the outputs for other iterables.
+        """
+        if isinstance(inputs, list):
+            return list(self._iterate(inputs, kwargs))
+        elif isinstance(inputs, (types.GeneratorType, collections.abc.Iterator)) or (
+            Dataset is not None and isinstance(inputs, Dataset)
+        ):
+            return self._iterate(inputs, kwargs)
+        else:
+            return next(self._iterate([inputs], kwargs))
+
+    def _iterate(self, inputs, kwargs):
+        # results of a previous call that wasn't fully consumed are discarded
+        self._call_id += 1
+        call_id = self._call_id
+        inputs = iter(inputs)
+        outputs = {}
+        num_chunks = 0
+        next_chunk = 0
+        is_exhausted = False
+        while True:
+            while not is_exhausted and num_chunks - next_chunk < 2 * self.num_processes:
+                chunk = list(itertools.islice(inputs, self.chunk_size))
+                if len(chunk) == 0:
+                    is_exhausted = True
+                    break
+                self._task_queue.put((call_id, num_chunks, chunk, kwargs))
+                num_chunks += 1
+            if next_chunk == num_chunks:
+                return
+
+            while next_chunk not in outputs:
+                outputs.update(self._get_result(call_id))
+            yield from outputs.pop(next_chunk)
+            next_chunk += 1
+
+    def _get_result(self, call_id):
+        while True:
+            try:
+                result_call_id, index, chunk_outputs, exception = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    raise RuntimeError("A process of the `DataParallelPipeline` died unexpectedly.")
+                continue
+            if result_call_id != call_id:
+                continue
+            if exception is not None:
+                raise exception
+            return {index: ForkingPickler.loads(chunk_outputs)}
+
+    def close(self, timeout: float = 30.0):
+        """
+        Stops the processes.
+
+        Args:
+            timeout (`float`, *optional*, defaults to 30.0):
+                The time, in seconds, to wait for the processes to finish their current chunk. The processes still
+                running after that are terminated.
+        """
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"A `DataParallelPipeline` process is still running after {timeout}s, terminating it.")
+                process.terminate()
+                process.join()
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 class PipelineRegistry:
     def __init__(self, supported_tasks: Dict[str, Any], task_aliases: Dict[str, str]) -> None:
         self.supported_tasks = supported_tasks
@@ -1,3 +1,7 @@
+import collections.abc
+import threading
+from queue import Full, Queue
+
 import numpy as np
 import torch
 from torch.utils.data import Dataset, IterableDataset
@@ -5,6 +9,16 @@ from torch.utils.data import Dataset, IterableDataset
 from ..utils.generic import ModelOutput
 
 
+def _get_padded_length(item) -> int:
+    """
+    Returns the length along which `pad_collate_fn` pads a preprocessed item, e.g. its number of tokens.
+    """
+    if not isinstance(item, collections.abc.Mapping):
+        return 0
+    lengths = [value.shape[1] for value in item.values() if isinstance(value, torch.Tensor) and value.dim() > 1]
+    return max(lengths, default=0)
+
+
 class PipelineDataset(Dataset):
     def __init__(self, dataset, process, params):
         self.dataset = dataset
@@ -59,6 +73,7 @@ class PipelineIterator(IterableDataset):
         # Internal bookkeeping
         self._loader_batch_index = None
         self._loader_batch_data = None
+        self._loader_batch_length = None
 
     def __len__(self):
         return len(self.loader)
@@ -114,8 +129,27 @@ class PipelineIterator(IterableDataset):
         self._loader_batch_index += 1
         return result
 
+    def _observe_batch_length(self, processed):
+        """
+        Sets the number of items to unroll from the batch `processed`: batches may have another size than
+        `loader_batch_size`, e.g. the last one or the ones of a token budget.
+        """
+        if isinstance(processed, torch.Tensor):
+            first_tensor = processed
+        else:
+            key = list(processed.keys())[0]
+            first_tensor = processed[key]
+        if isinstance(first_tensor, list):
+            observed_batch_size = len(first_tensor)
+        else:
+            observed_batch_size = first_tensor.shape[0]
+        if observed_batch_size > 0:
+            self._loader_batch_length = observed_batch_size
+        else:
+            self._loader_batch_length = self.loader_batch_size
+
     def __next__(self):
-        if self._loader_batch_index is not None and self._loader_batch_index < self.loader_batch_size:
+        if self._loader_batch_index is not None and self._loader_batch_index < self._loader_batch_length:
             # We are currently unrolling a batch so we just need to return
             # the current item within a batch
             return self.loader_batch_item()
@@ -125,20 +159,8 @@ class PipelineIterator(IterableDataset):
         processed = self.infer(item, **self.params)
         # We now have a batch of "inferred things".
         if self.loader_batch_size is not None:
-            # Try to infer the size of the batch
-            if isinstance(processed, torch.Tensor):
-                first_tensor = processed
-            else:
-                key = list(processed.keys())[0]
-                first_tensor = processed[key]
-            if isinstance(first_tensor, list):
-                observed_batch_size = len(first_tensor)
-            else:
-                observed_batch_size = first_tensor.shape[0]
-            if 0 < observed_batch_size < self.loader_batch_size:
-                # could be last batch so we can't unroll as many
-                # elements.
-                self.loader_batch_size = observed_batch_size
+            # Try to infer the size of the batch, it could be the last batch so we can't unroll as many elements.
+            self._observe_batch_length(processed)
             # Setting internal index to unwrap the batch
             self._loader_batch_data = processed
             self._loader_batch_index = 0
@@ -254,8 +276,8 @@ class PipelinePackIterator(PipelineIterator):
         # its a `is_last` and then just passes it on to the caller.
         is_last = False
         accumulator = []
-        if self._loader_batch_index is not None and self._loader_batch_index < self.loader_batch_size:
-            while self._loader_batch_index < self.loader_batch_size:
+        if self._loader_batch_index is not None and self._loader_batch_index < self._loader_batch_length:
+            while self._loader_batch_index < self._loader_batch_length:
                 item = self.loader_batch_item()
                 is_last = item.pop("is_last")
                 accumulator.append(item)
@@ -265,22 +287,10 @@ class PipelinePackIterator(PipelineIterator):
         while not is_last:
             processed = self.infer(next(self.iterator), **self.params)
             if self.loader_batch_size is not None:
-                if isinstance(processed, torch.Tensor):
-                    first_tensor = processed
-                else:
-                    key = list(processed.keys())[0]
-                    first_tensor = processed[key]
-                if isinstance(first_tensor, list):
-                    observed_batch_size = len(first_tensor)
-                else:
-                    observed_batch_size = first_tensor.shape[0]
-                if 0 < observed_batch_size < self.loader_batch_size:
-                    # could be last batch so we can't unroll as many
-                    # elements.
-                    self.loader_batch_size = observed_batch_size
+                self._observe_batch_length(processed)
                 self._loader_batch_data = processed
                 self._loader_batch_index = 0
-                while self._loader_batch_index < self.loader_batch_size:
+                while self._loader_batch_index < self._loader_batch_length:
                     item = self.loader_batch_item()
                     is_last = item.pop("is_last")
                     accumulator.append(item)
@@ -293,6 +303,127 @@ class PipelinePackIterator(PipelineIterator):
         return accumulator
 
 
+class PipelineTokenBudgetIterator(IterableDataset):
+    def __init__(self, loader, collate_fn, max_tokens_per_batch: int):
+        """
+        Roughly equivalent to
+
+        ```
+        batch = []
+        for item in loader:
+            if len(batch + [item]) * max(len(x) for x in batch + [item]) > max_tokens_per_batch:
+                yield collate_fn(batch)
+                batch = []
+            batch.append(item)
+        ```
+
+        Greedily packs the preprocessed items of `loader` into batches whose padded size stays within
+        `max_tokens_per_batch`, so that batches of short items hold more of them than batches of long items. An item
+        longer than the budget makes a batch on its own, and an item without a padded dimension counts as one token.
+
+                Arguments:
+                    loader (`torch.utils.data.DataLoader` or any iterator):
+                        The iterator over the preprocessed items.
+                    collate_fn (any function):
+                        The function batching a list of items, e.g. the one returned by `pad_collate_fn`.
+                    max_tokens_per_batch (`int`):
+                        The maximum number of tokens of a batch, padding included.
+        """
+        if max_tokens_per_batch < 1:
+            raise ValueError(
+                f"`max_tokens_per_batch` has to be a strictly positive integer, but is {max_tokens_per_batch}"
+            )
+        self.loader = loader
+        self.collate_fn = collate_fn
+        self.max_tokens_per_batch = max_tokens_per_batch
+
+    def __iter__(self):
+        batch = []
+        batch_length = 0
+        for item in self.loader:
+            # Items without a padded dimension count as one token, so that batches never exceed
+            # `max_tokens_per_batch` items
+            item_length = max(_get_padded_length(item), 1)
+            length = max(batch_length, item_length)
+            if len(batch) > 0 and (len(batch) + 1) * length > self.max_tokens_per_batch:
+                yield self.collate_fn(batch)
+                batch = []
+                length = item_length
+            batch.append(item)
+            batch_length = length
+        if len(batch) > 0:
+            yield self.collate_fn(batch)
+
+
+class PipelineStageIterator(IterableDataset):
+    def __init__(self, loader, max_queue_size: int = 2):
+        """
+        Roughly equivalent to `iter(loader)`, but the items of `loader` are computed in a background thread, at most
+        `max_queue_size` items ahead of the consumer. Chaining these iterators runs the stages of a pipeline (e.g.
+        preprocessing, the forward pass of the model and postprocessing) concurrently: the forward pass of a batch
+        overlaps with the postprocessing of the previous one, as PyTorch releases the GIL during the forward pass.
+
+        Exceptions raised by `loader` are raised to the consumer, in order.
+
+                Arguments:
+                    loader (`torch.utils.data.DataLoader` or any iterator):
+                        The iterator computed in the background thread.
+                    max_queue_size (`int`, *optional*, defaults to 2):
+                        The maximum number of items computed ahead of the consumer.
+        """
+        if max_queue_size < 1:
+            raise ValueError(f"`max_queue_size` has to be a strictly positive integer, but is {max_queue_size}")
+        self.loader = loader
+        self.max_queue_size = max_queue_size
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        queue = Queue(maxsize=self.max_queue_size)
+        stop_event = threading.Event()
+        # The thread does not reference `self` nor this generator, so that the generator can be garbage collected (and
+        # the thread stopped) when the consumer stops iterating before the end
+        thread = threading.Thread(target=_produce, args=(iter(self.loader), queue, stop_event), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item, exception = queue.get()
+                if isinstance(exception, StopIteration):
+                    return
+                elif exception is not None:
+                    raise exception
+                yield item
+        finally:
+            stop_event.set()
+
+
+def _produce(iterator, queue, stop_event):
+    """
+    Puts the items of `iterator` in `queue` as `(item, None)`, then `(None, exception)` with the exception raised by
+    `iterator` or `StopIteration()` at the end. Stops as soon as `stop_event` is set.
+    """
+
+    def put(value):
+        # waits for the consumer, unless the iteration was stopped
+        while not stop_event.is_set():
+            try:
+                queue.put(value, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    try:
+        for item in iterator:
+            if not put((item, None)):
+                return
+    except Exception as e:
+        put((None, e))
+        return
+    put((None, StopIteration()))
+
+
 class KeyDataset(Dataset):
     def __init__(self, dataset: Dataset, key: str):
         self.dataset = dataset
@@ -147,6 +147,126 @@ def select_starts_ends(
     return starts, ends, scores, min_null_score
 
 
+def decode_spans_batched(
+    start: np.ndarray, end: np.ndarray, topk: int, max_answer_len: int, desired_tokens: np.ndarray
+) -> Tuple:
+    """
+    Batched version of `decode_spans()`: generates the probabilities of the spans of all the chunks at once and
+    returns the `topk` best spans across all of them.
+
+    Only the spans that start and end on desired tokens, with an end position after the starting position and at most
+    `max_answer_len` tokens, are scored, so a chunk of `seq_len` tokens only builds `seq_len * max_answer_len`
+    candidates instead of the whole outer product of the start and end probabilities.
+
+    Args:
+        start (`np.ndarray`): Individual start probabilities for each token, of shape `(num_chunks, seq_len)`.
+        end (`np.ndarray`): Individual end probabilities for each token, of shape `(num_chunks, seq_len)`.
+        topk (`int`): Indicates how many possible answer span(s) to extract from the model output.
+        max_answer_len (`int`): Maximum size of the answer to extract from the model's output.
+        desired_tokens (`np.ndarray`): Mask determining tokens that can be part of the answer, of shape
+            `(num_chunks, seq_len)`.
+
+    Returns:
+        A tuple `(chunk_indices, starts, ends, scores)` sorted by decreasing score.
+    """
+    seq_len = start.shape[-1]
+    max_answer_len = max(min(max_answer_len, seq_len), 1)
+
+    # The candidate span (s, s + l) of each chunk is stored at position (chunk, s, l)
+    end_indices = np.arange(seq_len)[:, None] + np.arange(max_answer_len)[None, :]
+    valid = end_indices < seq_len
+    end_indices = np.minimum(end_indices, seq_len - 1)
+    valid = valid[None] & desired_tokens[:, :, None] & desired_tokens[:, end_indices]
+    candidates = np.where(valid, start[:, :, None] * end[:, end_indices], -1.0)
+
+    scores_flat = candidates.reshape(-1)
+    topk = min(topk, int(valid.sum()))
+    if topk == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=candidates.dtype)
+    if topk == 1:
+        idx_sort = np.array([np.argmax(scores_flat)])
+    else:
+        idx = np.argpartition(-scores_flat, topk - 1)[:topk]
+        idx_sort = idx[np.argsort(-scores_flat[idx], kind="stable")]
+
+    chunk_indices, starts, lengths = np.unravel_index(idx_sort, candidates.shape)
+    return chunk_indices, starts, starts + lengths, scores_flat[idx_sort]
+
+
+def select_starts_ends_batched(
+    start,
+    end,
+    p_mask,
+    attention_mask,
+    min_null_score=1000000,
+    top_k=1,
+    handle_impossible_answer=False,
+    max_answer_len=15,
+):
+    """
+    Batched version of `select_starts_ends()`: takes the raw outputs of any `ModelForQuestionAnswering` for all the
+    chunks of an example, normalizes them and uses `decode_spans_batched()` to find the best spans across all the
+    chunks at once.
+
+    Args:
+        start (`List[np.ndarray]`): Individual start logits for each token, one array per chunk.
+        end (`List[np.ndarray]`): Individual end logits for each token, one array per chunk.
+        p_mask (`List[np.ndarray]`): A mask with 1 for values that cannot be in the answer, one array per chunk.
+        attention_mask (`List[np.ndarray]`): The attention masks generated by the tokenizer, one array (or `None`) per
+            chunk.
+        min_null_score(`float`): The minimum null (empty) answer score seen so far.
+        topk (`int`): Indicates how many possible answer span(s) to extract from the model output.
+        handle_impossible_answer(`bool`): Whether to allow null (empty) answers
+        max_answer_len (`int`): Maximum size of the answer to extract from the model's output.
+
+    Returns:
+        A tuple `(chunk_indices, starts, ends, scores, min_null_score)`.
+    """
+    start = [np.asarray(chunk_start).reshape(-1) for chunk_start in start]
+    end = [np.asarray(chunk_end).reshape(-1) for chunk_end in end]
+    lengths = np.array([len(chunk_start) for chunk_start in start])
+    seq_len = lengths.max()
+    dtype = np.result_type(*start, *end)
+
+    # Chunks are padded to the same length, padding tokens are not part of the chunks
+    in_chunk = np.arange(seq_len)[None, :] < lengths[:, None]
+    desired_tokens = in_chunk.copy()
+    batch_start = np.zeros((len(start), seq_len), dtype=dtype)
+    batch_end = np.zeros((len(start), seq_len), dtype=dtype)
+    for i, (chunk_start, chunk_end, chunk_p_mask, chunk_attention_mask) in enumerate(
+        zip(start, end, p_mask, attention_mask)
+    ):
+        batch_start[i, : lengths[i]] = chunk_start
+        batch_end[i, : lengths[i]] = chunk_end
+        # Ensure padded tokens & question tokens cannot belong to the set of candidate answers.
+        desired_tokens[i, : lengths[i]] &= np.asarray(chunk_p_mask).reshape(-1) == 0
+        if chunk_attention_mask is not None:
+            desired_tokens[i, : lengths[i]] &= np.asarray(chunk_attention_mask).reshape(-1) != 0
+
+    # Make sure non-context indexes in the tensor cannot contribute to the softmax
+    batch_start = np.where(desired_tokens, batch_start, -10000.0)
+    batch_end = np.where(desired_tokens, batch_end, -10000.0)
+
+    # Normalize logits and spans to retrieve the answer, the padding of the chunks is left out
+    batch_start = np.exp(batch_start - batch_start.max(axis=-1, keepdims=True)) * in_chunk
+    batch_start = batch_start / batch_start.sum(axis=-1, keepdims=True)
+
+    batch_end = np.exp(batch_end - batch_end.max(axis=-1, keepdims=True)) * in_chunk
+    batch_end = batch_end / batch_end.sum(axis=-1, keepdims=True)
+
+    if handle_impossible_answer:
+        min_null_score = min(min_null_score, (batch_start[:, 0] * batch_end[:, 0]).min().item())
+
+    # Mask CLS
+    batch_start[:, 0] = batch_end[:, 0] = 0.0
+
+    chunk_indices, starts, ends, scores = decode_spans_batched(
+        batch_start, batch_end, top_k, max_answer_len, desired_tokens
+    )
+    return chunk_indices, starts, ends, scores, min_null_score
+
+
 class QuestionAnsweringArgumentHandler(ArgumentHandler):
     """
     QuestionAnsweringPipeline requires the user to provide multiple arguments (i.e. question & context) to be mapped to
@@ -533,20 +653,25 @@ class QuestionAnsweringPipeline(ChunkPipeline):
         align_to_words=True,
     ):
         min_null_score = 1000000  # large and positive
-        answers = []
-        for output in model_outputs:
-            start_ = output["start"]
-            end_ = output["end"]
-            example = output["example"]
-            p_mask = output["p_mask"]
-            attention_mask = (
+        # The best spans of all the chunks are decoded at once
+        chunk_indices, starts, ends, scores, min_null_score = select_starts_ends_batched(
+            [output["start"] for output in model_outputs],
+            [output["end"] for output in model_outputs],
+            [output["p_mask"] for output in model_outputs],
+            [
                 output["attention_mask"].numpy() if output.get("attention_mask", None) is not None else None
-            )
-
-            starts, ends, scores, min_null_score = select_starts_ends(
-                start_, end_, p_mask, attention_mask, min_null_score, top_k, handle_impossible_answer, max_answer_len
-            )
+                for output in model_outputs
+            ],
+            min_null_score,
+            top_k,
+            handle_impossible_answer,
+            max_answer_len,
+        )
 
+        answers = []
+        for chunk_index, s, e, score in zip(chunk_indices.tolist(), starts.tolist(), ends.tolist(), scores):
+            output = model_outputs[chunk_index]
+            example = output["example"]
             if not self.tokenizer.is_fast:
                 char_to_word = np.array(example.char_to_word_offset)
 
@@ -555,16 +680,15 @@ class QuestionAnsweringPipeline(ChunkPipeline):
                 # Start: Index of the first character of the answer in the context string
                 # End: Index of the character following the last character of the answer in the context string
                 # Answer: Plain text of the answer
-                for s, e, score in zip(starts, ends, scores):
-                    token_to_orig_map = output["token_to_orig_map"]
-                    answers.append(
-                        {
-                            "score": score.item(),
-                            "start": np.where(char_to_word == token_to_orig_map[s])[0][0].item(),
-                            "end": np.where(char_to_word == token_to_orig_map[e])[0][-1].item(),
-                            "answer": " ".join(example.doc_tokens[token_to_orig_map[s] : token_to_orig_map[e] + 1]),
-                        }
-                    )
+                token_to_orig_map = output["token_to_orig_map"]
+                answers.append(
+                    {
+                        "score": score.item(),
+                        "start": np.where(char_to_word == token_to_orig_map[s])[0][0].item(),
+                        "end": np.where(char_to_word == token_to_orig_map[e])[0][-1].item(),
+                        "answer": " ".join(example.doc_tokens[token_to_orig_map[s] : token_to_orig_map[e] + 1]),
+                    }
+                )
             else:
                 # Convert the answer (tokens) back to the original text
                 # Score: score from the model
@@ -587,20 +711,19 @@ class QuestionAnsweringPipeline(ChunkPipeline):
                 # - we start by finding the right word containing the token with `token_to_word`
                 # - then we convert this word in a character span with `word_to_chars`
                 sequence_index = 1 if question_first else 0
-                for s, e, score in zip(starts, ends, scores):
-                    s = s - offset
-                    e = e - offset
-
-                    start_index, end_index = self.get_indices(enc, s, e, sequence_index, align_to_words)
-
-                    answers.append(
-                        {
-                            "score": score.item(),
-                            "start": start_index,
-                            "end": end_index,
-                            "answer": example.context_text[start_index:end_index],
-                        }
-                    )
+                s = s - offset
+                e = e - offset
+
+                start_index, end_index = self.get_indices(enc, s, e, sequence_index, align_to_words)
+
+                answers.append(
+                    {
+                        "score": score.item(),
+                        "start": start_index,
+                        "end": end_index,
+                        "answer": example.context_text[start_index:end_index],
+                    }
+                )
 
         if handle_impossible_answer:
             answers.append({"score": min_null_score, "start": 0, "end": 0, "answer": ""})
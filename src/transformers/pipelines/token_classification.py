@@ -363,50 +363,51 @@ class TokenClassificationPipeline(ChunkPipeline):
         aggregation_strategy: AggregationStrategy,
     ) -> List[dict]:
         """Fuse various numpy arrays into dicts with all the information needed for aggregation"""
-        pre_entities = []
-        for idx, token_scores in enumerate(scores):
-            # Filter special_tokens
-            if special_tokens_mask[idx]:
-                continue
+        # The tokens are converted and their offsets fetched for the whole sequence at once
+        indices = np.flatnonzero(np.asarray(special_tokens_mask) == 0)
+        if len(indices) == 0:
+            return []
+        token_ids = np.asarray(input_ids)[indices].tolist()
+        words = self.tokenizer.convert_ids_to_tokens(token_ids)
+
+        if offset_mapping is not None:
+            offsets = np.asarray(offset_mapping)[indices].tolist()
+            is_word_aware = getattr(self.tokenizer, "_tokenizer", None) and getattr(
+                self.tokenizer._tokenizer.model, "continuing_subword_prefix", None
+            )
+            if not is_word_aware and aggregation_strategy in {
+                AggregationStrategy.FIRST,
+                AggregationStrategy.AVERAGE,
+                AggregationStrategy.MAX,
+            }:
+                warnings.warn(
+                    "Tokenizer does not support real words, using fallback heuristic",
+                    UserWarning,
+                )
+        else:
+            offsets = [(None, None)] * len(indices)
 
-            word = self.tokenizer.convert_ids_to_tokens(int(input_ids[idx]))
+        pre_entities = []
+        for idx, token_id, word, (start_ind, end_ind) in zip(indices.tolist(), token_ids, words, offsets):
             if offset_mapping is not None:
-                start_ind, end_ind = offset_mapping[idx]
-                if not isinstance(start_ind, int):
-                    if self.framework == "pt":
-                        start_ind = start_ind.item()
-                        end_ind = end_ind.item()
                 word_ref = sentence[start_ind:end_ind]
-                if getattr(self.tokenizer, "_tokenizer", None) and getattr(
-                    self.tokenizer._tokenizer.model, "continuing_subword_prefix", None
-                ):
+                if is_word_aware:
                     # This is a BPE, word aware tokenizer, there is a correct way
                     # to fuse tokens
                     is_subword = len(word) != len(word_ref)
                 else:
                     # This is a fallback heuristic. This will fail most likely on any kind of text + punctuation mixtures that will be considered "words". Non word aware models cannot do better than this unfortunately.
-                    if aggregation_strategy in {
-                        AggregationStrategy.FIRST,
-                        AggregationStrategy.AVERAGE,
-                        AggregationStrategy.MAX,
-                    }:
-                        warnings.warn(
-                            "Tokenizer does not support real words, using fallback heuristic",
-                            UserWarning,
-                        )
                     is_subword = start_ind > 0 and " " not in sentence[start_ind - 1 : start_ind + 1]
 
-                if int(input_ids[idx]) == self.tokenizer.unk_token_id:
+                if token_id == self.tokenizer.unk_token_id:
                     word = word_ref
                     is_subword = False
             else:
-                start_ind = None
-                end_ind = None
                 is_subword = False
 
             pre_entity = {
                 "word": word,
-                "scores": token_scores,
+                "scores": scores[idx],
                 "start": start_ind,
                 "end": end_ind,
                 "index": idx,
@@ -418,18 +419,21 @@ class TokenClassificationPipeline(ChunkPipeline):
     def aggregate(self, pre_entities: List[dict], aggregation_strategy: AggregationStrategy) -> List[dict]:
         if aggregation_strategy in {AggregationStrategy.NONE, AggregationStrategy.SIMPLE}:
             entities = []
-            for pre_entity in pre_entities:
-                entity_idx = pre_entity["scores"].argmax()
-                score = pre_entity["scores"][entity_idx]
-                entity = {
-                    "entity": self.model.config.id2label[entity_idx],
-                    "score": score,
-                    "index": pre_entity["index"],
-                    "word": pre_entity["word"],
-                    "start": pre_entity["start"],
-                    "end": pre_entity["end"],
-                }
-                entities.append(entity)
+            if len(pre_entities) > 0:
+                # The best entity of all the tokens is computed at once
+                scores = np.stack([pre_entity["scores"] for pre_entity in pre_entities])
+                entity_indices = scores.argmax(axis=-1)
+                entity_scores = scores[np.arange(len(scores)), entity_indices]
+                for pre_entity, entity_idx, score in zip(pre_entities, entity_indices.tolist(), entity_scores):
+                    entity = {
+                        "entity": self.model.config.id2label[entity_idx],
+                        "score": score,
+                        "index": pre_entity["index"],
+                        "word": pre_entity["word"],
+                        "start": pre_entity["start"],
+                        "end": pre_entity["end"],
+                    }
+                    entities.append(entity)
         else:
             entities = self.aggregate_words(pre_entities, aggregation_strategy)
 
@@ -479,20 +483,52 @@ class TokenClassificationPipeline(ChunkPipeline):
             AggregationStrategy.SIMPLE,
         }:
             raise ValueError("NONE and SIMPLE strategies are invalid for word aggregation")
+        if len(entities) == 0:
+            return []
+
+        # A word starts at each token that is not a subword, the scores of its tokens are aggregated for all the words
+        # at once
+        scores = np.stack([entity["scores"] for entity in entities])
+        is_word_start = np.array([not entity["is_subword"] for entity in entities])
+        is_word_start[0] = True
+        word_starts = np.flatnonzero(is_word_start)
+        word_ends = np.append(word_starts[1:], len(entities))
+        if aggregation_strategy == AggregationStrategy.FIRST:
+            word_scores = scores[word_starts]
+        elif aggregation_strategy == AggregationStrategy.MAX:
+            # the scores of the first token with the highest score of each word, or of its first token if all its
+            # scores are NaN
+            token_max_scores = scores.max(axis=-1)
+            word_max_scores = np.fmax.reduceat(token_max_scores, word_starts)
+            is_max = token_max_scores == np.repeat(word_max_scores, word_ends - word_starts)
+            max_indices = np.minimum.reduceat(np.where(is_max, np.arange(len(entities)), len(entities)), word_starts)
+            word_scores = scores[np.where(max_indices < len(entities), max_indices, word_starts)]
+        elif aggregation_strategy == AggregationStrategy.AVERAGE:
+            # the average ignores NaN scores, like `np.nanmean`
+            is_valid = ~np.isnan(scores)
+            score_sums = np.add.reduceat(np.where(is_valid, scores, 0), word_starts, axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                word_scores = score_sums / np.add.reduceat(is_valid.astype(scores.dtype), word_starts, axis=0)
+            word_scores = word_scores.astype(scores.dtype)
+        else:
+            raise ValueError("Invalid aggregation_strategy")
+        entity_indices = word_scores.argmax(axis=-1)
+        entity_scores = word_scores[np.arange(len(word_scores)), entity_indices]
 
         word_entities = []
-        word_group = None
-        for entity in entities:
-            if word_group is None:
-                word_group = [entity]
-            elif entity["is_subword"]:
-                word_group.append(entity)
-            else:
-                word_entities.append(self.aggregate_word(word_group, aggregation_strategy))
-                word_group = [entity]
-        # Last item
-        if word_group is not None:
-            word_entities.append(self.aggregate_word(word_group, aggregation_strategy))
+        for word_start, word_end, entity_idx, score in zip(
+            word_starts.tolist(), word_ends.tolist(), entity_indices.tolist(), entity_scores
+        ):
+            word_entity = {
+                "entity": self.model.config.id2label[entity_idx],
+                "score": score,
+                "word": self.tokenizer.convert_tokens_to_string(
+                    [entity["word"] for entity in entities[word_start:word_end]]
+                ),
+                "start": entities[word_start]["start"],
+                "end": entities[word_end - 1]["end"],
+            }
+            word_entities.append(word_entity)
         return word_entities
 
     def group_sub_entities(self, entities: List[dict]) -> dict:
@@ -540,18 +576,23 @@ class TokenClassificationPipeline(ChunkPipeline):
 
         entity_groups = []
         entity_group_disagg = []
+        # The tags are computed once per label
+        tags = {}
 
+        last_tag = None
         for entity in entities:
+            if entity["entity"] not in tags:
+                tags[entity["entity"]] = self.get_tag(entity["entity"])
+            bi, tag = tags[entity["entity"]]
             if not entity_group_disagg:
                 entity_group_disagg.append(entity)
+                last_tag = tag
                 continue
 
             # If the current entity is similar and adjacent to the previous entity,
             # append it to the disaggregated entity group
             # The split is meant to account for the "B" and "I" prefixes
             # Shouldn't merge if both entities are B-type
-            bi, tag = self.get_tag(entity["entity"])
-            last_bi, last_tag = self.get_tag(entity_group_disagg[-1]["entity"])
 
             if tag == last_tag and bi != "B":
                 # Modify subword type to be previous_type
@@ -561,6 +602,7 @@ class TokenClassificationPipeline(ChunkPipeline):
                 # aggregate the disaggregated entity group
                 entity_groups.append(self.group_sub_entities(entity_group_disagg))
                 entity_group_disagg = [entity]
+                last_tag = tag
         if entity_group_disagg:
             # it's the last entity, add it to the entity groups
             entity_groups.append(self.group_sub_entities(entity_group_disagg))
@@ -1,15 +1,20 @@
 import inspect
+from collections import OrderedDict
 from typing import List, Union
 
 import numpy as np
 
 from ..tokenization_utils import TruncationStrategy
+from ..tokenization_utils_base import PreTrainedTokenizerBase
 from ..utils import add_end_docstrings, logging
 from .base import PIPELINE_INIT_ARGS, ArgumentHandler, ChunkPipeline
 
 
 logger = logging.get_logger(__name__)
 
+# Maximum number of tokenized hypotheses kept by a pipeline when `reuse_tokenization=True`
+_MAX_CACHED_HYPOTHESES = 4096
+
 
 class ZeroShotClassificationArgumentHandler(ArgumentHandler):
     """
@@ -86,6 +91,7 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
 
     def __init__(self, args_parser=ZeroShotClassificationArgumentHandler(), *args, **kwargs):
         self._args_parser = args_parser
+        self._hypothesis_ids = OrderedDict()
         super().__init__(*args, **kwargs)
         if self.entailment_id == -1:
             logger.warning(
@@ -107,13 +113,7 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
         Parse arguments and tokenize only_first so that hypothesis (label) is not truncated
         """
         return_tensors = self.framework
-        if self.tokenizer.pad_token is None:
-            # Override for tokenizers not supporting padding
-            logger.error(
-                "Tokenizer was not supporting padding necessary for zero-shot, attempting to use "
-                " `pad_token=eos_token`"
-            )
-            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self._ensure_pad_token()
         try:
             inputs = self.tokenizer(
                 sequence_pairs,
@@ -142,6 +142,50 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
 
         return inputs
 
+    def _ensure_pad_token(self):
+        if self.tokenizer.pad_token is None:
+            # Override for tokenizers not supporting padding
+            logger.error(
+                "Tokenizer was not supporting padding necessary for zero-shot, attempting to use "
+                " `pad_token=eos_token`"
+            )
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+    def _can_reuse_tokenization(self):
+        # Premise and hypothesis ids can only be assembled by the tokenizer if it knows where its special tokens go
+        return (
+            type(self.tokenizer).build_inputs_with_special_tokens
+            is not PreTrainedTokenizerBase.build_inputs_with_special_tokens
+        )
+
+    def _get_hypothesis_ids(self, hypothesis):
+        """
+        Tokenizes a hypothesis without special tokens, the most recently used hypotheses are cached across calls.
+        """
+        if hypothesis in self._hypothesis_ids:
+            self._hypothesis_ids.move_to_end(hypothesis)
+        else:
+            self._hypothesis_ids[hypothesis] = self.tokenizer(hypothesis, add_special_tokens=False)["input_ids"]
+            if len(self._hypothesis_ids) > _MAX_CACHED_HYPOTHESES:
+                self._hypothesis_ids.popitem(last=False)
+        return self._hypothesis_ids[hypothesis]
+
+    def _tokenize_with_reuse(self, sequence, hypotheses):
+        """
+        Tokenizes the premise once and reuses the cached hypotheses to build the pairs, truncating only_first like
+        `_parse_and_tokenize`.
+        """
+        premise_ids = self.tokenizer(sequence, add_special_tokens=False)["input_ids"]
+        return [
+            self.tokenizer.prepare_for_model(
+                premise_ids,
+                self._get_hypothesis_ids(hypothesis),
+                add_special_tokens=True,
+                truncation=TruncationStrategy.ONLY_FIRST,
+            )
+            for hypothesis in hypotheses
+        ]
+
     def _sanitize_parameters(self, **kwargs):
         if kwargs.get("multi_class", None) is not None:
             kwargs["multi_label"] = kwargs["multi_class"]
@@ -154,6 +198,10 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
             preprocess_params["candidate_labels"] = self._args_parser._parse_labels(kwargs["candidate_labels"])
         if "hypothesis_template" in kwargs:
             preprocess_params["hypothesis_template"] = kwargs["hypothesis_template"]
+        if "labels_per_chunk" in kwargs:
+            preprocess_params["labels_per_chunk"] = kwargs["labels_per_chunk"]
+        if "reuse_tokenization" in kwargs:
+            preprocess_params["reuse_tokenization"] = kwargs["reuse_tokenization"]
 
         postprocess_params = {}
         if "multi_label" in kwargs:
@@ -188,6 +236,14 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
                 the sum of the label likelihoods for each sequence is 1. If `True`, the labels are considered
                 independent and probabilities are normalized for each candidate by doing a softmax of the entailment
                 score vs. the contradiction score.
+            labels_per_chunk (`int`, *optional*, defaults to 1):
+                The number of candidate labels whose premise/hypothesis pairs are padded together and passed to the
+                model in a single forward pass. Use it to batch the candidate labels of a sequence without setting a
+                `batch_size`, with which it cannot be combined.
+            reuse_tokenization (`bool`, *optional*, defaults to `False`):
+                Whether or not to tokenize each sequence only once for all its candidate labels and to cache the
+                tokenized hypotheses across calls, instead of tokenizing every premise/hypothesis pair. Tokenizers that
+                cannot add their special tokens to already tokenized pairs fall back to tokenizing the pairs.
 
         Return:
             A `dict` or a list of `dict`: Each result comes as a dictionary with the following keys:
@@ -203,18 +259,52 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
         else:
             raise ValueError(f"Unable to understand extra arguments {args}")
 
+        labels_per_chunk = kwargs.get("labels_per_chunk", self._preprocess_params.get("labels_per_chunk", 1))
+        batch_size = kwargs.get("batch_size", self._batch_size) or 1
+        max_tokens_per_batch = kwargs.get("max_tokens_per_batch", self._max_tokens_per_batch)
+        if labels_per_chunk > 1 and (batch_size > 1 or max_tokens_per_batch is not None):
+            raise ValueError(
+                "`labels_per_chunk` already batches the candidate labels of a sequence, it cannot be used with "
+                "`batch_size` or `max_tokens_per_batch`."
+            )
+
         return super().__call__(sequences, **kwargs)
 
-    def preprocess(self, inputs, candidate_labels=None, hypothesis_template="This example is {}."):
+    def preprocess(
+        self,
+        inputs,
+        candidate_labels=None,
+        hypothesis_template="This example is {}.",
+        labels_per_chunk=1,
+        reuse_tokenization=False,
+    ):
         sequence_pairs, sequences = self._args_parser(inputs, candidate_labels, hypothesis_template)
+        if labels_per_chunk < 1:
+            raise ValueError(f"`labels_per_chunk` should be a positive integer, got {labels_per_chunk}")
+
+        encoded_pairs = None
+        if reuse_tokenization:
+            if self._can_reuse_tokenization():
+                encoded_pairs = self._tokenize_with_reuse(sequences[0], [pair[1] for pair in sequence_pairs])
+            else:
+                logger.warning_once(
+                    f"{type(self.tokenizer).__name__} cannot add special tokens to already tokenized pairs, "
+                    "`reuse_tokenization` is ignored."
+                )
 
-        for i, (candidate_label, sequence_pair) in enumerate(zip(candidate_labels, sequence_pairs)):
-            model_input = self._parse_and_tokenize([sequence_pair])
+        for start in range(0, len(candidate_labels), labels_per_chunk):
+            end = start + labels_per_chunk
+            if encoded_pairs is not None:
+                self._ensure_pad_token()
+                model_input = self.tokenizer.pad(encoded_pairs[start:end], return_tensors=self.framework)
+            else:
+                model_input = self._parse_and_tokenize(sequence_pairs[start:end])
 
             yield {
-                "candidate_label": candidate_label,
+                # several candidate labels share the chunk when `labels_per_chunk > 1`
+                "candidate_label": candidate_labels[start:end] if labels_per_chunk > 1 else candidate_labels[start],
                 "sequence": sequences[0],
-                "is_last": i == len(candidate_labels) - 1,
+                "is_last": end >= len(candidate_labels),
                 **model_input,
             }
 
@@ -237,7 +327,12 @@ class ZeroShotClassificationPipeline(ChunkPipeline):
         return model_outputs
 
     def postprocess(self, model_outputs, multi_label=False):
-        candidate_labels = [outputs["candidate_label"] for outputs in model_outputs]
+        candidate_labels = []
+        for outputs in model_outputs:
+            if isinstance(outputs["candidate_label"], list):
+                candidate_labels.extend(outputs["candidate_label"])
+            else:
+                candidate_labels.append(outputs["candidate_label"])
         sequences = [outputs["sequence"] for outputs in model_outputs]
         logits = np.concatenate([output["logits"].numpy() for output in model_outputs])
         N = logits.shape[0]
@@ -74,6 +74,7 @@ from .utils import (
     is_peft_available,
     is_phonemizer_available,
     is_pretty_midi_available,
+    is_pyarrow_available,
     is_pyctcdecode_available,
     is_pytesseract_available,
     is_pytest_available,
@@ -503,6 +504,13 @@ def require_pandas(test_case):
     return unittest.skipUnless(is_pandas_available(), "test requires pandas")(test_case)
 
 
+def require_pyarrow(test_case):
+    """
+    Decorator marking a test that requires pyarrow. These tests are skipped when pyarrow isn't installed.
+    """
+    return unittest.skipUnless(is_pyarrow_available(), "test requires pyarrow")(test_case)
+
+
 def require_pytesseract(test_case):
     """
     Decorator marking a test that requires PyTesseract. These tests are skipped when PyTesseract isn't installed.
@@ -135,6 +135,7 @@ from .import_utils import (
     is_protobuf_available,
     is_psutil_available,
     is_py3nvml_available,
+    is_pyarrow_available,
     is_pyctcdecode_available,
     is_pytesseract_available,
     is_pytest_available,
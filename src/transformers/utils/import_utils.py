@@ -104,6 +104,7 @@ _peft_available = _is_package_available("peft")
 _phonemizer_available = _is_package_available("phonemizer")
 _psutil_available = _is_package_available("psutil")
 _py3nvml_available = _is_package_available("py3nvml")
+_pyarrow_available = _is_package_available("pyarrow")
 _pyctcdecode_available = _is_package_available("pyctcdecode")
 _pytesseract_available = _is_package_available("pytesseract")
 _pytest_available = _is_package_available("pytest")
@@ -489,6 +490,10 @@ def is_py3nvml_available():
     return _py3nvml_available
 
 
+def is_pyarrow_available():
+    return _pyarrow_available
+
+
 def is_sacremoses_available():
     return _sacremoses_available
 
@@ -31,6 +31,7 @@ if is_torch_available():
         ConstrainedBeamSearchScorer,
         DisjunctiveConstraint,
         PhrasalConstraint,
+        VectorizedBeamSearchScorer,
     )
 
 
@@ -250,6 +251,59 @@ class BeamSearchTester:
         self.parent.assertListEqual(list(sequences.shape), [self.num_beams * self.batch_size, max_length])
         self.parent.assertListEqual(list(sequence_scores.shape), [self.num_beams * self.batch_size])
 
+    def check_vectorized_beam_scorer(self, input_ids, *args):
+        scorer_kwargs = {
+            "batch_size": self.batch_size,
+            "num_beams": self.num_beams,
+            "device": torch_device,
+            "length_penalty": self.length_penalty,
+            "do_early_stopping": False,
+            "num_beam_hyps_to_keep": self.num_beam_hyps_to_keep,
+        }
+        beam_scorer = BeamSearchScorer(**scorer_kwargs)
+        vectorized_beam_scorer = VectorizedBeamSearchScorer(**scorer_kwargs)
+        beam_indices = tuple(() for _ in range(self.batch_size * self.num_beams))
+
+        for step in range(6):
+            _, next_tokens, next_indices, next_scores = self.prepare_inputs()
+            # finish some hypotheses, inside and outside of the top `num_beams` candidates
+            next_tokens[step % self.batch_size, step % (2 * self.num_beams)] = self.eos_token_id
+            next_tokens[(step + 1) % self.batch_size, [0, self.num_beams]] = self.eos_token_id
+
+            process_kwargs = {"pad_token_id": self.pad_token_id, "eos_token_id": self.eos_token_id}
+            outputs = beam_scorer.process(
+                input_ids, next_scores, next_tokens, next_indices, beam_indices=beam_indices, **process_kwargs
+            )
+            vectorized_outputs = vectorized_beam_scorer.process(
+                input_ids, next_scores, next_tokens, next_indices, beam_indices=beam_indices, **process_kwargs
+            )
+            for key in ["next_beam_scores", "next_beam_tokens", "next_beam_indices"]:
+                self.parent.assertListEqual(outputs[key].tolist(), vectorized_outputs[key].tolist())
+            self.parent.assertListEqual(beam_scorer._done.tolist(), vectorized_beam_scorer._done.tolist())
+
+            beam_idx = outputs["next_beam_indices"]
+            input_ids = torch.cat([input_ids[beam_idx, :], outputs["next_beam_tokens"].unsqueeze(-1)], dim=-1)
+            beam_indices = tuple(beam_indices[beam_idx[i]] + (beam_idx[i],) for i in range(len(beam_indices)))
+
+        finalize_args = (input_ids, outputs["next_beam_scores"], next_tokens, next_indices)
+        finalize_kwargs = {
+            "pad_token_id": self.pad_token_id,
+            "eos_token_id": self.eos_token_id,
+            "max_length": self.max_length,
+            "beam_indices": beam_indices,
+        }
+        sequence_outputs = beam_scorer.finalize(*finalize_args, **finalize_kwargs)
+        vectorized_sequence_outputs = vectorized_beam_scorer.finalize(*finalize_args, **finalize_kwargs)
+        self.parent.assertListEqual(
+            sequence_outputs["sequences"].tolist(), vectorized_sequence_outputs["sequences"].tolist()
+        )
+        self.parent.assertListEqual(
+            sequence_outputs["beam_indices"].tolist(), vectorized_sequence_outputs["beam_indices"].tolist()
+        )
+        self.parent.assertTrue(
+            torch.allclose(sequence_outputs["sequence_scores"], vectorized_sequence_outputs["sequence_scores"])
+        )
+
 
 class ConstrainedBeamSearchTester:
     def __init__(
@@ -558,6 +612,10 @@ class BeamSearchTest(unittest.TestCase):
         inputs = self.beam_search_tester.prepare_inputs()
         self.beam_search_tester.check_beam_scores_finalize(*inputs)
 
+    def test_vectorized_beam_scorer(self):
+        inputs = self.beam_search_tester.prepare_inputs()
+        self.beam_search_tester.check_vectorized_beam_scorer(*inputs)
+
 
 @require_torch
 class ConstrainedBeamSearchTest(unittest.TestCase):
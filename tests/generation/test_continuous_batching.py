@@ -0,0 +1,91 @@
+# coding=utf-8
+# Copyright 2023 The HuggingFace Team Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a clone of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from transformers import is_torch_available
+from transformers.testing_utils import require_torch, torch_device
+
+from ..test_modeling_common import ids_tensor
+
+
+if is_torch_available():
+    import torch
+
+    from transformers import AutoModelForCausalLM, ContinuousBatchingEngine
+
+
+@require_torch
+class ContinuousBatchingEngineTest(unittest.TestCase):
+    def _get_model(self):
+        model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
+        model.config.eos_token_id = -1
+        model.generation_config.eos_token_id = -1
+        model.generation_config.pad_token_id = 0
+        return model
+
+    def test_matches_static_greedy_generation(self):
+        model = self._get_model()
+        prompts = [ids_tensor((length,), vocab_size=model.config.vocab_size).to(torch_device) for length in (3, 7, 5)]
+        max_new_tokens = [8, 3, 5]
+
+        # with 2 slots, the third prompt is admitted while the second one is still decoding
+        engine = ContinuousBatchingEngine(model, max_batch_size=2)
+        request_ids = [
+            engine.add_request(prompt, max_new_tokens=num_tokens, do_sample=False)
+            for prompt, num_tokens in zip(prompts, max_new_tokens)
+        ]
+        outputs = {}
+        while engine.has_unfinished_requests():
+            self.assertLessEqual(len(engine.running), 2)
+            for request in engine.step():
+                outputs[request.request_id] = request.sequences
+
+        for request_id, prompt, num_tokens in zip(request_ids, prompts, max_new_tokens):
+            expected = model.generate(prompt[None], max_new_tokens=num_tokens, do_sample=False)[0]
+            self.assertListEqual(outputs[request_id].tolist(), expected.tolist())
+
+    def test_generate_preserves_order(self):
+        model = self._get_model()
+        prompts = [ids_tensor((length,), vocab_size=model.config.vocab_size).tolist() for length in (6, 2, 4, 3)]
+
+        engine = ContinuousBatchingEngine(model, max_batch_size=3)
+        outputs = engine.generate(prompts, max_new_tokens=4, do_sample=False)
+
+        self.assertEqual(len(outputs), len(prompts))
+        for prompt, output in zip(prompts, outputs):
+            self.assertEqual(output.shape[0], len(prompt) + 4)
+            self.assertListEqual(output[: len(prompt)].tolist(), prompt)
+        self.assertFalse(engine.has_unfinished_requests())
+        self.assertIsNone(engine._past_key_values)
+
+    def test_eos_evicts_request(self):
+        model = self._get_model()
+        prompt = ids_tensor((4,), vocab_size=model.config.vocab_size).to(torch_device)
+        first_token = model.generate(prompt[None], max_new_tokens=1, do_sample=False)[0, -1].item()
+
+        engine = ContinuousBatchingEngine(model, max_batch_size=2)
+        engine.add_request(prompt, max_new_tokens=10, eos_token_id=first_token)
+        finished = engine.step()
+
+        self.assertEqual(len(finished), 1)
+        self.assertEqual(finished[0].generated_ids.tolist(), [first_token])
+        self.assertEqual(len(engine.running), 0)
+
+    def test_rejects_beam_search(self):
+        model = self._get_model()
+        engine = ContinuousBatchingEngine(model)
+        with self.assertRaises(ValueError):
+            engine.add_request(torch.tensor([1, 2, 3]), num_beams=2)
@@ -427,6 +427,25 @@ class LogitsProcessorTest(unittest.TestCase):
             torch.isinf(filtered_scores_3_gram).tolist(), [[False, False, False], [True, False, False]]
         )
 
+    def test_no_repeat_ngram_dist_processor_long_sequences(self):
+        vocab_size = 5
+        batch_size = 4
+        input_ids = ids_tensor((batch_size, 50), vocab_size=vocab_size)
+
+        for ngram_size in (1, 2, 3, 50, 51):
+            scores = self._get_uniform_logits(batch_size, vocab_size)
+            filtered_scores = NoRepeatNGramLogitsProcessor(ngram_size)(input_ids, scores)
+
+            # a token is banned if it ends an n-gram already present in the hypothesis
+            for hypo_ids, hypo_scores in zip(input_ids.tolist(), filtered_scores):
+                prefix = hypo_ids[len(hypo_ids) - ngram_size + 1 :] if ngram_size > 1 else []
+                expected_banned = {
+                    hypo_ids[i + ngram_size - 1]
+                    for i in range(len(hypo_ids) - ngram_size + 1)
+                    if hypo_ids[i : i + ngram_size - 1] == prefix
+                }
+                self.assertSetEqual(set(torch.isinf(hypo_scores).nonzero().flatten().tolist()), expected_banned)
+
     def test_encoder_no_repeat_ngram_dist_processor(self):
         vocab_size = 3
         num_beams = 2
@@ -13,11 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import unittest
 from queue import Empty
 from threading import Thread
 
-from transformers import AutoTokenizer, TextIteratorStreamer, TextStreamer, is_torch_available
+from transformers import (
+    AsyncTextIteratorStreamer,
+    AutoTokenizer,
+    TextIteratorStreamer,
+    TextStreamer,
+    is_torch_available,
+)
 from transformers.testing_utils import CaptureStdout, require_torch, torch_device
 
 from ..test_modeling_common import ids_tensor
@@ -67,6 +74,48 @@ class StreamerTester(unittest.TestCase):
 
         self.assertEqual(streamer_text, greedy_text)
 
+    def test_text_streamer_decodes_incrementally(self):
+        tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2")
+        model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
+        model.config.eos_token_id = -1
+
+        input_ids = ids_tensor((1, 5), vocab_size=model.config.vocab_size).to(torch_device)
+        greedy_ids = model.generate(input_ids, max_new_tokens=100, do_sample=False)
+        new_greedy_text = tokenizer.decode(greedy_ids[0, input_ids.shape[1] :])
+
+        decoded_lengths = []
+        decode = tokenizer.decode
+
+        def counting_decode(token_ids, **kwargs):
+            decoded_lengths.append(len(token_ids))
+            return decode(token_ids, **kwargs)
+
+        tokenizer.decode = counting_decode
+        with CaptureStdout() as cs:
+            streamer = TextStreamer(tokenizer, skip_prompt=True)
+            model.generate(input_ids, max_new_tokens=100, do_sample=False, streamer=streamer)
+        streamer_text = cs.out[:-1]
+
+        self.assertEqual(streamer_text, new_greedy_text)
+        # only a window of the last tokens is decoded at each step, not the whole sequence
+        self.assertLess(max(decoded_lengths), 10)
+
+    def test_text_streamer_drops_tokens_without_text(self):
+        tokenizer = AutoTokenizer.from_pretrained("distilgpt2")
+        text_ids = tokenizer("Hello world, this is a test", return_tensors="pt").input_ids[0]
+        eos = torch.tensor([tokenizer.eos_token_id])
+        # long runs of special tokens, which are skipped when decoding, between the tokens of the text
+        token_ids = [text_ids[:3]] + [eos] * 100 + [text_ids[3:]] + [eos] * 100
+
+        with CaptureStdout() as cs:
+            streamer = TextStreamer(tokenizer, skip_special_tokens=True)
+            for value in token_ids:
+                streamer.put(value)
+                self.assertLess(len(streamer.token_cache), 10)
+            streamer.end()
+
+        self.assertEqual(cs.out[:-1], "Hello world, this is a test")
+
     def test_text_streamer_skip_prompt(self):
         tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2")
         model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
@@ -120,3 +169,52 @@ class StreamerTester(unittest.TestCase):
             streamer_text = ""
             for new_text in streamer:
                 streamer_text += new_text
+
+    def test_async_iterator_streamer_matches_non_streaming(self):
+        tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2")
+        model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
+        model.config.eos_token_id = -1
+
+        input_ids = ids_tensor((1, 5), vocab_size=model.config.vocab_size).to(torch_device)
+        greedy_ids = model.generate(input_ids, max_new_tokens=10, do_sample=False)
+        greedy_text = tokenizer.decode(greedy_ids[0])
+
+        async def stream():
+            # a single slot in the queue: the generation waits for the consumer at each new chunk of text
+            streamer = AsyncTextIteratorStreamer(tokenizer, max_queue_size=1)
+            generation = asyncio.ensure_future(
+                model.agenerate(input_ids, max_new_tokens=10, do_sample=False, streamer=streamer)
+            )
+            streamer_text = ""
+            async for new_text in streamer:
+                streamer_text += new_text
+            return streamer_text, await generation
+
+        streamer_text, output_ids = asyncio.run(stream())
+        self.assertEqual(streamer_text, greedy_text)
+        self.assertListEqual(output_ids.tolist(), greedy_ids.tolist())
+
+    def test_async_iterator_streamer_cancel(self):
+        tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2")
+        model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
+        model.config.eos_token_id = -1
+
+        input_ids = ids_tensor((1, 5), vocab_size=model.config.vocab_size).to(torch_device)
+
+        async def stream_and_cancel():
+            streamer = AsyncTextIteratorStreamer(tokenizer, max_queue_size=1)
+            generation = asyncio.ensure_future(
+                model.agenerate(input_ids, max_new_tokens=1000, do_sample=False, streamer=streamer)
+            )
+            async for _ in streamer:
+                streamer.cancel()
+            return await generation
+
+        # the generation stops well before `max_new_tokens`, instead of waiting for a consumer that is gone
+        output_ids = asyncio.run(stream_and_cancel())
+        self.assertLess(output_ids.shape[-1], input_ids.shape[-1] + 1000)
+
+    def test_async_iterator_streamer_requires_event_loop(self):
+        tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2")
+        with self.assertRaises(ValueError):
+            AsyncTextIteratorStreamer(tokenizer)
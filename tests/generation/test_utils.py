@@ -38,6 +38,7 @@ if is_torch_available():
         AutoTokenizer,
         BartForConditionalGeneration,
         BartTokenizer,
+        GPT2Config,
         GPT2LMHeadModel,
         GPT2Tokenizer,
         ImageGPTForCausalImageModeling,
@@ -73,6 +74,7 @@ if is_torch_available():
         TopKLogitsWarper,
         TopPLogitsWarper,
     )
+    from transformers.generation.utils import _speculative_sampling
 
 
 class GenerationTesterMixin:
@@ -2083,6 +2085,28 @@ class UtilsFunctionsTest(unittest.TestCase):
 
         self.assertTrue(torch.allclose(expected_output, output, atol=1e-12))
 
+    def test_speculative_sampling(self):
+        draft_tokens = torch.tensor([[0, 1], [0, 1]])
+        target_probs = torch.tensor(
+            [
+                [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+                [[1.0, 0.0, 0.0], [0.5, 0.0, 0.5], [0.0, 0.0, 1.0]],
+            ]
+        )
+        # deterministic drafts: the first row is fully accepted, the second row rejects its second token, and the
+        # next token is sampled among the tokens the model prefers over the drafted one
+        num_accepted, next_tokens = _speculative_sampling(draft_tokens, None, target_probs)
+        self.assertListEqual(num_accepted.tolist(), [2, 1])
+        self.assertEqual(next_tokens[0].item(), 2)
+        self.assertIn(next_tokens[1].item(), [0, 2])
+
+        # sampled drafts: a token the model never picks is always rejected, and resampled from `max(0, p - q)`
+        draft_probs = torch.tensor([[[0.5, 0.5, 0.0], [0.0, 1.0, 0.0]]] * 2)
+        num_accepted, next_tokens = _speculative_sampling(draft_tokens, draft_probs, target_probs)
+        self.assertListEqual(num_accepted.tolist(), [2, 1])
+        self.assertEqual(next_tokens[0].item(), 2)
+        self.assertIn(next_tokens[1].item(), [0, 2])
+
 
 @require_torch
 class GenerationIntegrationTests(unittest.TestCase, GenerationIntegrationTestsMixin):
@@ -2884,3 +2908,35 @@ class GenerationIntegrationTests(unittest.TestCase, GenerationIntegrationTestsMi
             model.generation_config._from_model_config = False  # otherwise model.config.max_length=20 takes precedence
             model.generate(input_ids)
             self.assertEqual(len(warning_list), 0)
+
+    def test_speculative_decoding_batched(self):
+        # batched assisted generation uses speculative decoding, which has the same output as greedy search
+        model = AutoModelForCausalLM.from_pretrained("hf-internal-testing/tiny-random-gpt2").to(torch_device)
+        model.generation_config.pad_token_id = model.generation_config.eos_token_id
+        tokenizer = AutoTokenizer.from_pretrained("hf-internal-testing/tiny-random-gpt2", padding_side="left")
+        tokenizer.pad_token = tokenizer.eos_token
+        inputs = tokenizer(["Hello, my dog is cute and", "Today is"], return_tensors="pt", padding=True)
+        inputs = inputs.to(torch_device)
+        expected = model.generate(**inputs, do_sample=False, max_new_tokens=12)
+
+        # an assistant which disagrees with the model, and the model itself, whose drafts are all accepted
+        assistant_config = GPT2Config(vocab_size=model.config.vocab_size, n_embd=32, n_layer=1, n_head=4)
+        for assistant_model in (GPT2LMHeadModel(assistant_config).to(torch_device), model):
+            outputs = model.generate(**inputs, do_sample=False, max_new_tokens=12, assistant_model=assistant_model)
+            self.assertListEqual(outputs.tolist(), expected.tolist())
+
+        # with sampling, the sequences have the requested length
+        outputs = model.generate(**inputs, do_sample=True, max_new_tokens=12, eos_token_id=-1, assistant_model=model)
+        self.assertEqual(outputs.shape, (2, inputs.input_ids.shape[-1] + 12))
+
+        # the attentions and hidden states are not supported, requested in the call or in the generation config
+        with self.assertRaises(ValueError):
+            model.generate(**inputs, max_new_tokens=12, output_attentions=True, assistant_model=model)
+        model.generation_config.output_hidden_states = True
+        with self.assertRaises(ValueError):
+            model.speculative_decoding(
+                inputs.input_ids,
+                assistant_model=model,
+                stopping_criteria=StoppingCriteriaList([MaxLengthCriteria(max_length=20)]),
+                attention_mask=inputs.attention_mask,
+            )
@@ -918,6 +918,49 @@ class AutomaticSpeechRecognitionPipelineTests(unittest.TestCase):
         self.assertEqual(output, [{"text": ANY(str)}])
         self.assertEqual(output[0]["text"][:6], "ZBT ZC")
 
+    @require_torch
+    def test_stream(self):
+        speech_recognizer = pipeline(
+            task="automatic-speech-recognition",
+            model="hf-internal-testing/tiny-random-wav2vec2",
+        )
+        waveform = np.tile(np.arange(1000, dtype=np.float32), 40)
+        expected = speech_recognizer(waveform, chunk_length_s=1.0, stride_length_s=0.2)
+
+        def audio_stream():
+            for start in range(0, waveform.shape[0], 3000):
+                yield waveform[start : start + 3000]
+
+        outputs = list(speech_recognizer.stream(audio_stream(), chunk_length_s=1.0, stride_length_s=0.2))
+        # one transcript per 0.6s of audio, and the final one
+        self.assertEqual(len(outputs), 4)
+        self.assertEqual(outputs[-1], expected)
+        for output in outputs:
+            self.assertEqual(output, {"text": ANY(str)})
+
+        with self.assertRaises(ValueError):
+            next(speech_recognizer.stream(audio_stream()))
+
+    @require_torch
+    def test_stream_seq2seq(self):
+        speech_recognizer = pipeline(
+            model="hf-internal-testing/tiny-random-speech-encoder-decoder",
+            framework="pt",
+        )
+        waveform = np.tile(np.arange(1000, dtype=np.float32), 40)
+        expected = speech_recognizer(waveform, chunk_length_s=1.0, stride_length_s=0.2, max_new_tokens=10)
+
+        def audio_stream():
+            for start in range(0, waveform.shape[0], 3000):
+                yield waveform[start : start + 3000]
+
+        outputs = list(
+            speech_recognizer.stream(audio_stream(), chunk_length_s=1.0, stride_length_s=0.2, max_new_tokens=10)
+        )
+        # the chunks already transcribed are merged at each step, which gives the same transcript in the end
+        self.assertEqual(len(outputs), 4)
+        self.assertEqual(outputs[-1], expected)
+
     @require_torch
     def test_return_timestamps_ctc_fast(self):
         speech_recognizer = pipeline(
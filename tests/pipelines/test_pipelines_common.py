@@ -17,6 +17,8 @@ import logging
 import os
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 
@@ -28,12 +30,19 @@ from requests.exceptions import HTTPError
 from transformers import (
     AutoModelForSequenceClassification,
     AutoTokenizer,
+    DataParallelPipeline,
     DistilBertForSequenceClassification,
     TextClassificationPipeline,
     TFAutoModelForSequenceClassification,
     pipeline,
 )
-from transformers.pipelines import PIPELINE_REGISTRY, get_task
+from transformers.pipelines import (
+    PIPELINE_REGISTRY,
+    JsonLinesPipelineDataFormat,
+    PipelineCache,
+    PipelineDataFormat,
+    get_task,
+)
 from transformers.pipelines.base import Pipeline, _pad
 from transformers.testing_utils import (
     TOKEN,
@@ -43,6 +52,7 @@ from transformers.testing_utils import (
     is_pipeline_test,
     is_staging_test,
     nested_simplify,
+    require_pyarrow,
     require_tensorflow_probability,
     require_tf,
     require_torch,
@@ -122,6 +132,104 @@ class CommonPipelineTest(unittest.TestCase):
         self.assertEqual(pipe._batch_size, 2)
         self.assertEqual(pipe._num_workers, 1)
 
+    @require_torch
+    def test_pipeline_group_by_length(self):
+        pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert", top_k=None)
+        texts = ["This is a much longer test, " * (i % 5 + 1) for i in range(10)]
+        expected = pipe(texts)
+
+        outputs = pipe(texts, batch_size=4, group_by_length=True)
+        self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+        pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert", batch_size=4, group_by_length=True)
+        self.assertTrue(pipe._group_by_length)
+        batch_lengths = []
+        forward = pipe._forward
+
+        def recording_forward(model_inputs, **kwargs):
+            batch_lengths.append(model_inputs["input_ids"].shape[1])
+            return forward(model_inputs, **kwargs)
+
+        pipe._forward = recording_forward
+        pipe(texts)
+        # the inputs are sorted by length before being batched
+        self.assertEqual(batch_lengths, sorted(batch_lengths))
+
+    @require_torch
+    def test_pipeline_max_tokens_per_batch(self):
+        pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert", top_k=None)
+        texts = ["This is a much longer test, " * (i % 5 + 1) for i in range(10)]
+        expected = pipe(texts)
+
+        outputs = pipe(texts, max_tokens_per_batch=64)
+        self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+        outputs = pipe(texts, max_tokens_per_batch=64, group_by_length=True)
+        self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+    @require_torch
+    def test_pipeline_overlap_stages(self):
+        pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert", top_k=None)
+        texts = ["This is a much longer test, " * (i % 5 + 1) for i in range(10)]
+        expected = pipe(texts)
+
+        for batch_size in (1, 4):
+            outputs = pipe(texts, batch_size=batch_size, overlap_stages=True)
+            self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+        def data(n: int):
+            for text in texts[:n]:
+                yield text
+
+        outputs = list(pipe(data(5), batch_size=2, overlap_stages=True))
+        self.assertEqual(nested_simplify(outputs), nested_simplify(expected[:5]))
+
+    @require_torch
+    def test_data_parallel_pipeline(self):
+        pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert", top_k=None)
+        texts = ["This is a much longer test, " * (i % 5 + 1) for i in range(10)]
+        expected = pipe(texts)
+
+        with DataParallelPipeline(pipe, num_processes=2, core_sets=[[0], [0]], chunk_size=3) as parallel_pipe:
+            outputs = parallel_pipe(texts, batch_size=2)
+            self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+            outputs = list(parallel_pipe(iter(texts)))
+            self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+            self.assertEqual(nested_simplify(parallel_pipe(texts[0])), nested_simplify(expected[0]))
+
+    @require_torch
+    def test_data_parallel_pipeline_unwrapped_outputs(self):
+        # the question answering pipeline returns the output of a list holding a single input unwrapped
+        pipe = pipeline("question-answering", model="sshleifer/tiny-distilbert-base-cased-distilled-squad")
+        questions = [
+            {"question": f"Where was HuggingFace founded {i} ?", "context": "HuggingFace was founded in Paris."}
+            for i in range(5)
+        ]
+        expected = [pipe(question) for question in questions]
+        expected_top_2 = [pipe(question, top_k=2) for question in questions]
+
+        # chunks of 2 inputs leave a last chunk of a single input
+        with DataParallelPipeline(pipe, num_processes=2, core_sets=[[0], [0]], chunk_size=2) as parallel_pipe:
+            self.assertEqual(nested_simplify(parallel_pipe(questions)), nested_simplify(expected))
+            self.assertEqual(nested_simplify(parallel_pipe(questions[0])), nested_simplify(expected[0]))
+            self.assertEqual(nested_simplify(parallel_pipe(questions, top_k=2)), nested_simplify(expected_top_2))
+
+    def test_data_parallel_unpicklable_exception(self):
+        from transformers.pipelines.base import _get_picklable_exception
+
+        exception = ValueError("picklable")
+        self.assertIs(_get_picklable_exception(exception), exception)
+
+        try:
+            raise ValueError(threading.Lock())
+        except ValueError as e:
+            exception = _get_picklable_exception(e)
+        # sent as its repr and traceback, instead of never reaching the caller
+        self.assertIsInstance(exception, RuntimeError)
+        self.assertIn("ValueError(<unlocked _thread.lock", str(exception))
+        self.assertIn("Traceback", str(exception))
+
     @require_torch
     def test_pipeline_pathlike(self):
         pipe = pipeline(model="hf-internal-testing/tiny-random-distilbert")
@@ -333,6 +441,104 @@ class PipelinePadTest(unittest.TestCase):
 
 @is_pipeline_test
 class PipelineUtilsTest(unittest.TestCase):
+    def test_json_lines_data_format(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "inputs.jsonl")
+            output_path = os.path.join(tmp_dir, "outputs.jsonl")
+            with open(input_path, "w") as f:
+                f.write('{"question": "a", "context": "b"}\n\n{"question": "c", "context": "d"}')
+
+            reader = PipelineDataFormat.from_str("jsonl", output_path, input_path, "question")
+            self.assertIsInstance(reader, JsonLinesPipelineDataFormat)
+            self.assertEqual(list(reader), ["a", "c"])
+            self.assertEqual(len(reader), 2)
+            self.assertEqual(reader[1], "c")
+
+            reader = JsonLinesPipelineDataFormat(output_path, input_path, "q=question,context")
+            self.assertEqual(list(reader), [{"q": "a", "context": "b"}, {"q": "c", "context": "d"}])
+
+            reader.write([{"label": "x"}])
+            reader.write([{"label": "y"}, {"label": "z"}])
+            reader.close()
+            with open(output_path) as f:
+                self.assertEqual(f.read(), '{"label": "x"}\n{"label": "y"}\n{"label": "z"}\n')
+
+    @require_pyarrow
+    def test_arrow_data_format(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({"question": ["a", "c"], "context": ["b", "d"], "label": [0, 1]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_paths = [os.path.join(tmp_dir, name) for name in ["file.arrow", "stream.arrow", "data.parquet"]]
+            with pa.ipc.new_file(input_paths[0], table.schema) as writer:
+                writer.write_table(table)
+            with pa.ipc.new_stream(input_paths[1], table.schema) as writer:
+                writer.write_table(table)
+            pq.write_table(table, input_paths[2])
+
+            for input_path in input_paths:
+                output_path = os.path.join(tmp_dir, "outputs.jsonl")
+                reader = PipelineDataFormat.from_str("arrow", output_path, input_path, "question", overwrite=True)
+                self.assertEqual(list(reader), ["a", "c"])
+
+                reader = PipelineDataFormat.from_str("arrow", output_path, input_path, "q=question,context")
+                self.assertEqual(list(reader), [{"q": "a", "context": "b"}, {"q": "c", "context": "d"}])
+
+                # a missing column is an error, not another column
+                reader = PipelineDataFormat.from_str("arrow", output_path, input_path, "answer")
+                with self.assertRaises(KeyError):
+                    list(reader)
+
+                reader.write([{"label": "x"}])
+                reader.close()
+                with open(output_path) as f:
+                    self.assertEqual(f.read(), '{"label": "x"}\n')
+                os.remove(output_path)
+
+    @require_torch
+    def test_pipeline_cache(self):
+        text_classifier = pipeline(
+            task="text-classification", model="hf-internal-testing/tiny-random-distilbert", framework="pt"
+        )
+        expected = text_classifier(["This is great !", "This is bad"])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PipelineCache(max_size=1, cache_dir=tmp_dir)
+            text_classifier = pipeline(
+                task="text-classification",
+                model="hf-internal-testing/tiny-random-distilbert",
+                framework="pt",
+                cache=cache,
+            )
+            outputs = text_classifier(["This is great !", "This is bad", "This is great !"], batch_size=2)
+            self.assertEqual(outputs, [expected[0], expected[1], expected[0]])
+            # the duplicated input is only computed once
+            self.assertEqual((cache.num_hits, cache.num_misses), (1, 2))
+            self.assertEqual(len(cache), 1)
+
+            # "This is great !" was evicted from memory but is still on disk
+            self.assertEqual(text_classifier("This is great !"), [expected[0]])
+            self.assertEqual(text_classifier("This is bad"), [expected[1]])
+            self.assertEqual((cache.num_hits, cache.num_misses), (3, 2))
+
+            # other parameters are other entries
+            text_classifier("This is bad", top_k=2)
+            self.assertEqual((cache.num_hits, cache.num_misses), (3, 3))
+            self.assertAlmostEqual(cache.hit_rate, 0.5)
+
+    def test_pipeline_cache_dir_only_stores_json(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PipelineCache(max_size=1, cache_dir=tmp_dir)
+            cache.set("json", [{"label": "a", "score": 0.5}])
+            cache.set("tuple", {"timestamp": (0.0, 1.0)})
+            self.assertEqual(os.listdir(tmp_dir), ["json.json"])
+
+            # evicted from memory, only the JSON output is found on disk
+            cache.clear()
+            self.assertEqual(cache.get("json"), (True, [{"label": "a", "score": 0.5}]))
+            self.assertEqual(cache.get("tuple"), (False, None))
+
     @require_torch
     def test_pipeline_dataset(self):
         from transformers.pipelines.pt_utils import PipelineDataset
@@ -412,6 +618,88 @@ class PipelineUtilsTest(unittest.TestCase):
             nested_simplify(outputs), [{"id": [[12, 22]]}, {"id": [[2, 3]]}, {"id": [[2, 4]]}, {"id": [[5]]}]
         )
 
+    @require_torch
+    def test_pipeline_batch_unbatch_iterator_variable_batch_sizes(self):
+        from transformers.pipelines.pt_utils import PipelineIterator
+
+        # batches may also be bigger than `loader_batch_size`
+        dummy_dataset = [{"id": [0]}, {"id": [1, 2, 3]}, {"id": [4, 5]}, {"id": [6, 7, 8, 9]}]
+
+        def add(number, extra=0):
+            return {"id": [i + extra for i in number["id"]]}
+
+        dataset = PipelineIterator(dummy_dataset, add, {"extra": 2}, loader_batch_size=3)
+
+        outputs = list(dataset)
+        self.assertEqual(outputs, [{"id": i + 2} for i in range(10)])
+
+    @require_torch
+    def test_pipeline_token_budget_iterator(self):
+        import torch
+
+        from transformers.pipelines.pt_utils import PipelineTokenBudgetIterator
+
+        lengths = [2, 3, 2, 9, 1, 1, 1, 1, 1]
+        dummy_dataset = [{"input_ids": torch.ones((1, length), dtype=torch.long)} for length in lengths]
+
+        def collate(items):
+            return [item["input_ids"].shape[1] for item in items]
+
+        batches = list(PipelineTokenBudgetIterator(dummy_dataset, collate, max_tokens_per_batch=8))
+        # an item longer than the budget makes a batch on its own
+        self.assertEqual(batches, [[2, 3], [2], [9], [1, 1, 1, 1, 1]])
+
+        # items without a padded dimension count as one token
+        batches = list(PipelineTokenBudgetIterator(list(range(7)), list, max_tokens_per_batch=3))
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+
+        with self.assertRaises(ValueError):
+            PipelineTokenBudgetIterator(dummy_dataset, collate, max_tokens_per_batch=0)
+
+    @require_torch
+    def test_pipeline_stage_iterator(self):
+        from transformers.pipelines.pt_utils import PipelineIterator, PipelineStageIterator
+
+        def add(number, extra=0):
+            return number + extra
+
+        dataset = PipelineStageIterator(PipelineIterator(list(range(10)), add, {"extra": 2}), max_queue_size=1)
+        self.assertEqual(len(dataset), 10)
+        self.assertEqual(list(dataset), list(range(2, 12)))
+
+        def fail(number):
+            if number == 3:
+                raise ValueError("Cannot process 3")
+            return number
+
+        dataset = PipelineStageIterator(PipelineIterator(list(range(10)), fail, {}))
+        outputs = []
+        with self.assertRaises(ValueError):
+            for output in dataset:
+                outputs.append(output)
+        # the items before the failing one are still returned, in order
+        self.assertEqual(outputs, [0, 1, 2])
+
+        def numbers():
+            number = 0
+            while True:
+                yield number
+                number += 1
+
+        num_threads = threading.active_count()
+        outputs = []
+        for output in PipelineStageIterator(numbers(), max_queue_size=1):
+            outputs.append(output)
+            if output == 3:
+                break
+        self.assertEqual(outputs, [0, 1, 2, 3])
+        # the background thread stops once the consumer stops iterating
+        for _ in range(50):
+            if threading.active_count() == num_threads:
+                break
+            time.sleep(0.1)
+        self.assertEqual(threading.active_count(), num_threads)
+
     @require_torch
     def test_pipeline_chunk_iterator(self):
         from transformers.pipelines.pt_utils import PipelineChunkIterator
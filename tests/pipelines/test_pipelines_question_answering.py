@@ -14,6 +14,8 @@
 
 import unittest
 
+import numpy as np
+
 from transformers import (
     MODEL_FOR_QUESTION_ANSWERING_MAPPING,
     TF_MODEL_FOR_QUESTION_ANSWERING_MAPPING,
@@ -22,6 +24,7 @@ from transformers import (
 )
 from transformers.data.processors.squad import SquadExample
 from transformers.pipelines import QuestionAnsweringArgumentHandler, pipeline
+from transformers.pipelines.question_answering import select_starts_ends, select_starts_ends_batched
 from transformers.testing_utils import (
     is_pipeline_test,
     nested_simplify,
@@ -191,6 +194,32 @@ class QAPipelineTests(unittest.TestCase):
 
         self.assertEqual(nested_simplify(outputs), {"score": 0.028, "start": 0, "end": 11, "answer": "HuggingFace"})
 
+    def test_select_starts_ends_batched(self):
+        rng = np.random.default_rng(0)
+        lengths = [12, 12, 7]
+        starts = [rng.normal(size=(1, length)).astype(np.float32) for length in lengths]
+        ends = [rng.normal(size=(1, length)).astype(np.float32) for length in lengths]
+        # the question tokens cannot be in the answer, the CLS token can
+        p_masks = [np.array([[0, 1, 1, 1] + [0] * (length - 4)]) for length in lengths]
+        attention_masks = [None, np.array([[1] * 10 + [0] * 2]), None]
+
+        expected = []
+        expected_min_null_score = 1000000
+        for i in range(len(lengths)):
+            chunk_starts, chunk_ends, chunk_scores, expected_min_null_score = select_starts_ends(
+                starts[i], ends[i], p_masks[i], attention_masks[i], expected_min_null_score, 5, True, 4
+            )
+            expected.extend((score, i, s, e) for s, e, score in zip(chunk_starts, chunk_ends, chunk_scores))
+        expected = sorted(expected, reverse=True)[:5]
+
+        chunk_indices, chunk_starts, chunk_ends, scores, min_null_score = select_starts_ends_batched(
+            starts, ends, p_masks, attention_masks, 1000000, 5, True, 4
+        )
+        outputs = [(score, i, s, e) for i, s, e, score in zip(chunk_indices, chunk_starts, chunk_ends, scores)]
+        self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+        self.assertAlmostEqual(min_null_score, expected_min_null_score)
+        self.assertTrue(all(0 <= e - s < 4 for s, e in zip(chunk_starts, chunk_ends)))
+
     @slow
     @require_torch
     def test_small_model_japanese(self):
@@ -668,6 +668,52 @@ class TokenClassificationPipelineTests(unittest.TestCase):
             [{"entity_group": "PER", "score": 0.35, "word": "Ramazotti", "start": 0, "end": 13}],
         )
 
+    @require_torch
+    def test_aggregate_words_matches_aggregate_word(self):
+        model_name = "sshleifer/tiny-dbmdz-bert-large-cased-finetuned-conll03-english"
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        token_classifier = pipeline(task="ner", model=model_name, tokenizer=tokenizer, framework="pt")
+        rng = np.random.default_rng(0)
+        scores = rng.random((12, 9), dtype=np.float32)
+        scores[2, 4] = np.nan
+        # The first entity is a subword, it still starts a word
+        is_subword = [True, False, True, True, False, False, True, False, True, True, True, False]
+        words = ["En", "zo", "##ra", "##ma", "works", "at", "##t", "the", "##u", "##n", "##e", "Paris"]
+        entities = [
+            {"scores": scores[i], "is_subword": is_subword[i], "word": words[i], "start": i, "end": i + 1, "index": i}
+            for i in range(12)
+        ]
+        word_groups = [entities[0:1], entities[1:4], entities[4:5], entities[5:7], entities[7:11], entities[11:]]
+
+        for aggregation_strategy in (AggregationStrategy.FIRST, AggregationStrategy.MAX, AggregationStrategy.AVERAGE):
+            expected = [
+                token_classifier.aggregate_word(word_group, aggregation_strategy) for word_group in word_groups
+            ]
+            self.assertEqual(
+                nested_simplify(token_classifier.aggregate_words(entities, aggregation_strategy)),
+                nested_simplify(expected),
+            )
+        self.assertEqual(token_classifier.aggregate_words([], AggregationStrategy.FIRST), [])
+
+    @require_torch
+    def test_group_entities_consecutive_groups(self):
+        model_name = "sshleifer/tiny-dbmdz-bert-large-cased-finetuned-conll03-english"
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        token_classifier = pipeline(task="ner", model=model_name, tokenizer=tokenizer, framework="pt")
+        labels = ["B-PER", "I-PER", "B-LOC", "I-LOC", "I-LOC"]
+        words = ["En", "##zo", "Pa", "##ri", "##s"]
+        entities = [
+            {"entity": labels[i], "score": 0.9, "word": words[i], "start": i, "end": i + 1, "index": i}
+            for i in range(5)
+        ]
+        self.assertEqual(
+            nested_simplify(token_classifier.group_entities(entities)),
+            [
+                {"entity_group": "PER", "score": 0.9, "word": "Enzo", "start": 0, "end": 2},
+                {"entity_group": "LOC", "score": 0.9, "word": "Paris", "start": 2, "end": 5},
+            ],
+        )
+
     @require_torch
     @slow
     def test_aggregation_strategy_offsets_with_leading_space(self):
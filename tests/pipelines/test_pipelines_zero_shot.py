@@ -156,6 +156,29 @@ class ZeroShotClassificationPipelineTests(unittest.TestCase):
             "Who are you voting for in 2020?" * 100, candidate_labels=["politics", "public health", "science"]
         )
 
+    @require_torch
+    def test_labels_per_chunk_and_reuse_tokenization(self):
+        zero_shot_classifier = pipeline(
+            "zero-shot-classification", model="hf-internal-testing/tiny-random-distilbert", framework="pt"
+        )
+        candidate_labels = ["politics", "public health", "science", "sports", "economics"]
+        sequences = ["Who are you voting for in 2020?", "Who are you voting for in 2020?" * 100]
+        expected = zero_shot_classifier(sequences, candidate_labels=candidate_labels)
+
+        for kwargs in (
+            {"labels_per_chunk": 2},
+            {"reuse_tokenization": True},
+            {"labels_per_chunk": 3, "reuse_tokenization": True},
+        ):
+            outputs = zero_shot_classifier(sequences, candidate_labels=candidate_labels, **kwargs)
+            self.assertEqual(nested_simplify(outputs), nested_simplify(expected))
+
+        # the hypotheses are tokenized once
+        self.assertEqual(len(zero_shot_classifier._hypothesis_ids), len(candidate_labels))
+
+        with self.assertRaises(ValueError):
+            zero_shot_classifier(sequences, candidate_labels=candidate_labels, labels_per_chunk=2, batch_size=2)
+
     @require_torch
     def test_small_model_pt(self):
         zero_shot_classifier = pipeline(
@@ -0,0 +1,286 @@
+# coding=utf-8
+# Copyright 2023 The HuggingFace Team Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a clone of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from transformers import is_torch_available
+from transformers.testing_utils import require_torch, torch_device
+
+from .test_modeling_common import ids_tensor
+
+
+if is_torch_available():
+    import torch
+
+    from transformers import (
+        GPT2Config,
+        GPT2LMHeadModel,
+        GPTNeoXConfig,
+        GPTNeoXForCausalLM,
+        LlamaConfig,
+        LlamaForCausalLM,
+        PagedCache,
+        PrefixCache,
+        StaticCache,
+    )
+
+
+@require_torch
+class PagedCacheTest(unittest.TestCase):
+    def test_update_returns_whole_sequence(self):
+        cache = PagedCache(num_blocks=8, block_size=4)
+        keys = torch.randn(2, 3, 6, 5)
+        values = torch.randn(2, 3, 6, 5)
+
+        # prefill 6 tokens, then decode 3 tokens one by one, on two layers
+        for layer_idx in range(2):
+            cached_keys, cached_values = cache.update(keys, values, layer_idx)
+            self.assertTrue(torch.equal(cached_keys, keys))
+            self.assertTrue(torch.equal(cached_values, values))
+        for _ in range(3):
+            new_keys = torch.randn(2, 3, 1, 5)
+            new_values = torch.randn(2, 3, 1, 5)
+            keys = torch.cat([keys, new_keys], dim=2)
+            values = torch.cat([values, new_values], dim=2)
+            for layer_idx in range(2):
+                cached_keys, cached_values = cache.update(new_keys, new_values, layer_idx)
+                self.assertTrue(torch.equal(cached_keys, keys))
+                self.assertTrue(torch.equal(cached_values, values))
+
+        self.assertEqual(cache.get_seq_length(), 9)
+        self.assertEqual(len(cache), 2)
+        # 9 tokens in blocks of 4 -> 3 blocks per sequence
+        self.assertEqual(cache.num_free_blocks, 8 - 2 * 3)
+
+        legacy_keys, legacy_values = cache.to_legacy_cache()[1]
+        self.assertTrue(torch.equal(legacy_keys, keys))
+        self.assertTrue(torch.equal(legacy_values, values))
+
+        cache.reset()
+        self.assertEqual(cache.num_free_blocks, 8)
+        self.assertEqual(len(cache), 0)
+
+    def test_reorder_shares_blocks_and_copies_on_write(self):
+        cache = PagedCache(num_blocks=8, block_size=4)
+        keys = torch.randn(2, 1, 6, 2)
+        cache.update(keys, keys, 0)
+        self.assertEqual(cache.num_free_blocks, 4)
+
+        # both sequences now point to the blocks of the first one
+        cache.reorder_cache(torch.tensor([0, 0]))
+        self.assertEqual(cache.num_free_blocks, 6)
+
+        # writing into the shared, partially filled block copies it for one of the sequences
+        new_keys = torch.randn(2, 1, 1, 2)
+        cached_keys, _ = cache.update(new_keys, new_keys, 0)
+        self.assertEqual(cache.num_free_blocks, 5)
+        self.assertTrue(torch.equal(cached_keys[0, :, :6], keys[0]))
+        self.assertTrue(torch.equal(cached_keys[1, :, :6], keys[0]))
+        self.assertTrue(torch.equal(cached_keys[:, :, 6:], new_keys))
+
+    def test_block_tables_tensor_is_only_rebuilt_on_changes(self):
+        cache = PagedCache(num_blocks=8, block_size=4)
+        cache.update(torch.randn(2, 1, 5, 2), torch.randn(2, 1, 5, 2), 0)
+        block_tables_tensor = cache._block_tables_tensor
+
+        # the new tokens fit in the last blocks of the sequences
+        for _ in range(3):
+            cache.update(torch.randn(2, 1, 1, 2), torch.randn(2, 1, 1, 2), 0)
+            self.assertIs(cache._block_tables_tensor, block_tables_tensor)
+
+        # a new block is allocated for each sequence
+        cache.update(torch.randn(2, 1, 1, 2), torch.randn(2, 1, 1, 2), 0)
+        self.assertIsNot(cache._block_tables_tensor, block_tables_tensor)
+        self.assertListEqual(cache._block_tables_tensor.tolist(), cache.block_tables)
+
+    def test_out_of_blocks(self):
+        cache = PagedCache(num_blocks=2, block_size=2)
+        keys = torch.randn(1, 1, 5, 2)
+        with self.assertRaises(ValueError):
+            cache.update(keys, keys, 0)
+
+    def _check_generate(self, model):
+        model.to(torch_device).eval()
+        input_ids = ids_tensor((2, 7), vocab_size=model.config.vocab_size).to(torch_device)
+
+        for generation_kwargs in ({"do_sample": False}, {"num_beams": 3, "do_sample": False}):
+            expected = model.generate(input_ids, max_new_tokens=10, **generation_kwargs)
+            past_key_values = PagedCache(num_blocks=64, block_size=4)
+            outputs = model.generate(
+                input_ids, max_new_tokens=10, past_key_values=past_key_values, **generation_kwargs
+            )
+            self.assertListEqual(outputs.tolist(), expected.tolist())
+
+    def test_llama_generate(self):
+        config = LlamaConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        self._check_generate(LlamaForCausalLM(config))
+
+    def test_gpt_neox_generate(self):
+        config = GPTNeoXConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        self._check_generate(GPTNeoXForCausalLM(config))
+
+
+@require_torch
+class StaticCacheTest(unittest.TestCase):
+    def test_update_writes_in_place(self):
+        cache = StaticCache(max_cache_len=8)
+        keys = torch.randn(2, 3, 5, 4)
+        cached_keys, _ = cache.update(keys, keys, 0)
+        buffer = cache.key_cache[0]
+        self.assertEqual(buffer.shape, (2, 3, 8, 4))
+        self.assertTrue(torch.equal(cached_keys[:, :, :5], keys))
+
+        new_keys = torch.randn(2, 3, 1, 4)
+        cached_keys, _ = cache.update(new_keys, new_keys, 0)
+        # the whole preallocated buffer is returned, whatever the number of cached tokens
+        self.assertIs(cache.key_cache[0], buffer)
+        self.assertIs(cached_keys, buffer)
+        self.assertTrue(torch.equal(cached_keys[:, :, :6], torch.cat([keys, new_keys], dim=2)))
+        self.assertTrue(torch.equal(cached_keys[:, :, 6:], torch.zeros(2, 3, 2, 4)))
+        self.assertEqual(cache.get_seq_length(), 6)
+        self.assertEqual(cache.get_max_length(), 8)
+
+        with self.assertRaises(ValueError):
+            cache.update(torch.randn(2, 3, 3, 4), torch.randn(2, 3, 3, 4), 0)
+
+    def test_generate_with_static_cache(self):
+        config = LlamaConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        model = LlamaForCausalLM(config).to(torch_device).eval()
+        input_ids = ids_tensor((2, 7), vocab_size=config.vocab_size).to(torch_device)
+
+        for generation_kwargs in ({"do_sample": False}, {"num_beams": 3, "do_sample": False}):
+            expected = model.generate(input_ids, max_new_tokens=10, **generation_kwargs)
+            outputs = model.generate(input_ids, max_new_tokens=10, cache_implementation="static", **generation_kwargs)
+            self.assertListEqual(outputs.tolist(), expected.tolist())
+
+        config = GPTNeoXConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        model = GPTNeoXForCausalLM(config).to(torch_device).eval()
+        expected = model.generate(input_ids, max_new_tokens=10, do_sample=False)
+        outputs = model.generate(input_ids, max_new_tokens=10, do_sample=False, cache_implementation="static")
+        self.assertListEqual(outputs.tolist(), expected.tolist())
+
+        # without cache, the model is run on the whole sequence at each step and the static cache is not used
+        expected = model.generate(input_ids, max_new_tokens=10, do_sample=False)
+        outputs = model.generate(
+            input_ids, max_new_tokens=10, do_sample=False, use_cache=False, cache_implementation="static"
+        )
+        self.assertListEqual(outputs.tolist(), expected.tolist())
+
+    def test_generate_with_static_cache_and_padding(self):
+        config = LlamaConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        model = LlamaForCausalLM(config).to(torch_device).eval()
+        input_ids = ids_tensor((2, 7), vocab_size=config.vocab_size).to(torch_device)
+        attention_mask = torch.ones_like(input_ids)
+        attention_mask[0, :3] = 0
+
+        generation_kwargs = {"attention_mask": attention_mask, "max_new_tokens": 10, "do_sample": False}
+        expected = model.generate(input_ids, **generation_kwargs)
+        outputs = model.generate(input_ids, cache_implementation="static", **generation_kwargs)
+        self.assertListEqual(outputs.tolist(), expected.tolist())
+
+    def test_attention_shapes_do_not_change(self):
+        config = LlamaConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        model = LlamaForCausalLM(config).to(torch_device).eval()
+        cache = StaticCache(max_cache_len=12)
+        input_ids = ids_tensor((2, 7), vocab_size=config.vocab_size).to(torch_device)
+
+        with torch.no_grad():
+            outputs = model(input_ids, past_key_values=cache, output_attentions=True)
+            self.assertEqual(outputs.attentions[0].shape, (2, 4, 7, 12))
+            for _ in range(3):
+                next_tokens = outputs.logits[:, -1:].argmax(-1)
+                outputs = model(next_tokens, past_key_values=cache, output_attentions=True)
+                self.assertEqual(outputs.attentions[0].shape, (2, 4, 1, 12))
+                # the positions past the end of the sequence are masked
+                self.assertEqual(outputs.attentions[0][..., cache.get_seq_length() :].abs().sum().item(), 0)
+        self.assertEqual(cache.get_seq_length(), 10)
+
+    def test_generate_with_static_cache_unsupported_model(self):
+        model = GPT2LMHeadModel(GPT2Config(vocab_size=99, n_embd=32, n_layer=2, n_head=4)).to(torch_device)
+        input_ids = ids_tensor((1, 4), vocab_size=99).to(torch_device)
+        with self.assertRaises(ValueError):
+            model.generate(input_ids, max_new_tokens=2, cache_implementation="static")
+
+
+@require_torch
+class PrefixCacheTest(unittest.TestCase):
+    def _get_past(self, length):
+        return ((torch.randn(1, 2, length, 4), torch.randn(1, 2, length, 4)),)
+
+    def test_lookup_longest_prefix(self):
+        cache = PrefixCache(max_cached_tokens=100)
+        cache.insert([1, 2, 3, 4], self._get_past(4))
+        cache.insert([1, 5], self._get_past(2))
+
+        self.assertEqual(cache.lookup([1, 2, 3, 7])[0], 3)
+        self.assertEqual(cache.lookup([1, 5, 6])[0], 2)
+        self.assertEqual(cache.lookup([9, 2]), (0, None))
+
+        # a longer prompt supersedes its stored prefixes
+        cache.insert([1, 2, 3, 4, 5, 6], self._get_past(6))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.num_cached_tokens, 8)
+
+    def test_lru_eviction(self):
+        cache = PrefixCache(max_cached_tokens=10)
+        cache.insert([1, 2, 3, 4], self._get_past(4))
+        cache.insert([5, 6, 7, 8], self._get_past(4))
+        cache.lookup([1, 2])
+        cache.insert([9, 10, 11, 12], self._get_past(4))
+
+        self.assertEqual(cache.num_cached_tokens, 8)
+        self.assertEqual(cache.lookup([5, 6])[0], 0)
+        self.assertEqual(cache.lookup([1, 2, 3, 4])[0], 4)
+
+    def test_generate_with_prefix_cache(self):
+        config = LlamaConfig(
+            vocab_size=99, hidden_size=32, intermediate_size=37, num_hidden_layers=2, num_attention_heads=4
+        )
+        model = LlamaForCausalLM(config).to(torch_device).eval()
+        prefix = ids_tensor((1, 6), vocab_size=config.vocab_size).to(torch_device)
+        prefix_cache = PrefixCache(max_cached_tokens=1000)
+
+        for generation_kwargs in ({"do_sample": False}, {"num_beams": 3, "do_sample": False}):
+            for _ in range(2):
+                suffix = ids_tensor((1, 3), vocab_size=config.vocab_size).to(torch_device)
+                input_ids = torch.cat([prefix, suffix], dim=-1)
+                expected = model.generate(input_ids, max_new_tokens=5, **generation_kwargs)
+                outputs = model.generate(input_ids, max_new_tokens=5, prefix_cache=prefix_cache, **generation_kwargs)
+                self.assertListEqual(outputs.tolist(), expected.tolist())
+
+        self.assertEqual(prefix_cache.num_misses, 1)
+        self.assertEqual(prefix_cache.num_hits, 3)
+
+    def test_generate_with_padded_inputs(self):
+        model = GPT2LMHeadModel(GPT2Config(vocab_size=99, n_embd=32, n_layer=2, n_head=4)).to(torch_device)
+        input_ids = ids_tensor((2, 4), vocab_size=99).to(torch_device)
+        attention_mask = torch.ones_like(input_ids)
+        attention_mask[0, 0] = 0
+        with self.assertRaises(ValueError):
+            model.generate(
+                input_ids, attention_mask=attention_mask, max_new_tokens=2, prefix_cache=PrefixCache(100)
+            )
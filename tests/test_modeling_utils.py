@@ -417,6 +417,29 @@ class ModelUtilsTest(TestCasePlus):
                 },
             )
 
+        with self.subTest("Test balanced sharding"):
+            model = torch.nn.ModuleList(
+                [
+                    torch.nn.Sequential(torch.nn.Linear(10, 10, bias=False), torch.nn.Linear(10, 10, bias=False))
+                    for _ in range(5)
+                ]
+            )
+            state_dict = model.state_dict()
+
+            # Each layer is 800 bytes: sequential sharding splits layers, balanced sharding keeps them whole
+            shards, index = shard_checkpoint(state_dict, max_shard_size=1300)
+            self.assertEqual(len(shards), 4)
+            self.assertNotEqual(index["weight_map"]["1.0.weight"], index["weight_map"]["1.1.weight"])
+
+            shards, index = shard_checkpoint(state_dict, max_shard_size=1300, sharding_strategy="balanced")
+            self.assertEqual(len(shards), 5)
+            weight_map = index["weight_map"]
+            for layer_idx in range(5):
+                self.assertEqual(weight_map[f"{layer_idx}.0.weight"], weight_map[f"{layer_idx}.1.weight"])
+
+            shards, index = shard_checkpoint(state_dict, max_shard_size=3000, sharding_strategy="balanced")
+            self.assertEqual([len(shard) for shard in shards.values()], [6, 4])
+
     def test_checkpoint_sharding_local(self):
         model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert")
 
@@ -859,6 +882,93 @@ class ModelUtilsTest(TestCasePlus):
             for p1, p2 in zip(model.parameters(), new_model.parameters()):
                 self.assertTrue(torch.allclose(p1, p2))
 
+    @require_safetensors
+    def test_checkpoint_sharding_parallel_saving(self):
+        model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert")
+        for safe_serialization in [False, True]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                model.save_pretrained(
+                    tmp_dir, max_shard_size="50kB", safe_serialization=safe_serialization, num_saving_workers=3
+                )
+                index_name = SAFE_WEIGHTS_INDEX_NAME if safe_serialization else WEIGHTS_INDEX_NAME
+                with open(os.path.join(tmp_dir, index_name)) as f:
+                    shard_files = set(json.load(f)["weight_map"].values())
+                self.assertGreater(len(shard_files), 3)
+                for shard_file in shard_files:
+                    self.assertTrue(os.path.isfile(os.path.join(tmp_dir, shard_file)))
+
+                new_model = BertModel.from_pretrained(tmp_dir)
+                for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                    self.assertTrue(torch.equal(p1, p2))
+
+        # a custom save function may synchronize processes, it cannot be called from several threads
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(ValueError):
+                model.save_pretrained(
+                    tmp_dir,
+                    max_shard_size="50kB",
+                    save_function=lambda obj, f: torch.save(obj, f),
+                    num_saving_workers=3,
+                )
+
+    @require_safetensors
+    def test_safetensors_load_with_mmap(self):
+        model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save_pretrained(tmp_dir, safe_serialization=True, max_shard_size="100kB")
+
+            new_model = BertModel.from_pretrained(tmp_dir, use_mmap=True)
+            for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                self.assertTrue(torch.equal(p1, p2))
+
+            # The file is mapped copy-on-write: modifying the weights does not modify the checkpoint
+            with torch.no_grad():
+                for param in new_model.parameters():
+                    param.add_(1)
+            new_model = BertModel.from_pretrained(tmp_dir, use_mmap=True)
+            for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                self.assertTrue(torch.equal(p1, p2))
+
+        with self.assertRaises(ValueError):
+            BertModel.from_pretrained("hf-internal-testing/tiny-random-bert", use_mmap=True, low_cpu_mem_usage=False)
+
+    @require_safetensors
+    @require_accelerate
+    def test_lazy_loading(self):
+        model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save_pretrained(tmp_dir, safe_serialization=True, max_shard_size="100kB")
+
+            new_model = BertModel.from_pretrained(tmp_dir, lazy_loading=True, prefetch_layers=1)
+            embeddings = model.embeddings.word_embeddings.weight
+            self.assertTrue(torch.equal(embeddings, new_model.embeddings.word_embeddings.weight))
+            self.assertTrue(all(p.device.type == "meta" for p in new_model.encoder.layer.parameters()))
+
+            # Loads the first layer
+            hidden_states = new_model.embeddings(model.dummy_inputs["input_ids"])
+            new_model.encoder.layer[0](hidden_states)
+            self.assertFalse(any(p.device.type == "meta" for p in new_model.encoder.layer[0].parameters()))
+            self.assertTrue(all(p.device.type == "meta" for p in new_model.encoder.layer[-1].parameters()))
+
+            with torch.no_grad():
+                outputs = model(**model.dummy_inputs)
+                new_outputs = new_model(**model.dummy_inputs)
+            self.assertTrue(torch.allclose(outputs.last_hidden_state, new_outputs.last_hidden_state))
+            for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                self.assertTrue(torch.equal(p1, p2))
+
+    def test_checkpoint_sharding_parallel_loading(self):
+        model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save_pretrained(tmp_dir, max_shard_size="50kB")
+
+            for loading_memory_budget in [None, "100kB", 1]:
+                new_model = BertModel.from_pretrained(
+                    tmp_dir, num_loading_workers=3, loading_memory_budget=loading_memory_budget
+                )
+                for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                    self.assertTrue(torch.equal(p1, p2))
+
     @require_safetensors
     def test_safetensors_load_from_hub_sharded(self):
         safetensors_model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert-sharded-safetensors")
@@ -0,0 +1,162 @@
+# coding=utf-8
+# Copyright 2023 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+import unittest
+from queue import Full
+
+from transformers import pipeline
+from transformers.commands.serving import MicroBatcher
+from transformers.generation.streamers import AsyncTextIteratorStreamer
+from transformers.testing_utils import require_torch
+
+
+class FakePipeline:
+    def __init__(self, exception=None, unwrap_single_output=False):
+        self.calls = []
+        self.threads = set()
+        self.exception = exception
+        # like the question answering pipeline, which does not wrap the output of a list with a single input
+        self.unwrap_single_output = unwrap_single_output
+
+    def __call__(self, inputs, **kwargs):
+        self.calls.append((inputs, kwargs))
+        self.threads.add(threading.get_ident())
+        if self.exception is not None:
+            raise self.exception
+        if isinstance(inputs, list):
+            if self.unwrap_single_output and len(inputs) == 1:
+                return {"answer": inputs[0]}
+            return [f"out-{x}" for x in inputs]
+        return f"out-{inputs}"
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def test_concurrent_requests_are_batched(self):
+        pipe = FakePipeline()
+        batcher = MicroBatcher(pipe, max_batch_size=4, max_wait_time=1.0)
+
+        async def main():
+            return await asyncio.gather(batcher("a"), batcher(["b", "c"]), batcher("d"))
+
+        outputs = asyncio.run(main())
+
+        self.assertEqual(outputs, ["out-a", ["out-b", "out-c"], "out-d"])
+        self.assertEqual(pipe.calls, [(["a", "b", "c", "d"], {"batch_size": 4})])
+
+    def test_incomplete_batch_is_flushed_after_max_wait_time(self):
+        pipe = FakePipeline()
+        batcher = MicroBatcher(pipe, max_batch_size=8, max_wait_time=0.05)
+
+        async def main():
+            start = time.monotonic()
+            output = await asyncio.wait_for(batcher("a"), timeout=5)
+            return output, time.monotonic() - start
+
+        output, elapsed = asyncio.run(main())
+
+        self.assertEqual(output, "out-a")
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertEqual(pipe.calls, [(["a"], {"batch_size": 8})])
+
+    def test_exception_is_propagated_to_every_request(self):
+        pipe = FakePipeline(exception=ValueError("boom"))
+        batcher = MicroBatcher(pipe, max_batch_size=4, max_wait_time=1.0)
+
+        async def main():
+            return await asyncio.gather(
+                batcher("a"), batcher("b"), batcher("c"), batcher("d"), return_exceptions=True
+            )
+
+        outputs = asyncio.run(main())
+
+        self.assertEqual(len(outputs), 4)
+        for output in outputs:
+            self.assertIsInstance(output, ValueError)
+            self.assertEqual(str(output), "boom")
+        self.assertEqual(len(pipe.calls), 1)
+
+    def test_run_shares_the_thread_of_the_batches(self):
+        pipe = FakePipeline()
+        batcher = MicroBatcher(pipe, max_batch_size=2, max_wait_time=0.01)
+
+        async def main():
+            return await asyncio.gather(batcher("a"), batcher.run(pipe, "b", max_new_tokens=2))
+
+        outputs = asyncio.run(main())
+
+        self.assertEqual(outputs, ["out-a", "out-b"])
+        self.assertIn(("b", {"max_new_tokens": 2}), pipe.calls)
+        self.assertEqual(len(pipe.threads), 1)
+
+    def test_unwrapped_single_output(self):
+        pipe = FakePipeline(unwrap_single_output=True)
+        batcher = MicroBatcher(pipe, max_batch_size=4, max_wait_time=0.01)
+
+        async def main():
+            first = await asyncio.wait_for(batcher("a"), timeout=5)
+            second = await asyncio.wait_for(batcher(["b"]), timeout=5)
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), ({"answer": "a"}, [{"answer": "b"}]))
+
+    def test_worker_survives_failed_batches(self):
+        pipe = FakePipeline()
+        batcher = MicroBatcher(pipe, max_batch_size=4, max_wait_time=0.01)
+
+        async def main():
+            pipe.exception = ValueError("boom")
+            with self.assertRaises(ValueError):
+                await asyncio.wait_for(batcher("a"), timeout=5)
+            pipe.exception = None
+            return await asyncio.wait_for(batcher("b"), timeout=5)
+
+        self.assertEqual(asyncio.run(main()), "out-b")
+
+    def test_slow_stream_does_not_block_other_requests(self):
+        pipe = FakePipeline()
+        batcher = MicroBatcher(pipe, max_batch_size=4, max_wait_time=0.01)
+
+        def generate(streamer):
+            for i in range(100):
+                streamer.on_finalized_text(f"chunk-{i}")
+            streamer.on_finalized_text("", stream_end=True)
+
+        async def main():
+            # nobody reads the stream, like a client that stopped reading without disconnecting
+            streamer = AsyncTextIteratorStreamer(None, max_queue_size=1, put_timeout=0.1)
+            generation = asyncio.ensure_future(batcher.run(generate, streamer))
+            output = await asyncio.wait_for(batcher("a"), timeout=5)
+            with self.assertRaises(Full):
+                await asyncio.wait_for(generation, timeout=5)
+            return output
+
+        self.assertEqual(asyncio.run(main()), "out-a")
+
+    @require_torch
+    def test_question_answering_single_request(self):
+        question_answerer = pipeline(
+            "question-answering", model="sshleifer/tiny-distilbert-base-cased-distilled-squad"
+        )
+        inputs = {"question": "Where was HuggingFace founded ?", "context": "HuggingFace was founded in Paris."}
+        expected = question_answerer(inputs)
+        batcher = MicroBatcher(question_answerer, max_batch_size=4, max_wait_time=0.01)
+
+        async def main():
+            return await asyncio.wait_for(batcher(inputs), timeout=60)
+
+        self.assertEqual(asyncio.run(main()), expected)